@@ -0,0 +1,41 @@
+"""
+AOI同步消息的精简解码模块
+用精简的 aoi.proto 完整解析 AOI 同步消息。aoi.proto 只声明 PacketParser 用到的字段(实体 Uuid 与属性集合),
+技能效果、子弹、Buff、MapAttrs 等子消息由 protobuf 的 C 实现(upb)作为未知字段跳过, 不创建 Python 对象;
+所有实体(包括玩家等非怪物实体)都会被解析, 由 PacketParser 按 Uuid 过滤。
+结果与 star_pb2 的字段同名, 可直接交给 PacketParser
+"""
+
+from aoi_pb2 import SyncNearDeltaInfo, SyncNearEntities
+
+
+def decode_SyncNearDeltaInfo(data) -> SyncNearDeltaInfo:
+    """
+    用 aoi.proto 解码 SyncNearDeltaInfo
+
+    Args:
+        data: 序列化的 SyncNearDeltaInfo
+
+    Returns:
+        aoi_pb2.SyncNearDeltaInfo, 只包含实体 Uuid 和属性集合
+
+    Raises:
+        google.protobuf.message.DecodeError: 数据损坏或被截断
+    """
+    return SyncNearDeltaInfo.FromString(data)
+
+
+def decode_SyncNearEntities(data) -> SyncNearEntities:
+    """
+    用 aoi.proto 解码 SyncNearEntities
+
+    Args:
+        data: 序列化的 SyncNearEntities
+
+    Returns:
+        aoi_pb2.SyncNearEntities, 只包含出现实体的 Uuid、属性集合和消失实体的 Uuid
+
+    Raises:
+        google.protobuf.message.DecodeError: 数据损坏或被截断
+    """
+    return SyncNearEntities.FromString(data)
@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+# Generated by the protocol buffer compiler.  DO NOT EDIT!
+# source: aoi.proto
+"""Generated protocol buffer code."""
+from google.protobuf.internal import builder as _builder
+from google.protobuf import descriptor as _descriptor
+from google.protobuf import descriptor_pool as _descriptor_pool
+from google.protobuf import symbol_database as _symbol_database
+# @@protoc_insertion_point(imports)
+
+_sym_db = _symbol_database.Default()
+
+
+
+
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\taoi.proto\x12\x03\x61oi\"#\n\x04\x41ttr\x12\n\n\x02Id\x18\x01 \x01(\x05\x12\x0f\n\x07RawData\x18\x02 \x01(\x0c\"*\n\x0e\x41ttrCollection\x12\x18\n\x05\x41ttrs\x18\x02 \x03(\x0b\x32\t.aoi.Attr\"@\n\x0c\x41oiSyncDelta\x12\x0c\n\x04Uuid\x18\x01 \x01(\x03\x12\"\n\x05\x41ttrs\x18\x02 \x01(\x0b\x32\x13.aoi.AttrCollection\":\n\x11SyncNearDeltaInfo\x12%\n\nDeltaInfos\x18\x01 \x03(\x0b\x32\x11.aoi.AoiSyncDelta\":\n\x06\x45ntity\x12\x0c\n\x04Uuid\x18\x01 \x01(\x03\x12\"\n\x05\x41ttrs\x18\x03 \x01(\x0b\x32\x13.aoi.AttrCollection\"\x1f\n\x0f\x44isappearEntity\x12\x0c\n\x04Uuid\x18\x01 \x01(\x03\"X\n\x10SyncNearEntities\x12\x1b\n\x06\x41ppear\x18\x01 \x03(\x0b\x32\x0b.aoi.Entity\x12\'\n\tDisappear\x18\x02 \x03(\x0b\x32\x14.aoi.DisappearEntityb\x06proto3')
+
+_builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, globals())
+_builder.BuildTopDescriptorsAndMessages(DESCRIPTOR, 'aoi_pb2', globals())
+if _descriptor._USE_C_DESCRIPTORS == False:
+
+  DESCRIPTOR._options = None
+  _ATTR._serialized_start=18
+  _ATTR._serialized_end=53
+  _ATTRCOLLECTION._serialized_start=55
+  _ATTRCOLLECTION._serialized_end=97
+  _AOISYNCDELTA._serialized_start=99
+  _AOISYNCDELTA._serialized_end=163
+  _SYNCNEARDELTAINFO._serialized_start=165
+  _SYNCNEARDELTAINFO._serialized_end=223
+  _ENTITY._serialized_start=225
+  _ENTITY._serialized_end=283
+  _DISAPPEARENTITY._serialized_start=285
+  _DISAPPEARENTITY._serialized_end=316
+  _SYNCNEARENTITIES._serialized_start=318
+  _SYNCNEARENTITIES._serialized_end=406
+# @@protoc_insertion_point(module_scope)
@@ -0,0 +1,148 @@
+"""
+AOI同步消息精简解码基准测试
+对比 star_pb2 完整解析与 aoi_decoder(精简的 aoi.proto)单独解码以及加上 PacketParser 的耗时;
+两者交给 PacketParser 后结果一致由 tests/test_aoi_decoder.py 检查
+
+用法:
+    python benchmarks/bench_aoi_decoder.py [-n 次数] [--entities 实体数] [--monster-ratio 怪物比例]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+# PacketParser 按相对路径读取 monster_names.json
+os.chdir(ROOT)
+
+from aoi_decoder import decode_SyncNearDeltaInfo, decode_SyncNearEntities
+from packet_parser import AttrType, PacketParser
+from star_pb2 import SyncNearDeltaInfo, SyncNearEntities
+
+
+def encode_varint(value: int) -> bytes:
+    value &= (1 << 64) - 1
+    out = bytearray()
+    while True:
+        byte = value & 0x7f
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def random_uuid(rnd: random.Random, monster_ratio: float) -> int:
+    entity_type = 64 if rnd.random() < monster_ratio else rnd.choice((640, 1, 3))
+    uuid = (rnd.randint(1, 1 << 40) << 16) | entity_type
+    # 覆盖负数 Uuid 的10字节varint编码
+    return -uuid if rnd.random() < 0.05 else uuid
+
+
+def fill_attrs(collection, rnd: random.Random):
+    """怪物与玩家常见的属性组合, 其中只有少数属性会被 PacketParser 使用"""
+    attr_ids = [
+        AttrType["AttrId"], AttrType["AttrHp"], AttrType["AttrMaxHp"], AttrType["AttrLevel"],
+        AttrType["AttrFightPoint"], AttrType["AttrCri"], AttrType["AttrLucky"], AttrType["AttrElementFlag"],
+    ]
+    for attr_id in rnd.sample(attr_ids, rnd.randint(2, len(attr_ids))):
+        attr = collection.Attrs.add()
+        attr.Id = attr_id
+        attr.RawData = encode_varint(rnd.randint(0, 2000000))
+    if rnd.random() < 0.2:
+        attr = collection.Attrs.add()
+        attr.Id = AttrType["AttrName"]
+        attr.RawData = "哥布林".encode("utf-8")
+    for _ in range(rnd.randint(0, 3)):
+        map_attr = collection.MapAttrs.add()
+        map_attr.Id = rnd.randint(1, 100)
+        value = map_attr.Attrs.add()
+        value.Key = b"k" * 8
+        value.Value = b"v" * 32
+
+
+def build_delta_info(rnd: random.Random, entities: int, monster_ratio: float) -> bytes:
+    message = SyncNearDeltaInfo()
+    for _ in range(entities):
+        delta = message.DeltaInfos.add()
+        delta.Uuid = random_uuid(rnd, monster_ratio)
+        fill_attrs(delta.Attrs, rnd)
+        delta.SkillEffects.Uuid = rnd.randint(1, 1 << 30)
+        delta.SkillEffects.TotalDamage = rnd.randint(1, 1 << 30)
+        for _ in range(rnd.randint(0, 8)):
+            delta.SkillEffects.Damages.add()
+        for _ in range(rnd.randint(0, 4)):
+            delta.FakeBullets.add()
+    return message.SerializeToString()
+
+
+def build_entities(rnd: random.Random, entities: int, monster_ratio: float) -> bytes:
+    message = SyncNearEntities()
+    for _ in range(entities):
+        entity = message.Appear.add()
+        entity.Uuid = random_uuid(rnd, monster_ratio)
+        fill_attrs(entity.Attrs, rnd)
+    for _ in range(entities // 4):
+        message.Disappear.add().Uuid = random_uuid(rnd, monster_ratio)
+    return message.SerializeToString()
+
+
+def proto_delta_info(data):
+    message = SyncNearDeltaInfo()
+    message.ParseFromString(data)
+    return message
+
+
+def proto_entities(data):
+    message = SyncNearEntities()
+    message.ParseFromString(data)
+    return message
+
+
+def bench(decode, payloads, iterations, parse=None):
+    """平均每条消息的耗时; 指定 parse 时包含 PacketParser 读取字段的耗时"""
+    if parse is not None:
+        handle = getattr(PacketParser(lambda data: None), parse)
+        step = lambda data: handle(decode(data))
+    else:
+        step = decode
+    start = time.perf_counter()
+    for _ in range(iterations):
+        for data in payloads:
+            step(data)
+    return (time.perf_counter() - start) / (iterations * len(payloads))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="AOI同步消息精简解码基准测试")
+    parser.add_argument("-n", "--iterations", type=int, default=200, help="每条消息的解码次数")
+    parser.add_argument("--entities", type=int, default=100, help="每条消息的实体数")
+    parser.add_argument("--monster-ratio", type=float, default=0.3, help="实体中怪物的比例")
+    args = parser.parse_args()
+
+    rnd = random.Random(0)
+    cases = (
+        ("SyncNearDeltaInfo", "parse_SyncNearDeltaInfo", proto_delta_info, decode_SyncNearDeltaInfo,
+         [build_delta_info(rnd, args.entities, args.monster_ratio) for _ in range(20)]),
+        ("SyncNearEntities", "parse_SyncNearEntities", proto_entities, decode_SyncNearEntities,
+         [build_entities(rnd, args.entities, args.monster_ratio) for _ in range(20)]),
+    )
+
+    for name, parse, proto_decode, slim_decode, payloads in cases:
+        size = sum(len(data) for data in payloads) / len(payloads)
+        print(f"{name} (平均 {size:.0f} 字节, {args.entities} 实体, 怪物比例 {args.monster_ratio})")
+        # upb 按需创建 Python 对象, 只计解码会低估读取字段的开销, 因此同时统计交给 PacketParser 的耗时
+        for label, handler in (("解码", None), ("解码 + PacketParser", parse)):
+            proto_cost = bench(proto_decode, payloads, args.iterations, handler)
+            slim_cost = bench(slim_decode, payloads, args.iterations, handler)
+            print(f"  {label}")
+            print(f"    star_pb2 完整解析: {proto_cost * 1e6:10.2f} us/消息")
+            print(f"    aoi_decoder 精简:  {slim_cost * 1e6:10.2f} us/消息 ({proto_cost / slim_cost:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
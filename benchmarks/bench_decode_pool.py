@@ -0,0 +1,137 @@
+"""
+多进程解码扩展性基准测试
+对比解码线程内处理与 1/2/4/8 个工作进程的解码吞吐
+
+用法:
+    python benchmarks/bench_decode_pool.py [--frames 数据包数] [--entities 每条消息实体数]
+"""
+
+import argparse
+import os
+import random
+import struct
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+# PacketParser 按相对路径读取 monster_names.json
+os.chdir(ROOT)
+
+import zstandard as zstd
+
+from decode_pool import DecodePool
+from packet_capture import PacketCapture
+from packet_parser import AttrType, PacketParser
+from star_pb2 import SyncNearDeltaInfo
+
+GAME_SERVICE_UUID = 0x0000000063335342
+SYNC_NEAR_DELTA_INFO = 0x2d
+
+
+def encode_varint(value: int) -> bytes:
+    out = bytearray()
+    while True:
+        byte = value & 0x7f
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def build_frame(rnd: random.Random, entities: int) -> bytes:
+    """构造一个 zstd 压缩的 FrameDown(Notify(SyncNearDeltaInfo)) 数据包"""
+    message = SyncNearDeltaInfo()
+    for _ in range(entities):
+        delta = message.DeltaInfos.add()
+        delta.Uuid = (rnd.randint(1, 100000) << 16) | 64
+        for attr_id, value in (
+            (AttrType["AttrId"], rnd.randint(101, 200)),
+            (AttrType["AttrHp"], rnd.randint(0, 1000000)),
+            (AttrType["AttrMaxHp"], 1000000),
+        ):
+            attr = delta.Attrs.Attrs.add()
+            attr.Id = attr_id
+            attr.RawData = encode_varint(value)
+    payload = zstd.ZstdCompressor().compress(message.SerializeToString())
+    notify = struct.pack('>HQII', 0x8002, GAME_SERVICE_UUID, 0, SYNC_NEAR_DELTA_INFO) + payload
+    notify = struct.pack('>I', len(notify) + 4) + notify
+    frame_down = struct.pack('>HI', 6, 0) + notify
+    return struct.pack('>I', len(frame_down) + 4) + frame_down
+
+
+class Counter:
+    """统计回调次数"""
+
+    def __init__(self):
+        self.count = 0
+        self.event = threading.Event()
+        self.target = None
+
+    def __call__(self, data):
+        self.count += 1
+        if self.target is not None and self.count >= self.target:
+            self.event.set()
+
+
+def bench_inline(frames):
+    """解码线程内处理"""
+    counter = Counter()
+    parser = PacketParser(counter)
+    capture = PacketCapture()
+
+    def on_message(data):
+        if 'SyncNearDeltaInfo' in data:
+            parser.parse_SyncNearDeltaInfo(data['SyncNearDeltaInfo'], data.get('flow_id', 0))
+
+    capture.callback = on_message
+    start = time.perf_counter()
+    for frame in frames:
+        capture._analyze_payload(memoryview(frame), "TCP", 1)
+    return time.perf_counter() - start, counter.count
+
+
+def bench_pool(frames, workers):
+    """多进程解码, 不计入工作进程启动时间"""
+    counter = Counter()
+    pool = DecodePool(counter, workers)
+
+    # 预热: 等待每个工作进程完成初始化
+    counter.target = 1
+    for _ in range(workers):
+        pool.submit(1, frames[0], time.time())
+        pool.flush()
+    counter.event.wait()
+    time.sleep(0.5)
+    warmup = counter.count
+
+    start = time.perf_counter()
+    for frame in frames:
+        pool.submit(1, frame, time.time())
+    pool.close()
+    return time.perf_counter() - start, counter.count - warmup
+
+
+def main():
+    parser = argparse.ArgumentParser(description="多进程解码扩展性基准测试")
+    parser.add_argument("--frames", type=int, default=2000, help="数据包数")
+    parser.add_argument("--entities", type=int, default=50, help="每条消息的实体数")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8], help="工作进程数列表")
+    args = parser.parse_args()
+
+    rnd = random.Random(0)
+    frames = [build_frame(rnd, args.entities) for _ in range(args.frames)]
+
+    elapsed, updates = bench_inline(frames)
+    print(f"{'线程内':>8}: {args.frames / elapsed:10.1f} 包/秒 {updates / elapsed:12.1f} 更新/秒")
+    for workers in args.workers:
+        elapsed, pool_updates = bench_pool(frames, workers)
+        assert pool_updates == updates, f"解码结果数量不一致: {pool_updates} != {updates}"
+        print(f"{workers:>5} 进程: {args.frames / elapsed:10.1f} 包/秒 {updates / elapsed:12.1f} 更新/秒")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""
+/enemies 接口负载测试
+对比每次请求由 FastAPI 重新编码(旧实现)、按快照版本缓存的 JSON、ETag 命中的 304 以及 protobuf 格式的吞吐
+
+用法:
+    python benchmarks/bench_enemies_api.py [--enemies 敌人数] [--clients 并发数] [--seconds 每项时长] [--publish-rate 每秒发布次数]
+"""
+
+import argparse
+import http.client
+import json
+import os
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from enemy_manager import EnemyManager
+from enemy_pb2 import EnemyList
+
+HOST = "127.0.0.1"
+PORT = 1289
+
+
+def add_legacy_route(manager):
+    """旧实现: 直接返回字典, 由 FastAPI 的 JSON 编码器逐次编码"""
+    @manager.create_app().get("/bench/legacy")
+    def legacy_enemies():
+        return dict(manager.snapshot.enemies)
+
+
+def wait_for_server(timeout=10.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection(HOST, PORT, timeout=1)
+            conn.request("GET", "/enemies")
+            conn.getresponse().read()
+            conn.close()
+            return True
+        except OSError:
+            time.sleep(0.1)
+    return False
+
+
+def writer(manager, stop, enemies, rate):
+    """按 rate 次/秒更新部分敌人血量并发布快照"""
+    generation = 0
+    while not stop.is_set():
+        generation += 1
+        manager.sync_enemies([
+            {'enemy_uid': uid, 'enemy_hp': generation}
+            for uid in range(generation % 10 + 1, enemies + 1, 50)
+        ])
+        time.sleep(1 / rate)
+
+
+def client(path, use_etag, stop, counts, sizes):
+    """保持连接循环请求, use_etag 时携带上次的 ETag"""
+    conn = http.client.HTTPConnection(HOST, PORT, timeout=10)
+    etag = None
+    requests = 0
+    not_modified = 0
+    while not stop.is_set():
+        headers = {"If-None-Match": etag} if use_etag and etag else {}
+        conn.request("GET", path, headers=headers)
+        response = conn.getresponse()
+        body = response.read()
+        if response.status == 304:
+            not_modified += 1
+        else:
+            assert response.status == 200, response.status
+            sizes.append(len(body))
+            etag = response.getheader("ETag")
+        requests += 1
+    conn.close()
+    counts.append((requests, not_modified))
+
+
+def run(name, path, use_etag, args):
+    stop = threading.Event()
+    counts = []
+    sizes = []
+    threads = [threading.Thread(target=client, args=(path, use_etag, stop, counts, sizes))
+               for _ in range(args.clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    time.sleep(args.seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    requests = sum(c[0] for c in counts)
+    not_modified = sum(c[1] for c in counts)
+    size = sum(sizes) / len(sizes) if sizes else 0
+    print(f"{name:<24} {requests / elapsed:8.0f} 请求/秒  304: {not_modified:6d}  平均响应 {size:8.0f} 字节")
+    return requests / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="/enemies 接口负载测试")
+    parser.add_argument("--enemies", type=int, default=2000, help="敌人数")
+    parser.add_argument("--clients", type=int, default=4, help="并发客户端数")
+    parser.add_argument("--seconds", type=float, default=3.0, help="每项测试时长(秒)")
+    parser.add_argument("--publish-rate", type=float, default=10.0, help="每秒发布快照次数")
+    args = parser.parse_args()
+
+    manager = EnemyManager()
+    add_legacy_route(manager)
+    manager.start_server(HOST, PORT)
+    manager.sync_enemies([
+        {'enemy_uid': uid, 'enemy_name': f"怪物{uid % 50}", 'enemy_hp': uid, 'enemy_max_hp': 100000}
+        for uid in range(1, args.enemies + 1)
+    ])
+    if not wait_for_server():
+        print("API服务未启动")
+        return
+
+    # 正确性: 缓存的 JSON/protobuf 与旧实现内容一致
+    conn = http.client.HTTPConnection(HOST, PORT, timeout=10)
+    conn.request("GET", "/bench/legacy")
+    legacy = json.loads(conn.getresponse().read())
+    conn.request("GET", "/enemies")
+    assert json.loads(conn.getresponse().read()) == legacy, "缓存的 JSON 与旧实现不一致"
+    conn.request("GET", "/enemies?format=proto")
+    message = EnemyList.FromString(conn.getresponse().read())
+    assert {str(e.Uid): {'name': e.Name, 'hp': e.Hp, 'max_hp': e.MaxHp} for e in message.Enemies} == legacy, \
+        "protobuf 与旧实现不一致"
+    conn.close()
+
+    stop = threading.Event()
+    threading.Thread(target=writer, args=(manager, stop, args.enemies, args.publish_rate), daemon=True).start()
+
+    print(f"{args.enemies} 敌人, {args.clients} 并发客户端, 每秒发布 {args.publish_rate:g} 次快照")
+    legacy_rate = run("旧实现 (每次编码)", "/bench/legacy", False, args)
+    json_rate = run("缓存 JSON", "/enemies", False, args)
+    etag_rate = run("缓存 JSON + ETag", "/enemies", True, args)
+    proto_rate = run("缓存 protobuf", "/enemies?format=proto", False, args)
+    stop.set()
+    print(f"相对旧实现: 缓存 JSON {json_rate / legacy_rate:.1f}x, ETag {etag_rate / legacy_rate:.1f}x, "
+          f"protobuf {proto_rate / legacy_rate:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+"""
+敌人快照并发压力测试
+一个写入线程按固定速率调用 EnemyManager.sync_enemies, 多个读取线程同时读取快照并序列化,
+另有读取线程通过 /enemies 接口读取, 校验快照一致性
+
+用法:
+    python benchmarks/bench_enemy_snapshot.py [--rate 每秒更新数] [--seconds 时长] [--enemies 敌人数]
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from enemy_manager import EnemyManager
+
+API_URL = "http://127.0.0.1:1289/enemies"
+
+
+def check_snapshot(snapshot):
+    """校验快照内的血量配对和名称索引"""
+    enemies = snapshot.enemies
+    for uid, enemy in enemies.items():
+        # 写入方每次同时更新 hp 和 max_hp, 满足 max_hp == hp * 2 + 1
+        assert enemy['max_hp'] == enemy['hp'] * 2 + 1, f"血量不一致: {uid} {enemy}"
+    for name, uids in snapshot.by_name.items():
+        for uid in uids:
+            assert enemies[uid]['name'] == name, f"名称索引不一致: {uid} {name}"
+
+
+def writer(manager, stop, rate, enemies, result):
+    """按 rate 次/秒写入, 每10毫秒提交一批"""
+    rnd = random.Random(0)
+    batch = max(1, rate // 100)
+    interval = batch / rate
+    generation = 0
+    updates = 0
+    apply_time = 0.0
+    batches = 0
+    next_time = time.perf_counter()
+    while not stop.is_set():
+        deltas = []
+        for _ in range(batch):
+            generation += 1
+            uid = rnd.randint(1, enemies)
+            deltas.append({
+                'enemy_uid': uid,
+                'enemy_name': f"怪物{uid % 50}",
+                'enemy_type_id': uid % 50,
+                'enemy_hp': generation,
+                'enemy_max_hp': generation * 2 + 1,
+            })
+        start = time.perf_counter()
+        manager.sync_enemies(deltas, flow_id=batches % 4)
+        if rnd.random() < 0.01:
+            manager.clear_flow(rnd.randint(0, 3))
+        apply_time += time.perf_counter() - start
+        updates += batch
+        batches += 1
+        next_time += interval
+        delay = next_time - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+    result.update(updates=updates, batches=batches, apply_time=apply_time)
+
+
+def snapshot_reader(manager, stop, result):
+    """读取快照并序列化"""
+    reads = 0
+    last_version = 0
+    while not stop.is_set():
+        snapshot = manager.snapshot
+        assert snapshot.version >= last_version, "快照版本回退"
+        last_version = snapshot.version
+        check_snapshot(snapshot)
+        json.dumps(dict(snapshot.enemies))
+        reads += 1
+    result.setdefault('reads', []).append(reads)
+
+
+def http_reader(stop, result):
+    """通过API读取"""
+    reads = 0
+    last_version = 0
+    while not stop.is_set():
+        with urllib.request.urlopen(API_URL, timeout=5) as response:
+            version = int(response.headers["X-Snapshot-Version"])
+            enemies = json.loads(response.read())
+        assert version >= last_version, "快照版本回退"
+        last_version = version
+        for uid, enemy in enemies.items():
+            assert enemy['max_hp'] == enemy['hp'] * 2 + 1, f"血量不一致: {uid} {enemy}"
+        reads += 1
+    result.setdefault('http_reads', []).append(reads)
+
+
+def wait_for_server(timeout=10.0):
+    """等待API服务启动"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(API_URL, timeout=1).close()
+            return True
+        except OSError:
+            time.sleep(0.1)
+    return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description="敌人快照并发压力测试")
+    parser.add_argument("--rate", type=int, default=10000, help="每秒更新数")
+    parser.add_argument("--seconds", type=float, default=5.0, help="测试时长(秒)")
+    parser.add_argument("--enemies", type=int, default=2000, help="敌人UID范围")
+    parser.add_argument("--readers", type=int, default=2, help="快照读取线程数")
+    parser.add_argument("--http-readers", type=int, default=2, help="API读取线程数")
+    args = parser.parse_args()
+
+    manager = EnemyManager()
+    manager.start_server()
+    http_readers = args.http_readers if wait_for_server() else 0
+    if args.http_readers and not http_readers:
+        print("API服务未启动, 跳过API读取")
+
+    stop = threading.Event()
+    writer_result = {}
+    reader_result = {}
+    errors = []
+
+    def guarded(target, *target_args):
+        def run():
+            try:
+                target(*target_args)
+            except Exception as e:
+                errors.append(e)
+                stop.set()
+        return threading.Thread(target=run, daemon=True)
+
+    threads = [guarded(writer, manager, stop, args.rate, args.enemies, writer_result)]
+    threads += [guarded(snapshot_reader, manager, stop, reader_result) for _ in range(args.readers)]
+    threads += [guarded(http_reader, stop, reader_result) for _ in range(http_readers)]
+
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    stop.wait(args.seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    if errors:
+        raise errors[0]
+    check_snapshot(manager.snapshot)
+
+    print(f"写入: {writer_result['updates']} 次更新 ({writer_result['updates'] / elapsed:.0f} 次/秒), "
+          f"{writer_result['batches']} 批, "
+          f"平均每批 {writer_result['apply_time'] / writer_result['batches'] * 1e6:.1f} us (含发布快照)")
+    reads = sum(reader_result.get('reads', ()))
+    print(f"快照读取: {reads} 次 ({reads / elapsed:.0f} 次/秒)")
+    print(f"API读取: {sum(reader_result.get('http_reads', ()))} 次")
+    print(f"最终版本: {manager.snapshot.version}, 敌人数: {len(manager.snapshot.enemies)}, 校验通过")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+日志开销基准测试
+分别在关闭调试、调试(按调用位置限流)和调试(不限流)三种日志配置下,
+把合成的 SyncNearDeltaInfo 数据包交给 PacketCapture 解析, 对比解码吞吐
+
+每种配置在独立的子进程中运行, 控制台输出丢弃, 日志文件写入临时目录。
+
+用法:
+    python benchmarks/bench_logging.py [--frames 数据包数] [--entities 每条消息实体数]
+"""
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+# PacketParser 按相对路径读取 monster_names.json
+os.chdir(ROOT)
+
+MODES = {
+    'info': {'debug_mode': False},
+    'debug': {'debug_mode': True},
+    'debug-unlimited': {'debug_mode': True, 'debug_rate': 0},
+}
+
+
+def run_mode(mode, frames_count, entities, log_dir):
+    """在当前进程中按指定日志配置运行, 返回统计结果"""
+    from logging_config import setup_logging, stop_logging
+    setup_logging(log_dir=log_dir, **MODES[mode])
+
+    from bench_decode_pool import build_frame
+    from packet_capture import PacketCapture
+    from packet_parser import PacketParser
+
+    rnd = random.Random(0)
+    frames = [build_frame(rnd, entities) for _ in range(frames_count)]
+    updates = []
+    parser = PacketParser(lambda data: updates.append(data))
+    capture = PacketCapture()
+
+    def on_message(data):
+        if 'SyncNearDeltaInfo' in data:
+            parser.parse_SyncNearDeltaInfo(data['SyncNearDeltaInfo'], data.get('flow_id', 0))
+
+    capture.callback = on_message
+    start = time.perf_counter()
+    for frame in frames:
+        capture._analyze_payload(memoryview(frame), "TCP", 1)
+    elapsed = time.perf_counter() - start
+    # 等待后台线程写完日志
+    stop_logging()
+    drained = time.perf_counter() - start
+    assert len(updates) == frames_count, f"解析结果数量不一致: {len(updates)}"
+    log_bytes = sum(os.path.getsize(os.path.join(log_dir, name)) for name in os.listdir(log_dir))
+    return {'elapsed': elapsed, 'drained': drained, 'log_bytes': log_bytes}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="日志开销基准测试")
+    parser.add_argument("--frames", type=int, default=2000, help="数据包数")
+    parser.add_argument("--entities", type=int, default=20, help="每条消息的实体数")
+    parser.add_argument("--mode", choices=list(MODES), help=argparse.SUPPRESS)
+    parser.add_argument("--log-dir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        # 子进程: 输出一行JSON结果
+        result = run_mode(args.mode, args.frames, args.entities, args.log_dir)
+        sys.__stderr__.write(json.dumps(result) + "\n")
+        return
+
+    print(f"{args.frames} 个数据包, 每个 {args.entities} 个实体")
+    print(f"{'日志配置':<18} {'吞吐(包/秒)':>12} {'写完日志(秒)':>14} {'日志大小':>12}")
+    for mode in MODES:
+        with tempfile.TemporaryDirectory() as log_dir:
+            completed = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--mode", mode, "--log-dir", log_dir,
+                 "--frames", str(args.frames), "--entities", str(args.entities)],
+                stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, encoding="utf-8", check=True)
+        result = json.loads(completed.stderr.strip().splitlines()[-1])
+        print(f"{mode:<18} {args.frames / result['elapsed']:>12.0f} {result['drained']:>14.3f} "
+              f"{result['log_bytes'] / 1024:>10.0f} KB")
+
+
+if __name__ == "__main__":
+    main()
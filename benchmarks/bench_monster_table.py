@@ -0,0 +1,77 @@
+"""
+怪物名称表基准测试
+对比解析 monster_names.json 与映射编译后的二进制表的加载耗时,
+以及字符串键字典(旧实现)与按整数类型Id查询的耗时
+
+用法:
+    python benchmarks/bench_monster_table.py [-n 次数] [--lookups 查询次数]
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from monster_table import MonsterNameTable, load_table
+
+JSON_FILE = os.path.join(ROOT, "monster_names.json")
+
+
+def legacy_load():
+    """旧实现: 每次启动解析 JSON"""
+    with open(JSON_FILE, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def timed(func, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        result = func()
+    return (time.perf_counter() - start) / iterations, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="怪物名称表基准测试")
+    parser.add_argument("-n", "--iterations", type=int, default=200, help="加载次数")
+    parser.add_argument("--lookups", type=int, default=1000000, help="查询次数")
+    args = parser.parse_args()
+
+    # 确保二进制表已编译
+    load_table(directory=ROOT)
+    bin_file = os.path.splitext(JSON_FILE)[0] + ".bin"
+
+    legacy_time, names = timed(legacy_load, args.iterations)
+    table_time, table = timed(lambda: MonsterNameTable.open(bin_file), args.iterations)
+    for key, name in names.items():
+        assert table.get(int(key)) == name, f"名称不一致: {key}"
+    print(f"名称数: {len(names)}, JSON {os.path.getsize(JSON_FILE)} 字节, 二进制表 {os.path.getsize(bin_file)} 字节")
+    print(f"加载: JSON {legacy_time * 1e3:.3f} ms, 二进制表 {table_time * 1e3:.3f} ms, "
+          f"加速比 {legacy_time / table_time:.1f}x")
+
+    # 战斗中反复出现少量怪物, 偶尔出现表中没有的类型Id
+    rnd = random.Random(0)
+    ids = [int(key) for key in names]
+    active = rnd.sample(ids, 30) + [1, 2, 3]
+    queries = [rnd.choice(active) for _ in range(args.lookups)]
+
+    start = time.perf_counter()
+    for type_id in queries:
+        names.get(str(type_id))
+    legacy_lookup = (time.perf_counter() - start) / len(queries)
+
+    get = table.get
+    start = time.perf_counter()
+    for type_id in queries:
+        get(type_id)
+    table_lookup = (time.perf_counter() - start) / len(queries)
+    print(f"查询: 字符串键 {legacy_lookup * 1e9:.0f} ns, 整数类型Id {table_lookup * 1e9:.0f} ns, "
+          f"加速比 {legacy_lookup / table_lookup:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,289 @@
+"""
+解码流水线基准测试
+用 synthetic_traffic 生成的流量分别测试各阶段的吞吐和内存分配, 结果可保存为基线, 之后与基线对比
+
+    reassembly  TCP分段 -> 完整数据包 (PacketCapture._process_tcp_stream)
+    decode      完整数据包 -> star_pb2 消息 (FrameDown/Notify/zstd/protobuf, PacketCapture._analyze_payload)
+    parser      star_pb2 消息 -> 敌人变化 (PacketParser)
+    store       敌人变化 -> 敌人表 (EnemyManager.sync_enemies)
+    pipeline    TCP分段 -> 敌人表, 与 main.py 相同的回调串联以上各阶段(单线程, 不经过抓包队列)
+
+吞吐取多次运行中最快的一次。CPython 没有累计分配次数的接口, 内存分配用 tracemalloc 统计:
+    临时内存  处理每个输入时新分配的峰值字节数, 按消息平均
+    保留块数  处理完全部输入后新增的内存块数, 按消息平均; 持续大于0说明有缓存或泄漏
+
+用法:
+    python benchmarks/bench_pipeline.py [--messages 消息数] [--entities 每条消息实体数] [--attr-mix combat]
+        [--save 基线.json] [--baseline 基线.json [--tolerance 0.2]]
+"""
+
+import argparse
+import gc
+import json
+import logging
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+# PacketParser 按相对路径读取 monster_names.json
+os.chdir(ROOT)
+
+from synthetic_traffic import ATTR_MIXES, TrafficGenerator, segment
+
+# 敌人表更新时的 INFO 日志不计入
+logging.disable(logging.INFO)
+
+from enemy_manager import EnemyManager
+from main import StarResonanceMonitor
+from packet_capture import PacketCapture
+from packet_parser import PacketParser
+
+STAGES = ('reassembly', 'decode', 'parser', 'store', 'pipeline')
+FLOW = (bytes([10, 0, 0, 1]), 5003, bytes([192, 168, 1, 5]), 50000)
+
+
+class Stage:
+    """
+    一个被测阶段
+
+    setup(collect) 返回处理单个输入的函数, 每次运行前调用以重置状态;
+    collect 为 False 时丢弃输出, 统计内存时输出不计入保留块数。
+    result() 返回最近一次保留输出的运行的 (消息数, 敌人变化数)
+    """
+
+    def __init__(self, name, inputs, setup, result):
+        self.name = name
+        self.inputs = inputs
+        self.setup = setup
+        self.result = result
+
+
+def build_stages(args, packets, segments):
+    """构造各阶段, 前一阶段的输出作为后一阶段的输入"""
+    slim_decoder = args.decoder == 'slim'
+
+    # reassembly: 只重组, 完整数据包交给计数函数
+    reassembled = []
+
+    def setup_reassembly(collect=True):
+        capture = PacketCapture(slim_decoder=slim_decoder, trace_interval=0)
+        if collect:
+            reassembled.clear()
+            capture._analyze_payload = lambda packet, protocol, flow_id=0, trace=None: reassembled.append(bytes(packet))
+        else:
+            capture._analyze_payload = lambda packet, protocol, flow_id=0, trace=None: None
+
+        def step(payload):
+            capture._process_tcp_stream(FLOW, step.seq, payload)
+            step.seq += len(payload)
+        step.seq = 1000
+        return step
+
+    # decode: 完整数据包 -> star_pb2 消息
+    decoded = []
+    decode_capture = PacketCapture(slim_decoder=slim_decoder, trace_interval=0)
+
+    def setup_decode(collect=True):
+        if collect:
+            decoded.clear()
+        decode_capture.callback = decoded.append if collect else lambda data: None
+        return lambda packet: decode_capture._analyze_payload(memoryview(packet), "TCP", 1)
+
+    # parser: star_pb2 消息 -> 敌人变化
+    parsed = []
+    parser = PacketParser(parsed.append)
+
+    def setup_parser(collect=True):
+        if collect:
+            parsed.clear()
+        parser.callback = parsed.append if collect else lambda data: None
+
+        def step(data):
+            if 'SyncNearDeltaInfo' in data:
+                parser.parse_SyncNearDeltaInfo(data['SyncNearDeltaInfo'], data['flow_id'], data['time'])
+            if 'SyncNearEntities' in data:
+                parser.parse_SyncNearEntities(data['SyncNearEntities'], data['flow_id'], data['time'])
+        return step
+
+    # store: 敌人变化 -> 敌人表
+    manager = EnemyManager()
+    store_start = [0]
+
+    def setup_store(collect=True):
+        store_start[0] = manager.update_count
+        return lambda data: manager.sync_enemies(data['enemy_deltas'], data['flow_id'], data['time'])
+
+    # pipeline: 与 main.py 相同的回调
+    monitor = StarResonanceMonitor(slim_decoder=slim_decoder, trace_interval=0)
+    pipeline_capture = monitor.packet_capture
+    pipeline_capture.callback = monitor._on_callback
+    pipeline_start = [0]
+
+    def setup_pipeline(collect=True):
+        # 清空流表, 握手包重新识别游戏服务器
+        pipeline_capture.flows.clear()
+        pipeline_start[0] = monitor.enemy_manager.update_count
+
+        def step(payload):
+            pipeline_capture._process_tcp_stream(FLOW, step.seq, payload)
+            step.seq += len(payload)
+        step.seq = 1000
+        return step
+
+    return [
+        Stage('reassembly', segments, setup_reassembly, lambda: (len(reassembled), 0)),
+        Stage('decode', packets, setup_decode, lambda: (len(decoded), 0)),
+        Stage('parser', decoded, setup_parser,
+              lambda: (len(decoded), sum(len(data['enemy_deltas']) for data in parsed))),
+        Stage('store', parsed, setup_store, lambda: (len(decoded), manager.update_count - store_start[0])),
+        Stage('pipeline', segments, setup_pipeline,
+              lambda: (len(packets), monitor.enemy_manager.update_count - pipeline_start[0])),
+    ]
+
+
+def run_stage(stage, repeat):
+    """
+    运行一个阶段
+
+    Returns:
+        {"messages", "updates", "seconds", "messages_per_sec", "updates_per_sec",
+         "transient_bytes_per_message", "retained_blocks_per_message"}
+    """
+    # 第一次运行同时产生下一阶段的输入; 计时取最快的一次
+    best = None
+    for _ in range(repeat):
+        step = stage.setup()
+        inputs = stage.inputs
+        start = time.perf_counter()
+        for item in inputs:
+            step(item)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    messages, updates = stage.result()
+
+    # 内存分配: 单独运行一次并丢弃输出, tracemalloc 会显著降低速度
+    step = stage.setup(collect=False)
+    gc.collect()
+    blocks_before = sys.getallocatedblocks()
+    if hasattr(tracemalloc, 'reset_peak'):
+        transient = 0
+        tracemalloc.start()
+        for item in stage.inputs:
+            current = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            step(item)
+            transient += tracemalloc.get_traced_memory()[1] - current
+        tracemalloc.stop()
+    else:
+        # Python 3.8 没有 reset_peak, 只统计保留块数
+        transient = None
+        for item in stage.inputs:
+            step(item)
+    gc.collect()
+    retained = sys.getallocatedblocks() - blocks_before
+
+    return {
+        'messages': messages,
+        'updates': updates,
+        'seconds': best,
+        'messages_per_sec': messages / best,
+        'updates_per_sec': updates / best,
+        'transient_bytes_per_message': transient / messages if transient is not None else None,
+        'retained_blocks_per_message': retained / messages,
+    }
+
+
+def compare(results, baseline, tolerance):
+    """
+    与基线对比
+
+    Returns:
+        是否有阶段退化: 吞吐低于基线 (1 - tolerance) 倍, 或临时内存高于基线 (1 + tolerance) 倍
+    """
+    regressed = False
+    print(f"\n与基线对比 (容差 {tolerance:.0%}):")
+    if baseline.get('config') != results['config']:
+        print("  警告: 流量参数与基线不同, 对比结果仅供参考")
+    for name, result in results['stages'].items():
+        base = baseline['stages'].get(name)
+        if base is None:
+            continue
+        speed = result['messages_per_sec'] / base['messages_per_sec'] - 1
+        flags = []
+        if speed < -tolerance:
+            flags.append("吞吐退化")
+        line = f"  {name:<12} 吞吐 {speed:+7.1%}"
+        if result['transient_bytes_per_message'] is not None and base['transient_bytes_per_message'] is not None:
+            memory = (result['transient_bytes_per_message'] + 1) / (base['transient_bytes_per_message'] + 1) - 1
+            if memory > tolerance:
+                flags.append("内存退化")
+            line += f"  临时内存 {memory:+7.1%}"
+        regressed = regressed or bool(flags)
+        print(f"{line}  {' '.join(flags) or '正常'}")
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="解码流水线基准测试")
+    parser.add_argument("--messages", type=int, default=2000, help="应用层消息数")
+    parser.add_argument("--entities", type=int, default=20, help="每条 SyncNearDeltaInfo 的实体数")
+    parser.add_argument("--monsters", type=int, default=50, help="场景中同时存在的怪物数")
+    parser.add_argument("--attr-mix", choices=ATTR_MIXES, default='combat', help="属性组合")
+    parser.add_argument("--zstd-ratio", type=float, default=0.5, help="zstd 压缩的消息比例")
+    parser.add_argument("--segment", type=int, default=1460, help="TCP分段长度")
+    parser.add_argument("--decoder", choices=('proto', 'slim'), default='proto', help="AOI同步消息解码方式")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子")
+    parser.add_argument("--repeat", type=int, default=5, help="每个阶段的运行次数")
+    parser.add_argument("--save", metavar="FILE", help="把结果保存为基线")
+    parser.add_argument("--baseline", metavar="FILE", help="与基线对比, 有退化时返回非0退出码")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="与基线对比的容差, 吞吐在不同运行间约有 ±10%% 的波动")
+    args = parser.parse_args()
+
+    config = {key: getattr(args, key) for key in
+              ('messages', 'entities', 'monsters', 'attr_mix', 'zstd_ratio', 'segment', 'decoder', 'seed')}
+    generator = TrafficGenerator(args.seed, args.entities, args.monsters, attr_mix=args.attr_mix,
+                                 zstd_ratio=args.zstd_ratio)
+    packets = generator.messages(args.messages)
+    segments = segment(packets, args.segment)
+    print(f"{len(packets)} 条消息, {len(segments)} 个TCP分段, {sum(map(len, segments))} 字节, "
+          f"属性组合 {args.attr_mix}, 解码方式 {args.decoder}")
+
+    stages = {}
+    print(f"{'阶段':<10} {'消息/秒':>10} {'敌人变化/秒':>10} {'临时内存/消息':>10} {'保留块数/消息':>10}")
+    for stage in build_stages(args, packets, segments):
+        result = run_stage(stage, args.repeat)
+        stages[stage.name] = result
+        updates = f"{result['updates_per_sec']:.0f}" if result['updates'] else "-"
+        transient = result['transient_bytes_per_message']
+        transient = f"{transient / 1024:.1f} KB" if transient is not None else "-"
+        print(f"{stage.name:<12} {result['messages_per_sec']:>12.0f} {updates:>15} "
+              f"{transient:>18} {result['retained_blocks_per_message']:>16.2f}")
+
+    # 正确性校验: 各阶段的消息数和敌人变化数与生成的流量一致
+    assert stages['reassembly']['messages'] == len(packets), "重组出的数据包数不一致"
+    for name in ('parser', 'store', 'pipeline'):
+        assert stages[name]['updates'] == generator.expected_updates, \
+            f"{name}: 敌人变化数 {stages[name]['updates']} != {generator.expected_updates}"
+
+    results = {
+        'config': config,
+        'python': platform.python_version(),
+        'stages': stages,
+    }
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"基线已保存到 {args.save}")
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""
+启动耗时基准测试
+分别以子进程运行 main.py 的几种启动方式, 统计耗时,
+并用 python -X importtime 找出导入耗时最多的模块
+
+    import  只导入 main
+    list    main.py --list, 到进程退出
+    auto    main.py --auto, 到抓包启动("监控已启动")以及API服务可以访问(需要抓包权限)
+
+用法:
+    python benchmarks/bench_startup.py [--runs 次数] [--scenarios import list auto] [--json 结果文件]
+"""
+
+import argparse
+import json
+import os
+import queue
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+API_URL = "http://127.0.0.1:1289/enemies/stats"
+STARTED_MARKER = "监控已启动"
+SCENARIOS = {
+    'import': ['-c', 'import main'],
+    'list': ['main.py', '--list'],
+    'auto': ['main.py', '--auto'],
+}
+
+
+def api_ready() -> bool:
+    try:
+        urllib.request.urlopen(API_URL, timeout=0.2).close()
+        return True
+    except OSError:
+        return False
+
+
+def run_to_exit(args, stderr):
+    """运行到进程退出"""
+    start = time.perf_counter()
+    subprocess.run([sys.executable] + args, cwd=ROOT, stdout=subprocess.DEVNULL, stderr=stderr, check=True)
+    return {'total': time.perf_counter() - start}
+
+
+def run_until_ready(args, stderr, timeout):
+    """运行到抓包启动且API服务可以访问, 然后结束进程"""
+    start = time.perf_counter()
+    process = subprocess.Popen([sys.executable, '-u'] + args, cwd=ROOT, stdout=subprocess.PIPE,
+                               stderr=stderr, encoding='utf-8', errors='replace')
+    lines = queue.Queue()
+
+    def read_output():
+        for line in process.stdout:
+            lines.put(line)
+        lines.put(None)
+
+    threading.Thread(target=read_output, daemon=True).start()
+    result = {}
+    deadline = start + timeout
+    try:
+        while 'capture' not in result:
+            line = lines.get(timeout=max(0.0, deadline - time.perf_counter()))
+            if line is None:
+                raise RuntimeError("进程提前退出, 可能没有抓包权限")
+            if STARTED_MARKER in line:
+                result['capture'] = time.perf_counter() - start
+        while not api_ready():
+            if time.perf_counter() > deadline:
+                raise RuntimeError("API服务未启动")
+            time.sleep(0.01)
+        result['total'] = time.perf_counter() - start
+    except queue.Empty:
+        raise RuntimeError(f"{timeout} 秒内未启动")
+    finally:
+        process.terminate()
+        process.wait()
+    return result
+
+
+def run(name, stderr=subprocess.DEVNULL, timeout=30.0, importtime=False):
+    args = SCENARIOS[name]
+    if importtime:
+        args = ['-X', 'importtime'] + args
+    if name == 'auto':
+        return run_until_ready(args, stderr, timeout)
+    return run_to_exit(args, stderr)
+
+
+def parse_importtime(text, top=8):
+    """
+    汇总 -X importtime 输出
+
+    Returns:
+        [(顶层包名, 累计耗时秒)], 按耗时降序; 只统计直接由 import 语句触发的顶层导入
+    """
+    packages = {}
+    for line in text.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3 or not fields[1].strip().isdigit():
+            continue
+        name = fields[2][1:]
+        if name.startswith(" "):
+            # 缩进表示被其他模块间接导入, 已计入上层模块
+            continue
+        package = name.split(".")[0]
+        packages[package] = packages.get(package, 0) + int(fields[1]) / 1e6
+    return sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="启动耗时基准测试")
+    parser.add_argument("--runs", type=int, default=5, help="每种启动方式的运行次数")
+    parser.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS),
+                        help="测试的启动方式")
+    parser.add_argument("--timeout", type=float, default=30.0, help="auto 等待启动的最长时间(秒)")
+    parser.add_argument("--json", metavar="FILE", help="把结果写入JSON文件, 便于跟踪变化")
+    args = parser.parse_args()
+
+    if 'auto' in args.scenarios and api_ready():
+        print("端口 1289 已被占用, 跳过 auto")
+        args.scenarios = [name for name in args.scenarios if name != 'auto']
+
+    results = {}
+    for name in args.scenarios:
+        try:
+            # 第一次运行预热文件缓存和名称表编译, 不计入结果
+            run(name, timeout=args.timeout)
+            runs = [run(name, timeout=args.timeout) for _ in range(args.runs)]
+            with tempfile.TemporaryFile(mode='w+', encoding='utf-8') as stderr:
+                run(name, stderr, args.timeout, importtime=True)
+                stderr.seek(0)
+                imports = parse_importtime(stderr.read())
+        except (RuntimeError, subprocess.CalledProcessError) as e:
+            print(f"{name}: 失败, {e}")
+            continue
+
+        result = {key: {'min': min(r[key] for r in runs), 'median': statistics.median(r[key] for r in runs)}
+                  for key in runs[0]}
+        result['imports'] = dict(imports)
+        results[name] = result
+
+        timings = ", ".join(f"{'抓包启动' if key == 'capture' else '总计'} 中位数 {value['median'] * 1000:.0f} ms "
+                            f"(最快 {value['min'] * 1000:.0f} ms)"
+                            for key, value in result.items() if key != 'imports')
+        print(f"{name}: {timings}")
+        print("  导入耗时: " + ", ".join(f"{package} {seconds * 1000:.0f} ms" for package, seconds in imports))
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"结果已写入 {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+TCP流重组基准测试
+对比旧的 bytes 拼接/切片方式与 StreamBuffer 重组大帧的耗时
+
+用法:
+    python benchmarks/bench_stream_buffer.py [--frames 帧数] [--frame-size 帧长度] [--segment 分段长度]
+"""
+
+import argparse
+import os
+import struct
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from stream_buffer import StreamBuffer
+
+
+def build_segments(frames: int, frame_size: int, segment: int):
+    """构造按 segment 长度切分的长度前缀帧流"""
+    body = b"\x5a" * (frame_size - 4)
+    stream = (struct.pack(">I", frame_size) + body) * frames
+    return [stream[i:i + segment] for i in range(0, len(stream), segment)]
+
+
+def legacy_reassemble(segments):
+    """旧实现: 每个分段拼接整个缓冲区, 每次取帧复制剩余数据"""
+    data = b""
+    extracted = 0
+    for segment in segments:
+        data = data + segment if data else segment
+        while len(data) > 4:
+            packet_size = struct.unpack(">I", data[:4])[0]
+            if len(data) < packet_size:
+                break
+            packet = data[:packet_size]
+            data = data[packet_size:]
+            extracted += len(packet)
+    return extracted
+
+
+def buffer_reassemble(segments):
+    """StreamBuffer 实现"""
+    data = StreamBuffer()
+    extracted = 0
+    for segment in segments:
+        data.append(segment)
+        while len(data) > 4:
+            packet_size = data.peek_uint32()
+            if len(data) < packet_size:
+                break
+            packet = data.read(packet_size)
+            extracted += len(packet)
+    return extracted
+
+
+def bench(func, segments):
+    start = time.perf_counter()
+    extracted = func(segments)
+    return time.perf_counter() - start, extracted
+
+
+def main():
+    parser = argparse.ArgumentParser(description="TCP流重组基准测试")
+    parser.add_argument("--frames", type=int, default=8, help="帧数")
+    parser.add_argument("--frame-size", type=int, default=1024 * 1024, help="帧长度(字节)")
+    parser.add_argument("--segment", type=int, default=1460, help="TCP分段长度(字节)")
+    args = parser.parse_args()
+
+    segments = build_segments(args.frames, args.frame_size, args.segment)
+    total = args.frames * args.frame_size
+    print(f"{args.frames} 帧 x {args.frame_size} 字节, 分段 {args.segment} 字节, 共 {len(segments)} 个分段")
+
+    legacy_time, legacy_bytes = bench(legacy_reassemble, segments)
+    buffer_time, buffer_bytes = bench(buffer_reassemble, segments)
+    assert legacy_bytes == buffer_bytes == total
+
+    print(f"bytes 拼接:    {legacy_time * 1e3:10.2f} ms ({total / legacy_time / 1e6:8.1f} MB/s)")
+    print(f"StreamBuffer:  {buffer_time * 1e3:10.2f} ms ({total / buffer_time / 1e6:8.1f} MB/s)")
+    print(f"加速比:        {legacy_time / buffer_time:10.1f}x")
+
+
+if __name__ == "__main__":
+    main()
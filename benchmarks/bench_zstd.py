@@ -0,0 +1,84 @@
+"""
+zstd解压基准测试
+对比每条消息新建解压上下文(旧实现)与 ZstdDecoder 复用上下文的耗时,
+负载为 200B-20KB 的 SyncNearDeltaInfo 消息
+
+用法:
+    python benchmarks/bench_zstd.py [-n 次数]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import zstandard as zstd
+
+from packet_parser import AttrType
+from star_pb2 import SyncNearDeltaInfo
+from zstd_decoder import ZstdDecoder
+
+
+def encode_varint(value: int) -> bytes:
+    out = bytearray()
+    while True:
+        byte = value & 0x7f
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def build_payload(rnd: random.Random, target_size: int) -> bytes:
+    """构造约 target_size 字节的 SyncNearDeltaInfo"""
+    message = SyncNearDeltaInfo()
+    while message.ByteSize() < target_size:
+        delta = message.DeltaInfos.add()
+        delta.Uuid = (rnd.randint(1, 100000) << 16) | rnd.choice((64, 640))
+        for attr_id in (AttrType["AttrHp"], AttrType["AttrMaxHp"], AttrType["AttrId"]):
+            attr = delta.Attrs.Attrs.add()
+            attr.Id = attr_id
+            attr.RawData = encode_varint(rnd.randint(0, 1000000))
+    return message.SerializeToString()
+
+
+def legacy_decompress(data: bytes) -> bytes:
+    """旧实现: 每条消息新建解压上下文"""
+    dctx = zstd.ZstdDecompressor()
+    return dctx.decompress(data, max_output_size=1024 * 1024)
+
+
+def bench(func, payloads, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        for data in payloads:
+            func(data)
+    return (time.perf_counter() - start) / (iterations * len(payloads))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="zstd解压基准测试")
+    parser.add_argument("-n", "--iterations", type=int, default=2000, help="每个负载的解压次数")
+    args = parser.parse_args()
+
+    rnd = random.Random(0)
+    print(f"{'原始长度':>10} {'压缩长度':>10} {'带长度':>6} {'旧实现(us)':>12} {'复用(us)':>10} {'加速比':>8}")
+    for size in (200, 1000, 5000, 20000):
+        raw = build_payload(rnd, size)
+        for with_size in (True, False):
+            compressed = zstd.ZstdCompressor(write_content_size=with_size).compress(raw)
+            decoder = ZstdDecoder()
+            assert decoder.decompress(compressed) == legacy_decompress(compressed) == raw
+            legacy = bench(legacy_decompress, [compressed], args.iterations)
+            reused = bench(decoder.decompress, [compressed], args.iterations)
+            print(f"{len(raw):>10} {len(compressed):>10} {'是' if with_size else '否':>6} "
+                  f"{legacy * 1e6:>12.2f} {reused * 1e6:>10.2f} {legacy / reused:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
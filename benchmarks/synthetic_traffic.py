@@ -0,0 +1,319 @@
+"""
+合成游戏流量生成器
+用 star_pb2 构造与游戏服务器下行数据格式相同的流量, 不需要运行游戏即可测试解码流水线
+
+    消息    SyncNearEntities(怪物出现/消失) 与 SyncNearDeltaInfo(属性变化),
+            包装为 Notify(serviceUuid 0x63335342), 可选 zstd 压缩, 可选再包装为 FrameDown
+    数据流  以识别游戏服务器用的握手包开头, 之后的数据按指定长度切分为TCP分段
+    pcap    加上以太网/IPv4/TCP头部写入 pcap 文件, 可用 main.py --replay 回放
+
+场景中保持固定数量的怪物, 怪物受到伤害后血量下降, 血量归零后消失并由新出现的怪物补充。
+同一随机种子和参数生成的流量完全相同。
+
+用法:
+    python benchmarks/synthetic_traffic.py 输出.pcap [--messages 消息数] [--entities 每条消息实体数]
+        [--attr-mix combat] [--zstd-ratio 0.5] [--segment 1460]
+"""
+
+import argparse
+import os
+import random
+import struct
+import sys
+from typing import Dict, Iterable, List, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import zstandard as zstd
+
+from packet_parser import AttrType
+from star_pb2 import SyncNearDeltaInfo, SyncNearEntities
+
+GAME_SERVICE_UUID = 0x0000000063335342
+SYNC_NEAR_ENTITIES = 0x06
+SYNC_NEAR_DELTA_INFO = 0x2d
+MSG_NOTIFY = 2
+MSG_FRAME_DOWN = 6
+ZSTD_FLAG = 0x8000
+# 实体Uuid低16位: 怪物与玩家
+ENTITY_MONSTER = 64
+ENTITY_PLAYER = 640
+
+# 属性组合: 每个实体变化携带的属性
+#   hp      只有血量, 战斗中最常见的变化
+#   combat  血量, 偶尔带上类型Id和最大血量
+#   full    类型Id、血量、最大血量、等级、战力, 与怪物出现时相同
+#   noisy   full 之外还有大量 PacketParser 不使用的属性和 MapAttrs
+ATTR_MIXES = ('hp', 'combat', 'full', 'noisy')
+_EXTRA_ATTRS = (AttrType["AttrCri"], AttrType["AttrLucky"], AttrType["AttrElementFlag"],
+                AttrType["AttrEnergyFlag"], AttrType["AttrReductionLevel"], AttrType["AttrRankLevel"])
+
+# 以太网/IPv4/TCP头部
+_ETHERNET = struct.Struct('!6s6sH')
+_IPV4 = struct.Struct('!BBHHHBBH4s4s')
+_TCP = struct.Struct('!HHIIBBHHH')
+_PCAP_HEADER = struct.Struct('<IHHiIII')
+_PCAP_RECORD = struct.Struct('<IIII')
+SERVER = (bytes([10, 0, 0, 1]), 5003)
+CLIENT = (bytes([192, 168, 1, 5]), 50000)
+
+
+def encode_varint(value: int) -> bytes:
+    value &= (1 << 64) - 1
+    out = bytearray()
+    while True:
+        byte = value & 0x7f
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def frame_notify(method_id: int, payload: bytes, compress: bool = False, stub_id: int = 0) -> bytes:
+    """构造带长度前缀的 Notify 消息"""
+    if compress:
+        payload = zstd.ZstdCompressor().compress(payload)
+    packet_type = MSG_NOTIFY | (ZSTD_FLAG if compress else 0)
+    body = struct.pack('>HQII', packet_type, GAME_SERVICE_UUID, stub_id, method_id) + payload
+    return struct.pack('>I', len(body) + 4) + body
+
+
+def frame_down(inner: bytes, sequence: int = 0, compress: bool = False) -> bytes:
+    """把一条或多条带长度前缀的消息包装为 FrameDown"""
+    if compress:
+        inner = zstd.ZstdCompressor().compress(inner)
+    packet_type = MSG_FRAME_DOWN | (ZSTD_FLAG if compress else 0)
+    body = struct.pack('>HI', packet_type, sequence) + inner
+    return struct.pack('>I', len(body) + 4) + body
+
+
+def handshake() -> bytes:
+    """PacketCapture 识别游戏服务器用的第一个数据包"""
+    return frame_down(frame_notify(0, b''))
+
+
+class TrafficGenerator:
+    """
+    合成流量生成器
+
+    expected_updates 为已生成的消息交给 PacketParser 后应产生的敌人变化数,
+    用于校验解码结果。
+    """
+
+    def __init__(self, seed: int = 0, entities: int = 20, monsters: int = 50, monster_ratio: float = 0.8,
+                 attr_mix: str = 'combat', zstd_ratio: float = 0.5, frame_down_ratio: float = 1.0,
+                 max_hp: int = 1000000):
+        """
+        初始化
+
+        Args:
+            seed: 随机种子
+            entities: 每条 SyncNearDeltaInfo 的实体数
+            monsters: 场景中同时存在的怪物数
+            monster_ratio: 实体变化中怪物的比例, 其余为玩家
+            attr_mix: 属性组合, 见 ATTR_MIXES
+            zstd_ratio: zstd 压缩的消息比例
+            frame_down_ratio: 包装为 FrameDown 的消息比例, 其余直接发送 Notify
+            max_hp: 怪物最大血量
+        """
+        if attr_mix not in ATTR_MIXES:
+            raise ValueError(f"未知的属性组合: {attr_mix}")
+        self.rnd = random.Random(seed)
+        self.entities = entities
+        self.monsters = monsters
+        self.monster_ratio = monster_ratio
+        self.attr_mix = attr_mix
+        self.zstd_ratio = zstd_ratio
+        self.frame_down_ratio = frame_down_ratio
+        self.max_hp = max_hp
+        self.type_ids = self._load_type_ids()
+        # 怪物UID -> [类型Id, 血量]
+        self.live: Dict[int, List[int]] = {}
+        self.dead: List[int] = []
+        self.players = [self.rnd.randint(1, 1 << 30) for _ in range(8)]
+        self.next_uid = 1000
+        self.sequence = 0
+        self.expected_updates = 0
+        self.message_count = 0
+
+    @staticmethod
+    def _load_type_ids() -> List[int]:
+        """monster_names.json 中的怪物类型Id, 解析出的敌人带有名称"""
+        try:
+            from monster_table import load_table
+            type_ids = sorted(load_table(directory=ROOT).to_dict())
+        except (OSError, ValueError):
+            type_ids = []
+        return type_ids or list(range(101, 201))
+
+    def _attr(self, collection, attr_id: int, value):
+        attr = collection.Attrs.add()
+        attr.Id = attr_id
+        attr.RawData = value if isinstance(value, bytes) else encode_varint(value)
+
+    def _fill_attrs(self, collection, type_id: Optional[int], hp: int, mix: str):
+        rnd = self.rnd
+        if mix == 'hp' or (mix == 'combat' and rnd.random() >= 0.1):
+            self._attr(collection, AttrType["AttrHp"], hp)
+            return
+        self._attr(collection, AttrType["AttrId"], type_id if type_id is not None else rnd.randint(1, 10))
+        self._attr(collection, AttrType["AttrHp"], hp)
+        self._attr(collection, AttrType["AttrMaxHp"], self.max_hp)
+        if mix == 'combat':
+            return
+        self._attr(collection, AttrType["AttrLevel"], rnd.randint(1, 60))
+        self._attr(collection, AttrType["AttrFightPoint"], rnd.randint(1000, 100000))
+        if mix == 'noisy':
+            for attr_id in rnd.sample(_EXTRA_ATTRS, rnd.randint(2, len(_EXTRA_ATTRS))):
+                self._attr(collection, attr_id, rnd.randint(0, 1 << 31))
+            for _ in range(rnd.randint(1, 3)):
+                map_attr = collection.MapAttrs.add()
+                map_attr.Id = rnd.randint(1, 100)
+                value = map_attr.Attrs.add()
+                value.Key = b"k" * 8
+                value.Value = b"v" * 32
+
+    def _spawn(self, message: SyncNearEntities):
+        """补充怪物到 monsters 个, 并发送已死亡怪物的消失"""
+        for uid in self.dead:
+            message.Disappear.add().Uuid = (uid << 16) | ENTITY_MONSTER
+        self.expected_updates += len(self.dead)
+        self.dead = []
+        while len(self.live) < self.monsters:
+            uid = self.next_uid
+            self.next_uid += 1
+            type_id = self.rnd.choice(self.type_ids)
+            self.live[uid] = [type_id, self.max_hp]
+            entity = message.Appear.add()
+            entity.Uuid = (uid << 16) | ENTITY_MONSTER
+            self._fill_attrs(entity.Attrs, type_id, self.max_hp, 'noisy' if self.attr_mix == 'noisy' else 'full')
+            self.expected_updates += 1
+
+    def near_entities(self) -> bytes:
+        """生成一条 SyncNearEntities, 未生成过消息时也用它让怪物出现"""
+        message = SyncNearEntities()
+        self._spawn(message)
+        return message.SerializeToString()
+
+    def delta_info(self) -> bytes:
+        """生成一条 SyncNearDeltaInfo: 随机实体受到伤害"""
+        rnd = self.rnd
+        message = SyncNearDeltaInfo()
+        uids = list(self.live)
+        for _ in range(self.entities):
+            delta = message.DeltaInfos.add()
+            if uids and rnd.random() < self.monster_ratio:
+                uid = rnd.choice(uids)
+                state = self.live[uid]
+                if state[1] > 0:
+                    state[1] = max(0, state[1] - rnd.randint(1, self.max_hp // 20))
+                    if state[1] == 0:
+                        self.dead.append(uid)
+                delta.Uuid = (uid << 16) | ENTITY_MONSTER
+                self._fill_attrs(delta.Attrs, state[0], state[1], self.attr_mix)
+                self.expected_updates += 1
+            else:
+                delta.Uuid = (rnd.choice(self.players) << 16) | ENTITY_PLAYER
+                self._fill_attrs(delta.Attrs, None, rnd.randint(0, self.max_hp), self.attr_mix)
+            delta.SkillEffects.Uuid = rnd.randint(1, 1 << 30)
+            delta.SkillEffects.TotalDamage = rnd.randint(1, 1 << 20)
+            for _ in range(rnd.randint(0, 4)):
+                delta.SkillEffects.Damages.add()
+        for uid in self.dead:
+            self.live.pop(uid, None)
+        return message.SerializeToString()
+
+    def next_message(self) -> bytes:
+        """
+        生成一个完整的应用层数据包
+
+        第一条和有怪物死亡后的消息为 SyncNearEntities, 其余为 SyncNearDeltaInfo
+        """
+        rnd = self.rnd
+        if not self.live or self.dead:
+            method_id, payload = SYNC_NEAR_ENTITIES, self.near_entities()
+        else:
+            method_id, payload = SYNC_NEAR_DELTA_INFO, self.delta_info()
+        self.message_count += 1
+        packet = frame_notify(method_id, payload, compress=rnd.random() < self.zstd_ratio)
+        if rnd.random() < self.frame_down_ratio:
+            self.sequence += 1
+            packet = frame_down(packet, self.sequence, compress=rnd.random() < self.zstd_ratio)
+        return packet
+
+    def messages(self, count: int) -> List[bytes]:
+        """生成 count 个应用层数据包"""
+        return [self.next_message() for _ in range(count)]
+
+
+def segment(packets: Iterable[bytes], size: int = 1460) -> List[bytes]:
+    """
+    把应用层数据包拼接为TCP流并切分为分段
+
+    Returns:
+        TCP负载列表, 第一个为单独的握手包
+    """
+    stream = b''.join(packets)
+    return [handshake()] + [stream[offset:offset + size] for offset in range(0, len(stream), size)]
+
+
+def build_frames(segments: Iterable[bytes], seq: int = 1000) -> List[bytes]:
+    """为TCP分段加上以太网/IPv4/TCP头部, 方向为服务器到客户端"""
+    frames = []
+    for ident, payload in enumerate(segments):
+        tcp = _TCP.pack(SERVER[1], CLIENT[1], seq & 0xffffffff, 0, 5 << 4, 0x18, 65535, 0, 0)
+        ip = _IPV4.pack(0x45, 0, 20 + len(tcp) + len(payload), ident & 0xffff, 0x4000, 64, 6, 0,
+                        SERVER[0], CLIENT[0])
+        ip = ip[:10] + struct.pack('!H', _ipv4_checksum(ip)) + ip[12:]
+        ethernet = _ETHERNET.pack(b'\x02\x00\x00\x00\x00\x02', b'\x02\x00\x00\x00\x00\x01', 0x0800)
+        frames.append(ethernet + ip + tcp + payload)
+        seq += len(payload)
+    return frames
+
+
+def _ipv4_checksum(header: bytes) -> int:
+    total = sum(struct.unpack('!10H', header))
+    total = (total & 0xffff) + (total >> 16)
+    total = (total & 0xffff) + (total >> 16)
+    return ~total & 0xffff
+
+
+def write_pcap(path: str, frames: Iterable[bytes], start_time: float = 1700000000.0, interval: float = 0.001):
+    """写入以太网链路层的 pcap 文件, 数据帧时间间隔为 interval 秒"""
+    with open(path, 'wb') as f:
+        f.write(_PCAP_HEADER.pack(0xa1b2c3d4, 2, 4, 0, 0, 65535, 1))
+        for index, frame in enumerate(frames):
+            micros = int(round((start_time + index * interval) * 1e6))
+            f.write(_PCAP_RECORD.pack(micros // 1000000, micros % 1000000, len(frame), len(frame)))
+            f.write(frame)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="合成游戏流量生成器")
+    parser.add_argument("output", help="输出的 pcap 文件")
+    parser.add_argument("--messages", type=int, default=2000, help="应用层消息数")
+    parser.add_argument("--entities", type=int, default=20, help="每条 SyncNearDeltaInfo 的实体数")
+    parser.add_argument("--monsters", type=int, default=50, help="场景中同时存在的怪物数")
+    parser.add_argument("--monster-ratio", type=float, default=0.8, help="实体变化中怪物的比例")
+    parser.add_argument("--attr-mix", choices=ATTR_MIXES, default='combat', help="属性组合")
+    parser.add_argument("--zstd-ratio", type=float, default=0.5, help="zstd 压缩的消息比例")
+    parser.add_argument("--frame-down-ratio", type=float, default=1.0, help="包装为 FrameDown 的消息比例")
+    parser.add_argument("--segment", type=int, default=1460, help="TCP分段长度")
+    parser.add_argument("--interval", type=float, default=0.001, help="数据帧时间间隔(秒)")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子")
+    args = parser.parse_args()
+
+    generator = TrafficGenerator(args.seed, args.entities, args.monsters, args.monster_ratio,
+                                 args.attr_mix, args.zstd_ratio, args.frame_down_ratio)
+    packets = generator.messages(args.messages)
+    frames = build_frames(segment(packets, args.segment))
+    write_pcap(args.output, frames, interval=args.interval)
+    print(f"已写入 {args.output}: {len(packets)} 条消息, {len(frames)} 个数据帧, "
+          f"{sum(len(frame) for frame in frames)} 字节, 预计敌人更新 {generator.expected_updates} 次")
+
+
+if __name__ == "__main__":
+    main()
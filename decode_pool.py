@@ -0,0 +1,183 @@
+"""
+多进程解码模块
+将完整的应用层数据包分发到多个工作进程解压和解析, 主进程按提交顺序应用解码结果
+"""
+
+import multiprocessing as mp
+import queue
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from latency import DECODE_POOL
+from logging_config import get_logger
+
+logger = get_logger(__name__)
+
+# 工作进程内的解码器
+_worker_capture = None
+_worker_parser = None
+_worker_results = []
+
+
+def _init_worker(capture_options: Dict[str, Any], parser_options: Dict[str, Any]):
+    """
+    工作进程初始化
+
+    Args:
+        capture_options: 创建工作进程内 PacketCapture 的参数
+        parser_options: 创建工作进程内 PacketParser 的参数
+    """
+    global _worker_capture, _worker_parser
+    from packet_capture import PacketCapture
+    from packet_parser import PacketParser
+
+    _worker_parser = PacketParser(_worker_results.append, **parser_options)
+    _worker_capture = PacketCapture(**capture_options)
+    _worker_capture.callback = _on_worker_message
+
+
+def _on_worker_message(data: Dict[str, Any]):
+    """工作进程内的消息回调, 只解析敌人相关消息"""
+    flow_id = data.get('flow_id', 0)
+    timestamp = data.get('time')
+    trace = data.get('trace')
+    if 'SyncNearDeltaInfo' in data:
+        _worker_parser.parse_SyncNearDeltaInfo(data['SyncNearDeltaInfo'], flow_id, timestamp, trace)
+    if 'SyncNearEntities' in data:
+        _worker_parser.parse_SyncNearEntities(data['SyncNearEntities'], flow_id, timestamp, trace)
+
+
+def decode_frames(frames: List[Tuple[int, bytes, float, Any]]
+                  ) -> Tuple[int, List[Dict[str, Any]], Dict[str, Any], Dict[int, int]]:
+    """
+    在工作进程中解码一批数据包
+
+    Args:
+        frames: (游戏连接编号, 完整数据包, 数据包时间, 延迟追踪) 列表, 未采样的数据包延迟追踪为None
+
+    Returns:
+        (解析的应用层消息数, 敌人数据列表, 本批次的zstd解压统计, 本批次按methodId统计的消息数)
+    """
+    start_messages = _worker_capture.message_count
+    start_zstd = _worker_capture.zstd_decoder.stats()
+    # 每批都清零, 返回值即为本批次的统计
+    _worker_capture.method_counts = method_counts = {}
+    for flow_id, frame, packet_time, trace in frames:
+        # 使用主进程的数据包时间, 回放时与单进程解码的时间一致
+        _worker_capture._clock_time = packet_time
+        if trace is None:
+            _worker_capture._analyze_payload(frame, "TCP", flow_id)
+            continue
+        # 两个进程的时钟不可比较: 进程内的阶段按本进程时钟计时, 返回前恢复主进程提交时的时间
+        submitted = trace.last
+        trace.last = time.perf_counter()
+        _worker_capture._analyze_payload(frame, "TCP", flow_id, trace)
+        trace.last = submitted
+    results = list(_worker_results)
+    _worker_results.clear()
+    zstd_stats = _worker_capture.zstd_decoder.stats()
+    for key, value in start_zstd.items():
+        zstd_stats[key] -= value
+    return _worker_capture.message_count - start_messages, results, zstd_stats, method_counts
+
+
+class DecodePool:
+    """
+    多进程解码池
+
+    数据包按批提交到进程池, 结果按提交顺序由应用线程依次交给回调,
+    因此同一游戏连接的消息顺序不变。控制事件(如 server_change)也经过同一顺序通道。
+    """
+
+    def __init__(self, callback: Callable[[Dict[str, Any]], None], workers: int = 2,
+                 batch_size: int = 64, capture_options: Optional[Dict[str, Any]] = None,
+                 parser_options: Optional[Dict[str, Any]] = None):
+        """
+        初始化解码池
+
+        Args:
+            callback: 解码结果回调函数
+            workers: 工作进程数
+            batch_size: 每批提交的数据包数
+            capture_options: 工作进程内 PacketCapture 的参数(zstd字典、解码方式等)
+            parser_options: 工作进程内 PacketParser 的参数(怪物名称语言等)
+        """
+        self.callback = callback
+        self.workers = workers
+        self.batch_size = batch_size
+        self.message_count = 0
+        self.frame_count = 0
+        # 各工作进程汇总的zstd解压统计
+        self.zstd_stats = {}
+        # 各工作进程汇总的按methodId统计的消息数
+        self.method_counts = {}
+        self._batch = []
+        # 统一使用spawn, 避免在已启动多个线程的进程中fork
+        self._executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=mp.get_context('spawn'),
+            initializer=_init_worker,
+            initargs=(capture_options or {}, parser_options or {})
+        )
+        # 按提交顺序排列的结果, 长度受限以便在工作进程跟不上时对解码线程形成背压
+        self._results = queue.Queue(maxsize=workers * 4)
+        self._apply_thread = threading.Thread(target=self._apply_loop, daemon=True)
+        self._apply_thread.start()
+        logger.info(f"多进程解码已启用, 工作进程数: {workers}")
+
+    def submit(self, flow_id: int, frame, packet_time: float, trace=None):
+        """提交一个完整数据包, trace 为该数据包的延迟追踪"""
+        self._batch.append((flow_id, bytes(frame), packet_time, trace))
+        if len(self._batch) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """提交当前批次"""
+        if not self._batch:
+            return
+        batch = self._batch
+        self._batch = []
+        self.frame_count += len(batch)
+        self._results.put(self._executor.submit(decode_frames, batch))
+
+    def post(self, data: Dict[str, Any]):
+        """按顺序投递控制事件, 在之前提交的数据包结果之后交给回调"""
+        self.flush()
+        future = Future()
+        future.set_result((0, [data], {}, {}))
+        self._results.put(future)
+
+    def close(self):
+        """提交剩余数据包, 等待全部结果应用完毕后关闭进程池"""
+        self.flush()
+        self._results.put(None)
+        self._apply_thread.join()
+        self._executor.shutdown()
+
+    def _apply_loop(self):
+        """结果应用线程"""
+        while True:
+            future = self._results.get()
+            if future is None:
+                break
+            try:
+                messages, results, zstd_stats, method_counts = future.result()
+            except Exception as e:
+                logger.error(f"解码进程处理失败: {e}")
+                continue
+            self.message_count += messages
+            for key, value in zstd_stats.items():
+                self.zstd_stats[key] = self.zstd_stats.get(key, 0) + value
+            for method_id, count in method_counts.items():
+                self.method_counts[method_id] = self.method_counts.get(method_id, 0) + count
+            for data in results:
+                trace = data.get('trace')
+                if trace is not None:
+                    # 从提交到结果应用, 包含工作进程内的解压和解析
+                    trace.mark(DECODE_POOL)
+                try:
+                    self.callback(data)
+                except Exception as e:
+                    logger.debug("应用解码结果失败: %s", e)
@@ -0,0 +1,55 @@
+"""
+敌人数据编码模块
+/enemies 接口的 JSON 与 protobuf(enemy.proto) 编码
+"""
+
+import json
+from typing import Any, Dict, Iterable, Mapping
+
+JSON_MEDIA_TYPE = "application/json"
+PROTO_MEDIA_TYPE = "application/x-protobuf"
+FORMATS = {
+    'json': JSON_MEDIA_TYPE,
+    'proto': PROTO_MEDIA_TYPE,
+}
+
+
+def encode_json(data: Any) -> bytes:
+    """与 FastAPI 默认 JSONResponse 相同的紧凑 JSON 编码"""
+    return json.dumps(data, ensure_ascii=False, allow_nan=False, separators=(',', ':')).encode('utf-8')
+
+
+def encode_proto(version: int, enemies: Mapping[int, Dict[str, Any]],
+                 removed: Iterable[int] = (), full: bool = True) -> bytes:
+    """
+    编码为 EnemyList
+
+    Args:
+        version: 快照版本
+        enemies: UID -> 敌人数据
+        removed: 移除的UID
+        full: 是否为完整数据
+    """
+    # 只有请求 protobuf 格式时才加载
+    from enemy_pb2 import EnemyList
+
+    message = EnemyList(Version=version, Full=full, Removed=removed)
+    add = message.Enemies.add
+    for uid, enemy in enemies.items():
+        add(Uid=uid, Name=enemy['name'], Hp=enemy['hp'], MaxHp=enemy['max_hp'])
+    return message.SerializeToString()
+
+
+def encode_snapshot(snapshot, fmt: str) -> bytes:
+    """编码完整快照, JSON 格式与原 /enemies 返回一致"""
+    if fmt == 'proto':
+        return encode_proto(snapshot.version, snapshot.enemies)
+    return encode_json(dict(snapshot.enemies))
+
+
+def encode_changes(version: int, enemies: Mapping[int, Dict[str, Any]], removed,
+                   full: bool, fmt: str) -> bytes:
+    """编码 /enemies?since= 的增量结果"""
+    if fmt == 'proto':
+        return encode_proto(version, enemies, removed, full)
+    return encode_json({"version": version, "full": full, "enemies": dict(enemies), "removed": list(removed)})
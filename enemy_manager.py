@@ -1,62 +1,433 @@
+import asyncio
+import secrets
 import threading
-from fastapi import FastAPI
-import uvicorn
+import time
+from typing import Optional
+from enemy_codec import FORMATS, encode_changes, encode_snapshot
+from enemy_store import EnemySnapshot, EnemyStore, ExpiryQueue
+from enemy_stream import EnemyBroadcaster, encode_message
+from hp_tracker import HpTracker
+from latency import STORE_UPDATE, LatencyTracer
 from logging_config import get_logger
+from metrics import CONTENT_TYPE, MetricsRegistry
+from watchlist import DEFAULT_WATCHLIST_FILE, Watchlist, WatchlistReloader
 
 
 logger = get_logger(__name__)
 
+# API 服务默认地址
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 1289
+# SSE 心跳间隔(秒)
+SSE_KEEPALIVE = 15
+# 敌人超过该时间(秒)未更新时移除
+DEFAULT_ENEMY_TTL = 300.0
+# 消失的敌人保留的时间(秒)
+DEFAULT_DISAPPEAR_TTL = 10.0
+
+
+def stream_filter(query_params):
+    """
+    解析推送接口的过滤参数
+
+    name 可重复出现; watchlist=true 时加入被关注的敌人
+
+    Returns:
+        {"names": 名称集合, "watched": 是否加入被关注的敌人}
+    """
+    return {
+        "names": set(query_params.getlist('name')),
+        "watched": query_params.get('watchlist', '').lower() in ('1', 'true', 'yes'),
+    }
+
 
 class EnemyManager:
     """EnemyManager"""
 
-    def __init__(self):
+    def __init__(self, watchlist_file: str = DEFAULT_WATCHLIST_FILE, ttl: float = DEFAULT_ENEMY_TTL,
+                 disappear_ttl: float = DEFAULT_DISAPPEAR_TTL, max_enemies: int = 0):
+        """
+        初始化
+
+        Args:
+            watchlist_file: 关注列表配置文件, 修改后自动重新加载
+            ttl: 敌人超过该时间(秒)未更新时移除, 0表示不按时间移除
+            disappear_ttl: 消失的敌人保留的时间(秒), 0表示立即移除
+            max_enemies: 敌人表的最大条数, 超出时优先移除消失的敌人, 其次最久未更新的敌人; 0表示不限制
+        """
         self.logger = logger
-        self.enemies = {}
-        self.app = FastAPI()
-        host="127.0.0.1"
-        port=1289
+        # 只由解码线程写入, API线程只读取 self.snapshot
+        self.enemies = EnemyStore()
+        # 游戏连接编号 -> 该连接同步过的敌人UID集合; 每个UID只属于最近同步它的连接
+        self.flow_enemies = {}
+        # 敌人UID -> 所属的游戏连接编号
+        self.enemy_flows = {}
+        self.update_count = 0
+        # 过期移除: 仍在视野内和已消失的敌人分别按最后更新时间排队, 每次同步只检查队首
+        self.ttl = ttl
+        self.disappear_ttl = disappear_ttl
+        self.max_enemies = max_enemies
+        self._active = ExpiryQueue()
+        self._disappeared = ExpiryQueue()
+        # 移除原因 -> 移除数
+        self.evictions = {'disappeared': 0, 'expired': 0, 'capacity': 0}
+        # WebSocket / SSE 推送客户端
+        self.broadcaster = EnemyBroadcaster()
+        # 格式 -> (快照版本, 编码后的完整数据), 同一版本只编码一次
+        self._body_cache = {}
+        # 进程重启后版本号从头开始, ETag 加上随机前缀避免与旧进程的缓存混淆
+        self._etag_prefix = secrets.token_hex(4)
+        # 被关注敌人的血量记录
+        self.hp_tracker = HpTracker()
+        # 关注列表; 重新加载的列表先放在 _pending_watchlist, 由写入线程在下次同步时应用
+        self._watchlist_reloader = WatchlistReloader(watchlist_file, self._request_watchlist)
+        self.watchlist = self._watchlist_reloader.load()
+        self._pending_watchlist = None
+        self._watchlist_reloader.start()
+        # 从抓包到敌人表更新的延迟追踪
+        self.latency = LatencyTracer()
+        # /metrics 导出的运行指标, 抓包模块通过 PacketCapture.register_metrics 登记到同一注册表
+        self.metrics = MetricsRegistry()
+        self._register_metrics()
+        # API 服务, 由 start_server() 在抓包配置完成后启动
+        self.app = None
+        self._server_thread = None
+
+    def create_app(self):
+        """
+        创建 FastAPI 应用并注册路由
+
+        fastapi 在这里才导入, 只列出网络接口或回放时不需要加载。
+        需要在 start_server() 之前添加自定义路由时可先调用本方法。
+
+        Returns:
+            FastAPI 应用
+        """
+        if self.app is not None:
+            return self.app
+        from fastapi import FastAPI, HTTPException, Query, Request, Response, WebSocket, WebSocketDisconnect
+        from fastapi.responses import StreamingResponse
+
+        app = FastAPI()
 
         # 注册路由
-        @self.app.get("/enemies")
-        def list_enemies():
-            return self.enemies
-
-        @self.app.get("/enemies/{enemy_name}")
-        def get_enemy(enemy_name: str):
-            for enemy_uuid, enemy in self.enemies.items():
-                if enemy.get('name') == enemy_name:
-                    return enemy
-            return {}
-
-        # 后台启动 API
-        thread = threading.Thread(
-            target=lambda: uvicorn.run(
-                self.app, host=host, port=port, log_level="info"
-            ),
-            daemon=True
-        )
-        thread.start()
+        @app.get("/enemies")
+        def list_enemies(request: Request, since: Optional[int] = None,
+                         fmt: str = Query('json', alias='format')):
+            media_type = FORMATS.get(fmt)
+            if media_type is None:
+                raise HTTPException(status_code=400, detail=f"不支持的格式: {fmt}")
+            if since is None:
+                snapshot = self.snapshot
+                etag = f'"{self._etag_prefix}-{snapshot.version}-{fmt}"'
+                headers = {"ETag": etag, "X-Snapshot-Version": str(snapshot.version)}
+                if etag in (tag.strip() for tag in request.headers.get("if-none-match", "").split(",")):
+                    return Response(status_code=304, headers=headers)
+                return Response(self._encoded_snapshot(snapshot, fmt), media_type=media_type, headers=headers)
+            # 增量查询: 只返回 since 版本之后新增、变化和移除的敌人
+            snapshot, enemies, removed = self.enemies.changes_since(since)
+            full = enemies is None
+            if full:
+                enemies = snapshot.enemies
+            return Response(encode_changes(snapshot.version, enemies, removed, full, fmt),
+                            media_type=media_type, headers={"X-Snapshot-Version": str(snapshot.version)})
+
+        @app.get("/enemies/watched")
+        def list_watched_enemies(response: Response):
+            snapshot = self.snapshot
+            response.headers["X-Snapshot-Version"] = str(snapshot.version)
+            return dict(snapshot.watched)
+
+        @app.get("/enemies/dps")
+        def list_enemy_dps():
+            return dict(self.hp_tracker.stats)
+
+        @app.get("/enemies/stats")
+        def get_enemy_stats():
+            return self.get_stats()
+
+        @app.get("/latency")
+        def get_latency():
+            return self.latency.summary()
+
+        @app.get("/metrics")
+        def get_metrics():
+            return Response(self.metrics.render(), media_type=CONTENT_TYPE)
+
+        @app.get("/encounters")
+        def list_encounters(limit: int = 10):
+            return list(self.hp_tracker.encounters[-limit:]) if limit > 0 else []
+
+        @app.get("/enemies/type/{type_id}")
+        def get_enemies_by_type(type_id: int, response: Response):
+            snapshot = self.snapshot
+            response.headers["X-Snapshot-Version"] = str(snapshot.version)
+            return snapshot.find_by_type(type_id)
+
+        @app.get("/enemies/{enemy_name}")
+        def get_enemy(enemy_name: str, response: Response, all: bool = False):
+            snapshot = self.snapshot
+            response.headers["X-Snapshot-Version"] = str(snapshot.version)
+            enemies = snapshot.find_by_name(enemy_name)
+            if all:
+                return enemies
+            return next(iter(enemies.values()), {})
+
+        @app.websocket("/ws/enemies")
+        async def enemies_websocket(websocket: WebSocket):
+            await websocket.accept()
+            subscriber = self.broadcaster.subscribe(self.snapshot, **stream_filter(websocket.query_params))
+            # 同时等待推送消息和客户端消息, 客户端关闭或断开时立即注销, 不必等到下一次发送失败
+            receive = asyncio.ensure_future(websocket.receive())
+            message = asyncio.ensure_future(subscriber.next_message())
+            try:
+                while True:
+                    done, _ = await asyncio.wait((receive, message), return_when=asyncio.FIRST_COMPLETED)
+                    if receive in done:
+                        if receive.result()["type"] == "websocket.disconnect":
+                            break
+                        # 客户端发来的消息不处理
+                        receive = asyncio.ensure_future(websocket.receive())
+                    if message in done:
+                        await websocket.send_text(encode_message(message.result()))
+                        message = asyncio.ensure_future(subscriber.next_message())
+            except WebSocketDisconnect:
+                pass
+            finally:
+                receive.cancel()
+                message.cancel()
+                self.broadcaster.unsubscribe(subscriber)
+
+        @app.get("/sse/enemies")
+        async def enemies_sse(request: Request):
+            subscriber = self.broadcaster.subscribe(self.snapshot, **stream_filter(request.query_params))
+
+            async def events():
+                try:
+                    while not await request.is_disconnected():
+                        try:
+                            message = await asyncio.wait_for(subscriber.next_message(), SSE_KEEPALIVE)
+                        except asyncio.TimeoutError:
+                            yield ": keepalive\n\n"
+                            continue
+                        yield f"event: {message['type']}\nid: {message['version']}\ndata: {encode_message(message)}\n\n"
+                finally:
+                    self.broadcaster.unsubscribe(subscriber)
+
+            return StreamingResponse(events(), media_type="text/event-stream",
+                                     headers={"Cache-Control": "no-cache"})
+
+        self.app = app
+        return app
+
+    def start_server(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT):
+        """
+        在后台线程启动 API 服务
+
+        fastapi 和 uvicorn 在后台线程中导入, 不阻塞调用方。
+
+        Args:
+            host: 监听地址
+            port: 监听端口
+        """
+        if self._server_thread is not None:
+            return
+
+        def serve():
+            import uvicorn
+            uvicorn.run(self.create_app(), host=host, port=port, log_level="info")
+
+        self._server_thread = threading.Thread(target=serve, daemon=True)
+        self._server_thread.start()
+
+    @property
+    def snapshot(self) -> EnemySnapshot:
+        """最新发布的只读快照, 可在任意线程读取"""
+        return self.enemies.snapshot
+
+    def _encoded_snapshot(self, snapshot: EnemySnapshot, fmt: str) -> bytes:
+        """获取快照编码后的数据, 同一版本只编码一次"""
+        cached = self._body_cache.get(fmt)
+        if cached is not None and cached[0] == snapshot.version:
+            return cached[1]
+        body = encode_snapshot(snapshot, fmt)
+        # 多个请求同时编码同一版本时结果相同, 后写入的覆盖即可
+        self._body_cache[fmt] = (snapshot.version, body)
+        return body
     
-    def clearAll(self):
-        self.enemies = {}
+    def _request_watchlist(self, watchlist: Watchlist):
+        """请求切换关注列表, 由写入线程在下次同步时应用"""
+        self._pending_watchlist = watchlist
+
+    def _apply_watchlist(self):
+        """应用新的关注列表, 重新判断所有敌人是否被关注"""
+        watchlist = self._pending_watchlist
+        self._pending_watchlist = None
+        self.watchlist = watchlist
+        enemies = self.enemies
+        for record in enemies:
+            enemies.set_watched(record, watchlist.matches(record.uid, record.name, record.type_id))
+        self._publish()
 
-    def sync_enemy(self, id, name, hp, max_hp):
-        """敌人管理器 + API 服务"""
-        if not id:
+    def _publish(self):
+        """发布新快照并推送变化"""
+        self.hp_tracker.publish()
+        previous = self.enemies.snapshot
+        snapshot = self.enemies.publish()
+        if snapshot is not previous:
+            self.broadcaster.publish(snapshot)
+
+    def get_stats(self):
+        """
+        获取敌人表统计
+
+        Returns:
+            {"size", "watched", "disappeared", "version", "updates", "evictions"}
+        """
+        snapshot = self.snapshot
+        return {
+            'size': len(snapshot.enemies),
+            'watched': len(snapshot.watched),
+            'disappeared': len(self._disappeared),
+            'version': snapshot.version,
+            'updates': self.update_count,
+            'evictions': dict(self.evictions),
+        }
+
+    def _register_metrics(self):
+        """登记敌人表指标"""
+        metrics = self.metrics
+        metrics.gauge("enemies", "敌人表当前条数", lambda: len(self.snapshot.enemies))
+        metrics.gauge("enemies_watched", "被关注的敌人数", lambda: len(self.snapshot.watched))
+        metrics.gauge("enemies_disappeared", "已离开视野、等待移除的敌人数", lambda: len(self._disappeared))
+        metrics.gauge("enemy_snapshot_version", "敌人表快照版本号", lambda: self.snapshot.version)
+        metrics.counter("enemy_updates_total", "敌人数据更新次数", lambda: self.update_count)
+        metrics.counter("enemy_evictions_total", "按原因统计的敌人移除数",
+                        lambda: dict(self.evictions), label="reason")
+        metrics.gauge("stream_clients", "WebSocket/SSE 推送客户端数", lambda: len(self.broadcaster))
+
+    def clear_flow(self, flow_id):
+        """清理属于指定游戏连接的敌人, 之后又被其他连接同步过的敌人不受影响"""
+        uids = self.flow_enemies.pop(flow_id, None)
+        if not uids:
             return
-        enemy = self.enemies.get(id, {'name': '未知', 'hp': -1, 'max_hp': -1})
-        if name:
-            enemy['name'] = name
-        if hp!=None:
-            enemy['hp'] = hp
-        if max_hp:
-            enemy['max_hp'] = max_hp
-        self.enemies[id] = enemy
-        if 'name' in enemy and 'hp' in enemy and 'max_hp' in enemy:
-            monsters = {"丛林哥布林战士",
-                        "剧毒蜂巢", "火焰食人魔","幻妖蟹蛛","寒霜食人魔","哥布林王","凶猛金牙",
-                        "小猪·爱","小猪·风","小猪·闪闪",
-                        "娜宝·闪闪", "娜宝·银辉"}
-            if enemy['name'] in monsters or 1263272000 == id:
-                self.logger.info(f"同步敌人数据: {id} -> {enemy['name']}, HP: {enemy['hp']}/{enemy['max_hp']}")
\ No newline at end of file
+        enemy_flows = self.enemy_flows
+        for uid in uids:
+            del enemy_flows[uid]
+            self.enemies.remove(uid)
+            self._active.discard(uid)
+            self._disappeared.discard(uid)
+            self.hp_tracker.finish(uid)
+        self._publish()
+
+    def _evict(self, uid, reason):
+        """移除过期的敌人"""
+        self.enemies.remove(uid)
+        self.hp_tracker.finish(uid, reason)
+        flow_id = self.enemy_flows.pop(uid, None)
+        if flow_id is not None:
+            self.flow_enemies[flow_id].discard(uid)
+        self.evictions[reason] += 1
+
+    def _evict_expired(self, timestamp):
+        """按过期时间和容量上限移除敌人, 只检查队首, 每个被移除的敌人O(1)"""
+        for uid in self._disappeared.pop_expired(timestamp - self.disappear_ttl):
+            self._evict(uid, 'disappeared')
+        if self.ttl > 0:
+            for uid in self._active.pop_expired(timestamp - self.ttl):
+                self._evict(uid, 'expired')
+        if self.max_enemies > 0:
+            while len(self.enemies) > self.max_enemies:
+                uid = self._disappeared.pop_oldest()
+                if uid is None:
+                    uid = self._active.pop_oldest()
+                    if uid is None:
+                        break
+                self._evict(uid, 'capacity')
+
+    def expire(self, timestamp=None):
+        """
+        移除过期的敌人, 由抓包模块的定时清理调用; 怪物流量停止时 sync_enemies 不再被调用, 过期的敌人也能按时移除
+
+        Args:
+            timestamp: 当前时间, 回放时为数据包时间, None表示当前时间
+        """
+        if timestamp is None:
+            timestamp = time.time()
+        self._evict_expired(timestamp)
+        self._publish()
+
+    def sync_enemies(self, deltas, flow_id=0, timestamp=None, trace=None):
+        """
+        批量同步敌人数据
+
+        Args:
+            deltas: 每个敌人合并后的变化列表, 元素包含 enemy_uid 以及可选的
+                enemy_name / enemy_hp / enemy_max_hp / enemy_type_id
+            flow_id: 游戏连接编号
+            timestamp: 数据包时间, 用于血量记录和过期移除, None表示当前时间
+            trace: 延迟追踪, 更新完成后计入 /latency
+        """
+        if self._pending_watchlist is not None:
+            self._apply_watchlist()
+        if timestamp is None:
+            timestamp = time.time()
+        enemies = self.enemies
+        watchlist = self.watchlist
+        hp_tracker = self.hp_tracker
+        active = self._active
+        disappeared = self._disappeared
+        flow_enemies = self.flow_enemies
+        enemy_flows = self.enemy_flows
+        uids = flow_enemies.get(flow_id)
+        if uids is None:
+            uids = flow_enemies[flow_id] = set()
+        updated = 0
+        for delta in deltas:
+            id = delta.get('enemy_uid')
+            if not id:
+                continue
+            updated += 1
+            owner = enemy_flows.get(id)
+            if owner != flow_id:
+                # 同一敌人出现在另一个连接上时转给该连接, 清理原连接时不再移除
+                if owner is not None:
+                    flow_enemies[owner].discard(id)
+                enemy_flows[id] = flow_id
+                uids.add(id)
+            gone = delta.get('enemy_disappeared', False)
+            if gone:
+                active.discard(id)
+                disappeared.touch(id, timestamp)
+            else:
+                disappeared.discard(id)
+                active.touch(id, timestamp)
+            enemy = enemies.for_update(id)
+            name = delta.get('enemy_name')
+            if name:
+                enemies.set_name(enemy, name)
+            type_id = delta.get('enemy_type_id')
+            if type_id is not None:
+                enemies.set_type_id(enemy, type_id)
+            hp = delta.get('enemy_hp')
+            if hp is not None:
+                enemy.hp = hp
+            max_hp = delta.get('enemy_max_hp')
+            if max_hp:
+                enemy.max_hp = max_hp
+            if watchlist.matches(id, enemy.name, enemy.type_id):
+                enemies.set_watched(enemy, True)
+                if gone:
+                    # 离开视野不算击杀
+                    hp_tracker.finish(id, 'disappeared')
+                elif hp is not None:
+                    hp_tracker.record(id, enemy.name, enemy.type_id, hp, enemy.max_hp, timestamp)
+                self.logger.info("同步敌人数据: %s -> %s, HP: %s/%s", id, enemy.name, enemy.hp, enemy.max_hp)
+            else:
+                enemies.set_watched(enemy, False)
+        self.update_count += updated
+        self._evict_expired(timestamp)
+        self._publish()
+        if trace is not None:
+            trace.mark(STORE_UPDATE)
+            self.latency.finish(trace)
@@ -0,0 +1,27 @@
+# -*- coding: utf-8 -*-
+# Generated by the protocol buffer compiler.  DO NOT EDIT!
+# source: enemy.proto
+"""Generated protocol buffer code."""
+from google.protobuf.internal import builder as _builder
+from google.protobuf import descriptor as _descriptor
+from google.protobuf import descriptor_pool as _descriptor_pool
+from google.protobuf import symbol_database as _symbol_database
+# @@protoc_insertion_point(imports)
+
+_sym_db = _symbol_database.Default()
+
+
+
+
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x0b\x65nemy.proto\x12\x05\x65nemy\"=\n\x05\x45nemy\x12\x0b\n\x03Uid\x18\x01 \x01(\x03\x12\x0c\n\x04Name\x18\x02 \x01(\t\x12\n\n\x02Hp\x18\x03 \x01(\x03\x12\r\n\x05MaxHp\x18\x04 \x01(\x03\"Z\n\tEnemyList\x12\x0f\n\x07Version\x18\x01 \x01(\x04\x12\x1d\n\x07\x45nemies\x18\x02 \x03(\x0b\x32\x0c.enemy.Enemy\x12\x0f\n\x07Removed\x18\x03 \x03(\x03\x12\x0c\n\x04\x46ull\x18\x04 \x01(\x08\x62\x06proto3')
+
+_builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, globals())
+_builder.BuildTopDescriptorsAndMessages(DESCRIPTOR, 'enemy_pb2', globals())
+if _descriptor._USE_C_DESCRIPTORS == False:
+
+  DESCRIPTOR._options = None
+  _ENEMY._serialized_start=22
+  _ENEMY._serialized_end=83
+  _ENEMYLIST._serialized_start=85
+  _ENEMYLIST._serialized_end=175
+# @@protoc_insertion_point(module_scope)
@@ -0,0 +1,458 @@
+"""
+敌人数据存储模块
+"""
+
+from collections import OrderedDict, abc
+from types import MappingProxyType
+from typing import Any, Dict, Iterator, List, Mapping, Optional, Tuple
+
+UNKNOWN_NAME = '未知'
+# OverlayMapping 中表示本层没有该键
+_MISSING = object()
+
+
+class EnemyRecord:
+    """单个敌人的数据, 使用 __slots__ 减少大量实体时的内存占用"""
+
+    __slots__ = ('uid', 'name', 'hp', 'max_hp', 'type_id')
+
+    def __init__(self, uid: int):
+        self.uid = uid
+        self.name = UNKNOWN_NAME
+        self.hp = -1
+        self.max_hp = -1
+        self.type_id = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为API返回的字典"""
+        return {'name': self.name, 'hp': self.hp, 'max_hp': self.max_hp}
+
+
+class OverlayMapping(abc.Mapping):
+    """
+    只读的分层映射, 在上一层映射之上覆盖本层变化的项(值为None表示该键已删除)
+
+    发布快照时只新建变化的项, 未变化的项与上一个快照共享; 查询逐层向下, 为O(层数)。
+    层数超过 MAX_DEPTH 时合并为一个字典; 首次遍历时也会合并并缓存,
+    之后的查询和基于它的新层都直接使用合并结果。
+    """
+
+    __slots__ = ('_parent', '_layer', '_len', '_depth', '_flat')
+
+    # 未合并的最大层数
+    MAX_DEPTH = 16
+
+    def __init__(self, parent: Mapping, layer: Dict, length: int, depth: int, flat: Optional[Dict] = None):
+        self._parent = parent
+        self._layer = layer
+        self._len = length
+        self._depth = depth
+        # 合并后的完整字典, 多个读取线程同时合并时结果相同, 无需加锁
+        self._flat = flat
+
+    @classmethod
+    def overlay(cls, parent: Mapping, changes: Dict) -> Mapping:
+        """
+        在 parent 之上覆盖变化, parent 本身不会被修改
+
+        Args:
+            parent: 上一个版本的映射
+            changes: 键 -> 新值, 值为None表示删除
+
+        Returns:
+            新版本的映射; 没有变化时返回 parent
+        """
+        if not changes:
+            return parent
+        length = len(parent)
+        for key, value in changes.items():
+            present = key in parent
+            if value is None:
+                length -= present
+            elif not present:
+                length += 1
+        if isinstance(parent, cls) and parent._flat is None:
+            depth = parent._depth + 1
+        else:
+            depth = 1
+        if depth <= cls.MAX_DEPTH:
+            return cls(parent, changes, length, depth)
+        flat = dict(parent.items())
+        cls._apply(flat, changes)
+        return cls(None, {}, length, 0, flat)
+
+    def __getitem__(self, key):
+        node = self
+        while isinstance(node, OverlayMapping):
+            flat = node._flat
+            if flat is not None:
+                return flat[key]
+            value = node._layer.get(key, _MISSING)
+            if value is not _MISSING:
+                if value is None:
+                    raise KeyError(key)
+                return value
+            node = node._parent
+        return node[key]
+
+    def __contains__(self, key) -> bool:
+        try:
+            self[key]
+        except KeyError:
+            return False
+        return True
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __iter__(self):
+        return iter(self._flatten())
+
+    def keys(self):
+        return self._flatten().keys()
+
+    def items(self):
+        return self._flatten().items()
+
+    def values(self):
+        return self._flatten().values()
+
+    def _flatten(self) -> Dict:
+        """合并所有层为一个字典并缓存"""
+        flat = self._flat
+        if flat is not None:
+            return flat
+        layers = []
+        node = self
+        while isinstance(node, OverlayMapping) and node._flat is None:
+            layers.append(node._layer)
+            node = node._parent
+        flat = dict(node._flat if isinstance(node, OverlayMapping) else node)
+        for layer in reversed(layers):
+            self._apply(flat, layer)
+        self._flat = flat
+        return flat
+
+    @staticmethod
+    def _apply(target: Dict, changes: Dict):
+        for key, value in changes.items():
+            if value is None:
+                target.pop(key, None)
+            else:
+                target[key] = value
+
+
+class EnemySnapshot:
+    """
+    敌人数据的只读快照
+
+    发布后不再修改, 读取方无需加锁即可遍历和序列化。
+    """
+
+    __slots__ = ('version', 'enemies', 'by_name', 'by_type', 'changes', 'watched')
+
+    def __init__(self, version: int, enemies: Mapping[int, Dict[str, Any]],
+                 by_name: Mapping[str, Tuple[int, ...]], by_type: Mapping[int, Tuple[int, ...]],
+                 changes: Optional[Mapping[int, Optional[Dict[str, Any]]]] = None,
+                 watched: Mapping[int, Dict[str, Any]] = MappingProxyType({})):
+        self.version = version
+        # UID -> 敌人数据
+        self.enemies = enemies
+        # 名称 -> UID元组
+        self.by_name = by_name
+        # 怪物类型Id -> UID元组
+        self.by_type = by_type
+        # 相对上一个版本变化的敌人, UID -> 敌人数据(None表示已移除); None表示数据被整体清空
+        self.changes = changes
+        # 被关注的敌人, UID -> 敌人数据
+        self.watched = watched
+
+    def find_by_name(self, name: str) -> Dict[int, Dict[str, Any]]:
+        """按名称查询所有同名敌人"""
+        enemies = self.enemies
+        return {uid: enemies[uid] for uid in self.by_name.get(name, ())}
+
+    def find_by_type(self, type_id: int) -> Dict[int, Dict[str, Any]]:
+        """按怪物类型Id查询所有敌人"""
+        enemies = self.enemies
+        return {uid: enemies[uid] for uid in self.by_type.get(type_id, ())}
+
+
+EMPTY_SNAPSHOT = EnemySnapshot(0, MappingProxyType({}), MappingProxyType({}), MappingProxyType({}),
+                               MappingProxyType({}))
+
+
+class ExpiryQueue:
+    """
+    按最后更新时间排列的UID队列, 最久未更新的在队首
+
+    更新时把UID移到队尾, 过期检查只从队首取出, 不遍历全部敌人;
+    touch / discard / 每个过期项均为O(1)。要求时间基本单调递增。
+    """
+
+    def __init__(self):
+        # UID -> 最后更新时间
+        self._items: "OrderedDict[int, float]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __contains__(self, uid: int) -> bool:
+        return uid in self._items
+
+    def touch(self, uid: int, timestamp: float):
+        """记录UID的更新时间并移到队尾"""
+        items = self._items
+        items[uid] = timestamp
+        items.move_to_end(uid)
+
+    def discard(self, uid: int):
+        """移除UID"""
+        self._items.pop(uid, None)
+
+    def pop_expired(self, deadline: float) -> List[int]:
+        """取出最后更新时间不晚于 deadline 的UID"""
+        items = self._items
+        expired = []
+        while items:
+            uid, timestamp = next(iter(items.items()))
+            if timestamp > deadline:
+                break
+            items.popitem(last=False)
+            expired.append(uid)
+        return expired
+
+    def pop_oldest(self) -> Optional[int]:
+        """取出最久未更新的UID, 队列为空时返回None"""
+        if not self._items:
+            return None
+        return self._items.popitem(last=False)[0]
+
+
+class EnemyStore:
+    """
+    敌人数据存储
+
+    以UID为主键保存 EnemyRecord, 并维护按名称和按怪物类型Id的二级索引,
+    索引在更新名称/类型时增量维护, 按名称或类型查询为O(1)。
+
+    只允许一个线程写入; 写入方通过 publish() 发布写时复制的 EnemySnapshot,
+    只重新生成上次发布后变化过的敌人和索引项, 其余部分与上一个快照共享, 其他线程只读取快照。
+    最近 history 个快照保存在以版本号取模的环形列表中, 供 changes_since() 查询增量。
+    """
+
+    def __init__(self, history: int = 256):
+        """
+        初始化存储
+
+        Args:
+            history: 保留用于增量查询的快照数
+        """
+        self._records = {}
+        # 名称 -> UID集合
+        self._by_name = {}
+        # 怪物类型Id -> UID集合
+        self._by_type = {}
+        # 上次发布后变化过的UID/名称/类型Id
+        self._dirty = set()
+        self._dirty_names = set()
+        self._dirty_types = set()
+        # 被关注的敌人UID
+        self._watched = set()
+        self._history = [None] * history
+        self.snapshot = EMPTY_SNAPSHOT
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def __contains__(self, uid: int) -> bool:
+        return uid in self._records
+
+    def __iter__(self) -> Iterator[EnemyRecord]:
+        return iter(self._records.values())
+
+    def get(self, uid: int) -> Optional[EnemyRecord]:
+        """按UID获取敌人"""
+        return self._records.get(uid)
+
+    def for_update(self, uid: int) -> EnemyRecord:
+        """获取用于修改的敌人记录, 不存在时创建; 该敌人会在下次发布快照时重新生成"""
+        record = self._records.get(uid)
+        if record is None:
+            record = self._records[uid] = EnemyRecord(uid)
+            self._index(self._by_name, record.name, uid)
+            self._dirty_names.add(record.name)
+        self._dirty.add(uid)
+        return record
+
+    def set_name(self, record: EnemyRecord, name: str):
+        """更新名称并维护名称索引"""
+        if record.name == name:
+            return
+        self._unindex(self._by_name, record.name, record.uid)
+        self._dirty_names.add(record.name)
+        record.name = name
+        self._index(self._by_name, name, record.uid)
+        self._dirty_names.add(name)
+
+    def set_type_id(self, record: EnemyRecord, type_id: int):
+        """更新怪物类型Id并维护类型索引"""
+        if record.type_id == type_id:
+            return
+        if record.type_id is not None:
+            self._unindex(self._by_type, record.type_id, record.uid)
+            self._dirty_types.add(record.type_id)
+        record.type_id = type_id
+        self._index(self._by_type, type_id, record.uid)
+        self._dirty_types.add(type_id)
+
+    def set_watched(self, record: EnemyRecord, watched: bool):
+        """设置敌人是否被关注"""
+        if watched == (record.uid in self._watched):
+            return
+        if watched:
+            self._watched.add(record.uid)
+        else:
+            self._watched.discard(record.uid)
+        self._dirty.add(record.uid)
+
+    def is_watched(self, uid: int) -> bool:
+        """敌人是否被关注"""
+        return uid in self._watched
+
+    def remove(self, uid: int) -> Optional[EnemyRecord]:
+        """删除敌人"""
+        record = self._records.pop(uid, None)
+        if record is not None:
+            self._dirty.add(uid)
+            self._watched.discard(uid)
+            self._unindex(self._by_name, record.name, uid)
+            self._dirty_names.add(record.name)
+            if record.type_id is not None:
+                self._unindex(self._by_type, record.type_id, uid)
+                self._dirty_types.add(record.type_id)
+        return record
+
+    def publish(self) -> EnemySnapshot:
+        """
+        发布包含所有变化的新快照
+
+        敌人表、关注表和索引都以 OverlayMapping 覆盖在上一个快照之上,
+        只生成变化过的项, 未变化的项与上一个快照共享, 发布耗时与变化数成正比而不是与敌人总数成正比。
+        没有变化时返回当前快照, 版本号不变。
+
+        Returns:
+            当前快照
+        """
+        if not (self._dirty or self._dirty_names or self._dirty_types):
+            return self.snapshot
+        previous = self.snapshot
+        records = self._records
+
+        changes = {}
+        watched_changes = {}
+        for uid in self._dirty:
+            record = records.get(uid)
+            if record is None:
+                if uid in previous.enemies:
+                    changes[uid] = None
+                if uid in previous.watched:
+                    watched_changes[uid] = None
+            else:
+                enemy = changes[uid] = record.to_dict()
+                if uid in self._watched:
+                    watched_changes[uid] = enemy
+                elif uid in previous.watched:
+                    watched_changes[uid] = None
+
+        enemies = OverlayMapping.overlay(previous.enemies, changes)
+        watched = OverlayMapping.overlay(previous.watched, watched_changes)
+        by_name = self._publish_index(previous.by_name, self._by_name, self._dirty_names)
+        by_type = self._publish_index(previous.by_type, self._by_type, self._dirty_types)
+
+        self._dirty.clear()
+        self._dirty_names.clear()
+        self._dirty_types.clear()
+        self._set_snapshot(EnemySnapshot(previous.version + 1, enemies, by_name, by_type,
+                                         MappingProxyType(changes), watched))
+        return self.snapshot
+
+    def _set_snapshot(self, snapshot: EnemySnapshot):
+        # 先写入历史再发布, 读取方看到的版本一定能在历史中找到
+        history = self._history
+        history[snapshot.version % len(history)] = snapshot
+        # 引用赋值是原子的, 读取方要么看到旧快照要么看到完整的新快照
+        self.snapshot = snapshot
+
+    def changes_since(self, version: int) -> Tuple[EnemySnapshot, Optional[Dict[int, Dict[str, Any]]], List[int]]:
+        """
+        查询指定版本之后的变化, 可在任意线程调用
+
+        Args:
+            version: 客户端上次收到的版本号
+
+        Returns:
+            (当前快照, 变化的敌人, 移除的UID列表); 版本太旧、晚于当前版本或期间数据被清空时
+            变化的敌人为None, 调用方应返回完整快照
+        """
+        snapshot = self.snapshot
+        current = snapshot.version
+        history = self._history
+        if version > current or current - version > len(history) - 1:
+            return snapshot, None, []
+        changed = set()
+        for v in range(version + 1, current + 1):
+            entry = history[v % len(history)]
+            if entry is None or entry.version != v or entry.changes is None:
+                # 已被新版本覆盖或期间数据被清空
+                return snapshot, None, []
+            changed.update(entry.changes)
+        enemies = {}
+        removed = []
+        latest = snapshot.enemies
+        # 变化的值统一取当前快照, 多次变化只返回最终状态
+        for uid in changed:
+            enemy = latest.get(uid)
+            if enemy is None:
+                removed.append(uid)
+            else:
+                enemies[uid] = enemy
+        return snapshot, enemies, removed
+
+    def find_by_name(self, name: str) -> List[EnemyRecord]:
+        """按名称查询所有同名敌人"""
+        records = self._records
+        return [records[uid] for uid in self._by_name.get(name, ())]
+
+    def find_by_type(self, type_id: int) -> List[EnemyRecord]:
+        """按怪物类型Id查询所有敌人"""
+        records = self._records
+        return [records[uid] for uid in self._by_type.get(type_id, ())]
+
+    def to_dict(self) -> Dict[int, Dict[str, Any]]:
+        """转换为 UID -> 敌人数据 的字典"""
+        return {uid: record.to_dict() for uid, record in self._records.items()}
+
+    @staticmethod
+    def _publish_index(previous: Mapping, index: Dict[Any, set], dirty: set) -> Mapping[Any, Tuple[int, ...]]:
+        """在上一个快照的索引之上只重新生成变化过的键"""
+        changes = {}
+        for key in dirty:
+            uids = index.get(key)
+            changes[key] = tuple(uids) if uids else None
+        return OverlayMapping.overlay(previous, changes)
+
+    @staticmethod
+    def _index(index: Dict[Any, set], key, uid: int):
+        uids = index.get(key)
+        if uids is None:
+            uids = index[key] = set()
+        uids.add(uid)
+
+    @staticmethod
+    def _unindex(index: Dict[Any, set], key, uid: int):
+        uids = index.get(key)
+        if uids is not None:
+            uids.discard(uid)
+            if not uids:
+                del index[key]
@@ -0,0 +1,180 @@
+"""
+敌人数据变化推送模块
+为 WebSocket / SSE 客户端提供初始快照和增量变化
+"""
+
+import asyncio
+import json
+import threading
+from typing import Any, Dict, Iterable, List, Optional
+
+from enemy_store import EnemySnapshot
+from logging_config import get_logger
+
+logger = get_logger(__name__)
+
+
+class EnemySubscriber:
+    """
+    单个推送客户端
+
+    写入线程通过 offer() 合并变化: 同一敌人在发送前多次变化只保留最新值,
+    因此待发送数据最多为敌人总数。待发送的敌人数超过 max_pending 时丢弃增量,
+    下一条消息改为发送完整快照, 慢客户端不会占用越来越多的内存。
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, snapshot: EnemySnapshot,
+                 names: Optional[Iterable[str]] = None, watched: bool = False, max_pending: int = 4096):
+        """
+        初始化客户端
+
+        Args:
+            loop: 客户端连接所在的事件循环
+            snapshot: 订阅时的最新快照, 作为第一条消息发送
+            names: 只推送这些名称的敌人
+            watched: 只推送被关注的敌人; 与 names 同时指定时推送两者的并集, 都不指定时不过滤
+            max_pending: 待发送的最大敌人数
+        """
+        self.names = frozenset(names) if names else None
+        self.watched = watched
+        self.max_pending = max_pending
+        self.resyncs = 0
+        self._loop = loop
+        self._lock = threading.Lock()
+        self._ready = asyncio.Event()
+        self._latest = snapshot
+        # UID -> 敌人数据, None表示已移除
+        self._pending = {}
+        self._resync = True
+        # 已推送给客户端的UID, 用于判断移除事件是否需要推送
+        self._known = set()
+        self._ready.set()
+
+    def _accept(self, uid: int, enemy: Dict[str, Any], snapshot: EnemySnapshot) -> bool:
+        if self.names is None and not self.watched:
+            return True
+        return (self.names is not None and enemy['name'] in self.names) or \
+            (self.watched and uid in snapshot.watched)
+
+    def _filter_snapshot(self, snapshot: EnemySnapshot) -> Dict[int, Dict[str, Any]]:
+        if self.names is None:
+            # 只需要关注的敌人时直接取关注表, 不遍历全部敌人
+            return dict(snapshot.watched) if self.watched else dict(snapshot.enemies)
+        return {uid: enemy for uid, enemy in snapshot.enemies.items() if self._accept(uid, enemy, snapshot)}
+
+    def offer(self, snapshot: EnemySnapshot):
+        """合并一个新快照的变化, 在写入线程调用"""
+        with self._lock:
+            self._latest = snapshot
+            if not self._resync:
+                # 已经要发送完整快照时无需再合并增量
+                self._merge(snapshot)
+        self._loop.call_soon_threadsafe(self._ready.set)
+
+    def _merge(self, snapshot: EnemySnapshot):
+        changes = snapshot.changes
+        if changes is None:
+            # 敌人数据被整体清空
+            self._resync = True
+            self._pending = {}
+            return
+        pending = self._pending
+        known = self._known
+        for uid, enemy in changes.items():
+            if enemy is not None and self._accept(uid, enemy, snapshot):
+                pending[uid] = enemy
+            elif uid in known or uid in pending:
+                # 被移除或不再符合过滤条件
+                pending[uid] = None
+        if len(pending) > self.max_pending:
+            self._resync = True
+            self._pending = {}
+            self.resyncs += 1
+
+    async def next_message(self) -> Dict[str, Any]:
+        """
+        等待并取出下一条消息
+
+        Returns:
+            {"type": "snapshot", "version", "enemies"} 或
+            {"type": "changes", "version", "enemies", "removed"}
+        """
+        while True:
+            await self._ready.wait()
+            self._ready.clear()
+            with self._lock:
+                snapshot = self._latest
+                if self._resync:
+                    self._resync = False
+                    self._pending = {}
+                    enemies = self._filter_snapshot(snapshot)
+                    self._known = set(enemies)
+                    return {"type": "snapshot", "version": snapshot.version, "enemies": enemies}
+                if not self._pending:
+                    continue
+                pending = self._pending
+                self._pending = {}
+                known = self._known
+                enemies = {}
+                removed = []
+                for uid, enemy in pending.items():
+                    if enemy is None:
+                        removed.append(uid)
+                        known.discard(uid)
+                    else:
+                        enemies[uid] = enemy
+                        known.add(uid)
+            return {"type": "changes", "version": snapshot.version, "enemies": enemies, "removed": removed}
+
+
+class EnemyBroadcaster:
+    """推送客户端管理, 写入线程发布快照后调用 publish() 分发变化"""
+
+    def __init__(self, max_pending: int = 4096):
+        self.max_pending = max_pending
+        self._subscribers: List[EnemySubscriber] = []
+        self._lock = threading.Lock()
+        self._snapshot = None
+
+    def __len__(self) -> int:
+        return len(self._subscribers)
+
+    def subscribe(self, snapshot: EnemySnapshot, names: Optional[Iterable[str]] = None,
+                  watched: bool = False) -> EnemySubscriber:
+        """
+        注册客户端, 需要在客户端连接的事件循环中调用
+
+        Args:
+            snapshot: 当前快照, 写入线程已发布过更新的快照时以后者为准
+            names: 只推送这些名称的敌人
+            watched: 只推送被关注的敌人
+        """
+        with self._lock:
+            latest = self._snapshot if self._snapshot is not None and \
+                self._snapshot.version > snapshot.version else snapshot
+            subscriber = EnemySubscriber(asyncio.get_running_loop(), latest, names, watched, self.max_pending)
+            self._subscribers = self._subscribers + [subscriber]
+        logger.debug(f"推送客户端已连接, 当前客户端数: {len(self._subscribers)}")
+        return subscriber
+
+    def unsubscribe(self, subscriber: EnemySubscriber):
+        """注销客户端"""
+        with self._lock:
+            self._subscribers = [s for s in self._subscribers if s is not subscriber]
+        logger.debug(f"推送客户端已断开, 重新同步 {subscriber.resyncs} 次, 当前客户端数: {len(self._subscribers)}")
+
+    def publish(self, snapshot: EnemySnapshot):
+        """分发新快照的变化"""
+        with self._lock:
+            self._snapshot = snapshot
+            for subscriber in self._subscribers:
+                try:
+                    subscriber.offer(snapshot)
+                except RuntimeError:
+                    # 客户端的事件循环已关闭
+                    pass
+
+
+def encode_message(message: Dict[str, Any]) -> str:
+    """序列化推送消息"""
+    return json.dumps(message, ensure_ascii=False, separators=(',', ':'))
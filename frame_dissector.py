@@ -0,0 +1,131 @@
+"""
+原始帧解析模块
+不依赖scapy, 直接按固定偏移解析以太网/IPv4/TCP头部
+"""
+
+import socket
+import struct
+from typing import Iterable, Optional, Tuple
+
+# 链路层类型(DLT)
+DLT_NULL = 0
+DLT_EN10MB = 1
+DLT_RAW = 101
+DLT_LOOP = 108
+DLT_LINUX_SLL = 113
+SUPPORTED_LINKTYPES = frozenset((DLT_NULL, DLT_EN10MB, DLT_RAW, DLT_LOOP, DLT_LINUX_SLL))
+
+ETHERTYPE_IPV4 = 0x0800
+ETHERTYPE_VLAN = (0x8100, 0x88a8)
+IPPROTO_TCP = 6
+# TCP标志位
+TCP_FIN = 0x01
+TCP_RST = 0x04
+
+_ETHERTYPE = struct.Struct('!H')
+_NULL_FAMILY = struct.Struct('=I')
+# 版本/首部长度, 总长度, 标志/片偏移, 协议, 源地址, 目的地址
+_IPV4_HEADER = struct.Struct('!BxH2xHxB2x4s4s')
+# 源端口, 目的端口, 序列号, 数据偏移, 标志位
+_TCP_HEADER = struct.Struct('!HHI4xBB')
+
+# TCP流标识: (源IP, 源端口, 目的IP, 目的端口), IP为4字节网络序bytes
+Flow = Tuple[bytes, int, bytes, int]
+
+
+def dissect_tcp_frame(frame, linktype: int = DLT_EN10MB) -> Optional[Tuple[Flow, int, memoryview, int]]:
+    """
+    解析原始帧, 提取TCP流标识、序列号、负载和标志位
+
+    Args:
+        frame: 原始帧数据
+        linktype: 链路层类型
+
+    Returns:
+        (flow, seq, payload, flags), payload 为原始帧的 memoryview 切片, flags 为TCP标志位(低8位);
+        不是IPv4 TCP数据包时返回None
+    """
+    view = memoryview(frame)
+    size = len(view)
+
+    # 链路层
+    if linktype == DLT_EN10MB:
+        if size < 14:
+            return None
+        ethertype = _ETHERTYPE.unpack_from(view, 12)[0]
+        offset = 14
+        while ethertype in ETHERTYPE_VLAN:
+            if size < offset + 4:
+                return None
+            ethertype = _ETHERTYPE.unpack_from(view, offset + 2)[0]
+            offset += 4
+        if ethertype != ETHERTYPE_IPV4:
+            return None
+    elif linktype == DLT_RAW:
+        offset = 0
+    elif linktype == DLT_NULL or linktype == DLT_LOOP:
+        if size < 4:
+            return None
+        # 地址族字段的字节序取决于抓包主机
+        family = _NULL_FAMILY.unpack_from(view, 0)[0]
+        if family != socket.AF_INET and family != socket.AF_INET << 24:
+            return None
+        offset = 4
+    elif linktype == DLT_LINUX_SLL:
+        if size < 16 or _ETHERTYPE.unpack_from(view, 14)[0] != ETHERTYPE_IPV4:
+            return None
+        offset = 16
+    else:
+        return None
+
+    # IPv4
+    if size < offset + 20:
+        return None
+    ver_ihl, total_length, frag, proto, src_ip, dst_ip = _IPV4_HEADER.unpack_from(view, offset)
+    if ver_ihl >> 4 != 4 or proto != IPPROTO_TCP:
+        return None
+    # 跳过IP分片
+    if frag & 0x3fff:
+        return None
+    tcp_offset = offset + (ver_ihl & 0x0f) * 4
+    # 总长度为0时(TSO)以实际帧长为准, 否则去掉以太网填充
+    end = offset + total_length if total_length else size
+    if end > size:
+        end = size
+
+    # TCP
+    if end < tcp_offset + 20:
+        return None
+    src_port, dst_port, seq, data_offset, flags = _TCP_HEADER.unpack_from(view, tcp_offset)
+    payload_offset = tcp_offset + (data_offset >> 4) * 4
+    if payload_offset > end:
+        return None
+
+    return (src_ip, src_port, dst_ip, dst_port), seq, view[payload_offset:end], flags
+
+
+def format_flow(flow: Flow) -> str:
+    """格式化TCP流标识, 仅用于日志输出"""
+    src_ip, src_port, dst_ip, dst_port = flow
+    return f"{socket.inet_ntoa(src_ip)}:{src_port} -> {socket.inet_ntoa(dst_ip)}:{dst_port}"
+
+
+def build_flow_filter(flows: Iterable[Flow]) -> str:
+    """
+    构建只匹配指定TCP流的BPF过滤表达式
+
+    Args:
+        flows: TCP流标识列表
+
+    Returns:
+        BPF过滤表达式, 列表为空时返回 "tcp"
+    """
+    clauses = []
+    for src_ip, src_port, dst_ip, dst_port in flows:
+        clauses.append(
+            f"(src host {socket.inet_ntoa(src_ip)} and src port {src_port}"
+            f" and dst host {socket.inet_ntoa(dst_ip)} and dst port {dst_port})"
+        )
+    if not clauses:
+        return "tcp"
+    return "tcp and (" + " or ".join(clauses) + ")"
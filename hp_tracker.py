@@ -0,0 +1,234 @@
+"""
+敌人血量记录模块
+为被关注的敌人记录血量时间序列, 计算滚动DPS和预计击杀时间, 战斗结束时生成总结
+"""
+
+import math
+from collections import deque
+from types import MappingProxyType
+from typing import Any, Deque, Dict, List, Mapping, Optional, Tuple
+
+from logging_config import get_logger
+
+logger = get_logger(__name__)
+
+
+class HpHistory:
+    """
+    单个敌人的血量时间序列
+
+    最近 capacity 个采样保存在预分配的环形缓冲区中, 用于滚动DPS;
+    另有 curve_size 个点的整场血量曲线, 写满时隔点丢弃并加倍采样间隔,
+    因此无论战斗多长内存都固定。
+    """
+
+    __slots__ = ('uid', 'name', 'type_id', 'max_hp', 'window',
+                 '_times', '_hps', '_head', '_count', '_start',
+                 '_curve_times', '_curve_hps', '_curve_count', '_curve_stride', '_curve_skip',
+                 'first_time', 'first_hp', 'last_time', 'last_hp', 'dps', 'ttk')
+
+    def __init__(self, uid: int, window: float = 10.0, capacity: int = 256, curve_size: int = 128):
+        """
+        初始化
+
+        Args:
+            uid: 敌人UID
+            window: 滚动DPS的时间窗口(秒)
+            capacity: 环形缓冲区的采样数
+            curve_size: 整场血量曲线的最大点数
+        """
+        # 第一次记录关注的敌人时才加载 numpy, 不拖慢启动
+        import numpy as np
+
+        self.uid = uid
+        self.name = None
+        self.type_id = None
+        self.max_hp = -1
+        self.window = window
+        self._times = np.zeros(capacity, dtype=np.float64)
+        self._hps = np.zeros(capacity, dtype=np.int64)
+        self._head = 0
+        self._count = 0
+        # 窗口内最早采样的位置
+        self._start = 0
+        self._curve_times = np.zeros(curve_size, dtype=np.float64)
+        self._curve_hps = np.zeros(curve_size, dtype=np.int64)
+        self._curve_count = 0
+        self._curve_stride = 1
+        self._curve_skip = 0
+        self.first_time = None
+        self.first_hp = None
+        self.last_time = None
+        self.last_hp = None
+        self.dps = 0.0
+        self.ttk = None
+
+    def add(self, timestamp: float, hp: int):
+        """
+        记录一个采样并更新DPS和预计击杀时间
+
+        窗口起点随新采样单调前移, 每次更新均摊O(1)。
+        """
+        capacity = len(self._times)
+        if self.first_time is None:
+            self.first_time = timestamp
+            self.first_hp = hp
+        self.last_time = timestamp
+        self.last_hp = hp
+
+        head = self._head
+        self._times[head] = timestamp
+        self._hps[head] = hp
+        self._head = (head + 1) % capacity
+        if self._count < capacity:
+            self._count += 1
+        elif self._start == head:
+            # 缓冲区已满, 最早的采样被覆盖
+            self._start = self._head
+        # 前移窗口起点
+        times = self._times
+        while self._start != head and times[self._start] < timestamp - self.window:
+            self._start = (self._start + 1) % capacity
+
+        elapsed = timestamp - float(times[self._start])
+        damage = int(self._hps[self._start]) - hp
+        self.dps = damage / elapsed if elapsed > 0 and damage > 0 else 0.0
+        self.ttk = hp / self.dps if self.dps > 0 else None
+
+        self._add_curve(timestamp, hp)
+
+    def _add_curve(self, timestamp: float, hp: int):
+        if self._curve_skip:
+            self._curve_skip -= 1
+            return
+        size = len(self._curve_times)
+        if self._curve_count == size:
+            # 曲线写满, 隔点保留并加倍采样间隔
+            half = size // 2
+            self._curve_times[:half] = self._curve_times[0:size:2]
+            self._curve_hps[:half] = self._curve_hps[0:size:2]
+            self._curve_count = half
+            self._curve_stride *= 2
+        self._curve_times[self._curve_count] = timestamp
+        self._curve_hps[self._curve_count] = hp
+        self._curve_count += 1
+        self._curve_skip = self._curve_stride - 1
+
+    def curve(self) -> List[Tuple[float, int]]:
+        """整场血量曲线, (相对首次出现的秒数, 血量)"""
+        count = self._curve_count
+        start = self.first_time or 0.0
+        points = [(round(float(t) - start, 3), int(hp))
+                  for t, hp in zip(self._curve_times[:count], self._curve_hps[:count])]
+        if self.last_time is not None:
+            last = round(float(self.last_time) - start, 3)
+            if not points or points[-1][0] != last:
+                points.append((last, int(self.last_hp)))
+        return points
+
+    def stats(self) -> Dict[str, Any]:
+        """当前统计"""
+        return {
+            'name': self.name,
+            'type_id': self.type_id,
+            'hp': self.last_hp,
+            'max_hp': self.max_hp,
+            'dps': round(self.dps, 1),
+            'ttk': round(self.ttk, 1) if self.ttk is not None and math.isfinite(self.ttk) else None,
+            'samples': self._count,
+            'duration': round(self.last_time - self.first_time, 3),
+        }
+
+    def summary(self, reason: str) -> Dict[str, Any]:
+        """战斗总结"""
+        duration = self.last_time - self.first_time
+        damage = max(0, self.first_hp - self.last_hp)
+        return {
+            'uid': self.uid,
+            'name': self.name,
+            'type_id': self.type_id,
+            'max_hp': self.max_hp,
+            'start_time': self.first_time,
+            'end_time': self.last_time,
+            'duration': round(duration, 3),
+            'start_hp': self.first_hp,
+            'end_hp': self.last_hp,
+            'damage': damage,
+            'avg_dps': round(damage / duration, 1) if duration > 0 else 0.0,
+            'killed': self.last_hp <= 0,
+            'reason': reason,
+            'curve': self.curve(),
+        }
+
+
+class HpTracker:
+    """
+    被关注敌人的血量记录
+
+    只由写入线程调用; 每批更新后 publish() 发布只读的统计和战斗总结供API线程读取。
+    """
+
+    def __init__(self, max_enemies: int = 256, window: float = 10.0, capacity: int = 256,
+                 curve_size: int = 128, max_encounters: int = 50):
+        """
+        初始化
+
+        Args:
+            max_enemies: 同时记录的最大敌人数
+            window: 滚动DPS的时间窗口(秒)
+            capacity: 每个敌人的环形缓冲区采样数
+            curve_size: 每个敌人的整场血量曲线最大点数
+            max_encounters: 保留的战斗总结数
+        """
+        self.max_enemies = max_enemies
+        self.window = window
+        self.capacity = capacity
+        self.curve_size = curve_size
+        self.skipped = 0
+        self._histories: Dict[int, HpHistory] = {}
+        self._encounters: Deque[Dict[str, Any]] = deque(maxlen=max_encounters)
+        self._dirty = False
+        # 只读的发布结果
+        self.stats: Mapping[int, Dict[str, Any]] = MappingProxyType({})
+        self.encounters: Tuple[Dict[str, Any], ...] = ()
+
+    def __len__(self) -> int:
+        return len(self._histories)
+
+    def record(self, uid: int, name: str, type_id: Optional[int], hp: int, max_hp: int, timestamp: float):
+        """记录一个血量采样, 血量归零时结束该敌人的战斗"""
+        history = self._histories.get(uid)
+        if history is None:
+            # 已死亡的敌人(击杀后重复的血量为0的采样)不开始新的战斗
+            if hp <= 0:
+                return
+            if len(self._histories) >= self.max_enemies:
+                self.skipped += 1
+                return
+            history = self._histories[uid] = HpHistory(uid, self.window, self.capacity, self.curve_size)
+        history.name = name
+        history.type_id = type_id
+        history.max_hp = max_hp
+        history.add(timestamp, hp)
+        self._dirty = True
+        if hp <= 0:
+            self.finish(uid, 'killed')
+
+    def finish(self, uid: int, reason: str = 'removed'):
+        """结束敌人的战斗并生成总结"""
+        history = self._histories.pop(uid, None)
+        if history is None:
+            return
+        summary = history.summary(reason)
+        self._encounters.append(summary)
+        self._dirty = True
+        logger.info(f"战斗结束: {summary['name']} ({uid}), 用时 {summary['duration']:.1f} 秒, "
+                    f"伤害 {summary['damage']}, 平均DPS {summary['avg_dps']:.1f}")
+
+    def publish(self):
+        """发布当前统计和战斗总结"""
+        if not self._dirty:
+            return
+        self._dirty = False
+        self.stats = MappingProxyType({uid: history.stats() for uid, history in self._histories.items()})
+        self.encounters = tuple(self._encounters)
@@ -0,0 +1,194 @@
+"""
+延迟追踪模块
+按采样追踪数据帧从抓包到敌人数据更新的各阶段耗时, 用 HDR 风格的对数分桶直方图统计
+
+被采样的数据帧在抓包线程记下到达时间, 以它开头的应用层数据包创建 Trace,
+Trace 随数据包经过重组、解压、protobuf解析、属性解析和敌人表更新, 每个阶段结束时调用 mark(),
+最后由 LatencyTracer.finish() 把各阶段耗时和端到端耗时计入直方图。
+"""
+
+import time
+from typing import Any, Dict, List, Optional
+
+# 阶段名称, 按处理顺序
+REASSEMBLY = 'reassembly'
+DECOMPRESS = 'decompress'
+PARSE = 'parse'
+ATTR_DECODE = 'attr_decode'
+DECODE_POOL = 'decode_pool'
+STORE_UPDATE = 'store_update'
+TOTAL = 'total'
+STAGES = (REASSEMBLY, DECOMPRESS, PARSE, ATTR_DECODE, DECODE_POOL, STORE_UPDATE, TOTAL)
+
+# 默认每多少个数据帧追踪一个
+DEFAULT_TRACE_INTERVAL = 100
+
+
+class LatencyHistogram:
+    """
+    对数分桶的延迟直方图
+
+    以微秒为单位, 小于 2^SUB_BITS 微秒的值精确计数, 更大的值每个2的幂区间分为 2^(SUB_BITS-1) 个桶,
+    相对误差不超过 1/2^(SUB_BITS-1)。记录一次只做整数运算和一次列表计数, 不分配对象。
+    """
+
+    SUB_BITS = 7
+    # 可记录的最大值约 2^32 微秒(约71分钟), 更大的值计入最后一个桶
+    MAX_BITS = 32
+
+    __slots__ = ('counts', 'count', 'sum', 'min', 'max')
+
+    def __init__(self):
+        self.counts = [0] * self._index(1 << self.MAX_BITS)
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = 0.0
+
+    @classmethod
+    def _index(cls, micros: int) -> int:
+        if micros < (1 << cls.SUB_BITS):
+            return micros
+        shift = micros.bit_length() - cls.SUB_BITS
+        return (shift << (cls.SUB_BITS - 1)) + (micros >> shift)
+
+    @classmethod
+    def _upper_bound(cls, index: int) -> int:
+        """桶内的最大值(微秒)"""
+        if index < (1 << cls.SUB_BITS):
+            return index
+        shift = (index >> (cls.SUB_BITS - 1)) - 1
+        mantissa = index - (shift << (cls.SUB_BITS - 1))
+        return ((mantissa + 1) << shift) - 1
+
+    def record(self, seconds: float):
+        """记录一个耗时(秒)"""
+        if seconds < 0:
+            seconds = 0.0
+        counts = self.counts
+        index = self._index(int(seconds * 1e6))
+        if index >= len(counts):
+            index = len(counts) - 1
+        counts[index] += 1
+        self.count += 1
+        self.sum += seconds
+        if self.min is None or seconds < self.min:
+            self.min = seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentiles(self, quantiles: List[float]) -> List[float]:
+        """
+        计算分位数
+
+        Args:
+            quantiles: 升序的分位数, 如 [0.5, 0.99]
+
+        Returns:
+            对应的耗时(秒), 取所在桶的上界, 不超过记录到的最大值
+        """
+        if not self.count:
+            return [0.0] * len(quantiles)
+        # 复制一份, 写入线程可能同时在记录
+        counts = list(self.counts)
+        total = sum(counts)
+        results = []
+        seen = 0
+        index = 0
+        for quantile in quantiles:
+            target = max(1, int(quantile * total + 0.5))
+            while index < len(counts) and seen + counts[index] < target:
+                seen += counts[index]
+                index += 1
+            results.append(min(self._upper_bound(index) / 1e6, self.max))
+        return results
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        统计摘要
+
+        Returns:
+            {"count", "mean", "min", "p50", "p90", "p99", "p999", "max"}, 耗时单位为毫秒
+        """
+        count = self.count
+        p50, p90, p99, p999 = self.percentiles([0.5, 0.9, 0.99, 0.999])
+        return {
+            'count': count,
+            'mean': self.sum / count * 1e3 if count else 0.0,
+            'min': (self.min or 0.0) * 1e3,
+            'p50': p50 * 1e3,
+            'p90': p90 * 1e3,
+            'p99': p99 * 1e3,
+            'p999': p999 * 1e3,
+            'max': self.max * 1e3,
+        }
+
+
+class Trace:
+    """
+    单个被追踪数据包的各阶段耗时
+
+    mark() 记录从上一次 mark() 到现在的耗时; 同一阶段多次 mark() 时累加(如 FrameDown 与内层 Notify 各解压一次)。
+    Trace 可以序列化后交给解码进程, 在解码进程内只使用该进程的时钟计算各阶段耗时。
+    """
+
+    __slots__ = ('start', 'last', 'stages', 'finished')
+
+    def __init__(self, start: float):
+        """
+        初始化
+
+        Args:
+            start: 数据包第一个数据帧的到达时间(time.perf_counter)
+        """
+        self.start = start
+        self.last = start
+        self.stages: Dict[str, float] = {}
+        self.finished = False
+
+    def mark(self, stage: str):
+        """结束一个阶段"""
+        now = time.perf_counter()
+        self.stages[stage] = self.stages.get(stage, 0.0) + (now - self.last)
+        self.last = now
+
+
+class LatencyTracer:
+    """按阶段汇总 Trace 的直方图"""
+
+    def __init__(self):
+        self.histograms: Dict[str, LatencyHistogram] = {stage: LatencyHistogram() for stage in STAGES}
+
+    def finish(self, trace: Optional[Trace]):
+        """
+        结束追踪, 计入各阶段耗时和端到端耗时
+
+        一个数据包包含多条消息时只计入第一条到达敌人表的消息, 之后的调用被忽略。
+        """
+        if trace is None or trace.finished:
+            return
+        trace.finished = True
+        histograms = self.histograms
+        for stage, seconds in trace.stages.items():
+            histogram = histograms.get(stage)
+            if histogram is not None:
+                histogram.record(seconds)
+        histograms[TOTAL].record(time.perf_counter() - trace.start)
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        """各阶段的统计摘要, 不包含没有样本的阶段"""
+        return {stage: histogram.summary() for stage, histogram in self.histograms.items() if histogram.count}
+
+    def format_table(self) -> List[str]:
+        """格式化为文本表格, 每行一个阶段"""
+        summary = self.summary()
+        if not summary:
+            return ["没有延迟追踪样本"]
+        # 中文字符占两列, 表头按显示宽度对齐
+        lines = [f"{'阶段':<14}{'样本':>6}{'平均':>8}{'p50':>10}{'p90':>10}{'p99':>10}{'p99.9':>10}{'最大':>8}  (毫秒)"]
+        for stage, stats in summary.items():
+            lines.append(
+                f"{stage:<16}{stats['count']:>8}{stats['mean']:>10.3f}{stats['p50']:>10.3f}{stats['p90']:>10.3f}"
+                f"{stats['p99']:>10.3f}{stats['p999']:>10.3f}{stats['max']:>10.3f}"
+            )
+        return lines
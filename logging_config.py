@@ -1,73 +1,236 @@
 """
 日志配置
+日志记录先放入队列, 由后台线程写入控制台和文件, 抓包和解码线程不等待磁盘和控制台IO
 """
 
+import atexit
+import gzip
 import logging
+import logging.handlers
 import os
+import queue
+import shutil
+import sys
+import threading
+import time
 from datetime import datetime
 
+# 单个日志文件的最大字节数, 超出后轮转并压缩旧文件
+DEFAULT_MAX_BYTES = 10 * 1024 * 1024
+# 保留的旧日志文件数
+DEFAULT_BACKUP_COUNT = 5
+# 每个调用位置每秒最多输出的调试日志数, 0表示不限制
+DEFAULT_DEBUG_RATE = 20.0
 
-def setup_logging(level=logging.INFO, debug_mode=False):
+_listener = None
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    按调用位置限流
+
+    每个调用位置(文件名 + 行号)使用一个令牌桶, 每秒补充 rate 个, 最多积累 burst 个;
+    没有令牌时丢弃该条日志, 下一条输出的日志附带期间丢弃的条数。
+    只限制 level 及以下级别的日志。
+    """
+
+    def __init__(self, rate: float = DEFAULT_DEBUG_RATE, burst: int = None, level: int = logging.DEBUG):
+        """
+        初始化
+
+        Args:
+            rate: 每个调用位置每秒输出的日志数
+            burst: 令牌桶容量, 默认为 rate 的 5 倍
+            level: 限流的最高日志级别
+        """
+        super().__init__()
+        self.rate = rate
+        self.burst = burst if burst is not None else max(1.0, rate * 5)
+        self.level = level
+        self.suppressed = 0
+        # (文件名, 行号) -> [令牌数, 上次补充时间, 丢弃数]
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > self.level:
+            return True
+        key = (record.pathname, record.lineno)
+        now = record.created
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [self.burst, now, 0]
+            tokens = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+            if tokens < 1:
+                bucket[0] = tokens
+                bucket[2] += 1
+                self.suppressed += 1
+                return False
+            bucket[0] = tokens - 1
+            dropped = bucket[2]
+            bucket[2] = 0
+        if dropped:
+            record.msg = f"{record.msg} (此前省略 {dropped} 条)"
+        return True
+
+
+class LogSampler:
+    """
+    单个调用位置的日志限流器
+
+    RateLimitFilter 要在日志记录创建之后才能判断, 每秒调用上万次的调试日志仍要付出
+    创建记录和查找调用位置的开销; 这类调用位置先调用 allow(), 被限流时不创建记录。
+    不加锁, 多线程同时调用时限流只是近似的。
+    """
+
+    # 每秒允许的次数, 由 setup_logging 设置; 0表示不限制
+    rate = DEFAULT_DEBUG_RATE
+
+    __slots__ = ('_tokens', '_last', 'suppressed')
+
+    def __init__(self):
+        self._tokens = None
+        self._last = 0.0
+        self.suppressed = 0
+
+    def allow(self) -> bool:
+        """是否输出本次日志"""
+        rate = LogSampler.rate
+        if rate <= 0:
+            return True
+        now = time.monotonic()
+        burst = max(1.0, rate * 5)
+        if self._tokens is None:
+            tokens = burst
+        else:
+            tokens = min(burst, self._tokens + (now - self._last) * rate)
+        self._last = now
+        if tokens < 1:
+            self._tokens = tokens
+            self.suppressed += 1
+            return False
+        self._tokens = tokens - 1
+        return True
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """
+    只把日志记录放入队列的处理器
+
+    默认的 QueueHandler 会在调用线程里格式化消息, 这里把格式化留给后台线程;
+    日志参数在进程内传递, 调用方不应在记录日志后修改作为参数的可变对象。
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+class CompressingRotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """按大小轮转的文件处理器, 轮转出的旧文件以 gzip 压缩保存"""
+
+    def __init__(self, filename: str, max_bytes: int = DEFAULT_MAX_BYTES,
+                 backup_count: int = DEFAULT_BACKUP_COUNT, encoding: str = 'utf-8'):
+        super().__init__(filename, maxBytes=max_bytes, backupCount=backup_count, encoding=encoding)
+        self.namer = self._gzip_name
+        self.rotator = self._gzip_rotate
+
+    @staticmethod
+    def _gzip_name(name: str) -> str:
+        return name + ".gz"
+
+    @staticmethod
+    def _gzip_rotate(source: str, dest: str):
+        with open(source, 'rb') as src, gzip.open(dest, 'wb') as dst:
+            shutil.copyfileobj(src, dst)
+        os.remove(source)
+
+
+def setup_logging(level=logging.INFO, debug_mode=False, log_dir="logs",
+                  max_bytes=DEFAULT_MAX_BYTES, backup_count=DEFAULT_BACKUP_COUNT,
+                  debug_rate=DEFAULT_DEBUG_RATE):
     """
     日志配置
-    
+
     Args:
         level: 日志级别
         debug_mode: 是否为调试模式
+        log_dir: 日志文件目录
+        max_bytes: 单个日志文件的最大字节数, 超出后轮转, 旧文件压缩为 .gz
+        backup_count: 保留的旧日志文件数
+        debug_rate: 每个调用位置每秒最多输出的调试日志数, 0表示不限制
     """
+    global _listener
     # 如果已经配置过，直接返回
     if logging.getLogger().handlers:
         return
-    
+
     # 设置日志级别
     if debug_mode:
         level = logging.DEBUG
-    
+
     # 创建日志目录
-    log_dir = "logs"
     if not os.path.exists(log_dir):
         os.makedirs(log_dir)
-    
+
     # 生成日志文件名（包含时间戳）
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     log_file = os.path.join(log_dir, f"star_resonance_{timestamp}.log")
-    
+
     # 配置日志格式
     formatter = logging.Formatter(
         '[%(asctime)s] [%(name)s] [%(levelname)s] %(message)s',
         datefmt='%Y-%m-%d %H:%M:%S'
     )
-    
+
     # 控制台处理器
-    console_handler = logging.StreamHandler()
+    console_handler = logging.StreamHandler(sys.stdout)
     console_handler.setLevel(level)
     console_handler.setFormatter(formatter)
-    
+
     # 文件处理器
-    file_handler = logging.FileHandler(log_file, encoding='utf-8')
+    file_handler = CompressingRotatingFileHandler(log_file, max_bytes, backup_count)
     file_handler.setLevel(level)
     file_handler.setFormatter(formatter)
-    
+
+    # 记录日志的线程只把记录放入队列, 由后台线程写入控制台和文件
+    queue_handler = _QueueHandler(queue.SimpleQueue())
+    LogSampler.rate = debug_rate
+    if debug_rate > 0:
+        queue_handler.addFilter(RateLimitFilter(debug_rate))
+    _listener = logging.handlers.QueueListener(queue_handler.queue, console_handler, file_handler,
+                                               respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+
     # 配置根日志器
     root_logger = logging.getLogger()
     root_logger.setLevel(level)
-    root_logger.addHandler(console_handler)
-    root_logger.addHandler(file_handler)
-    
+    root_logger.addHandler(queue_handler)
+
     # 记录日志配置信息
     logger = logging.getLogger(__name__)
-    logger.info(f"日志系统已初始化 - 级别: {logging.getLevelName(level)}")
-    logger.info(f"日志文件: {log_file}")
+    logger.info("日志系统已初始化 - 级别: %s", logging.getLevelName(level))
+    logger.info("日志文件: %s", log_file)
+
+
+def stop_logging():
+    """停止后台写入线程, 写完队列中剩余的日志"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
 
 
 def get_logger(name):
     """
     获取指定名称的日志器
-    
+
     Args:
         name: 日志器名称
-    
+
     Returns:
         Logger实例
     """
-    return logging.getLogger(name) 
\ No newline at end of file
+    return logging.getLogger(name)
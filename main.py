@@ -7,18 +7,22 @@ import io
 import sys
 sys.stdout.reconfigure(encoding='utf-8')
 import json
-import logging
 import time
 import threading
 import argparse
 import os
 import multiprocessing as mp
 from typing import Dict, List, Optional, Any
-from enemy_manager import EnemyManager
-from logging_config import setup_logging, get_logger
+from enemy_manager import DEFAULT_DISAPPEAR_TTL, DEFAULT_ENEMY_TTL, EnemyManager
+from latency import DEFAULT_TRACE_INTERVAL
+from logging_config import DEFAULT_DEBUG_RATE, setup_logging, get_logger
+from monster_table import available_languages, names_file
 from packet_capture import PacketCapture
+from segment_queue import SegmentQueue
+from session_file import is_session_file
 from network_interface_util import get_network_interfaces, select_network_interface
 from packet_parser import PacketParser
+from watchlist import DEFAULT_WATCHLIST_FILE
 
 
 # 多进程保护
@@ -31,12 +35,35 @@ logger = get_logger(__name__) if _is_main_process else None
 class StarResonanceMonitor:
     """星痕共鸣监控器"""
     
-    def __init__(self, interface_index: int = None):
+    def __init__(self, interface_index: int = None, use_scapy_dissect: bool = False,
+                 narrow_filter: bool = True, queue_size: int = 65536,
+                 queue_policy: str = SegmentQueue.DROP_NEWEST, decode_workers: int = 0,
+                 zstd_dict: bytes = None, slim_decoder: bool = False,
+                 watchlist_file: str = DEFAULT_WATCHLIST_FILE, enemy_ttl: float = DEFAULT_ENEMY_TTL,
+                 disappear_ttl: float = DEFAULT_DISAPPEAR_TTL, max_enemies: int = 0,
+                 language: str = None, trace_interval: int = DEFAULT_TRACE_INTERVAL,
+                 record_file: str = None, record_compress: bool = True, multi_client: bool = False):
         """
         初始化监控器
         
         Args:
             interface_index: 网络接口索引
+            use_scapy_dissect: 是否使用scapy完整解析数据包
+            narrow_filter: 识别到游戏服务器后是否收窄内核过滤器
+            queue_size: 抓包队列长度
+            queue_policy: 抓包队列满时的处理策略
+            decode_workers: 解码工作进程数, 0表示不启用多进程解码
+            zstd_dict: 训练好的zstd字典
+            slim_decoder: 是否用精简的 aoi.proto 解码AOI同步消息
+            watchlist_file: 关注列表配置文件
+            enemy_ttl: 敌人超过该时间(秒)未更新时移除, 0表示不按时间移除
+            disappear_ttl: 消失的敌人保留的时间(秒)
+            max_enemies: 敌人表的最大条数, 0表示不限制
+            language: 怪物名称的语言, None表示默认语言
+            trace_interval: 延迟追踪的采样间隔, 每多少个数据帧追踪一个, 0表示关闭
+            record_file: 录制重组后数据包的会话文件, None表示不录制
+            record_compress: 录制时是否按块 zstd 压缩
+            multi_client: 多开模式, 同时跟踪多个游戏连接; 关闭时切换游戏服务器后立即清理旧连接的敌人
         """
         self.interface_index = interface_index
         self.is_running = False
@@ -50,17 +77,28 @@ class StarResonanceMonitor:
             
         # 初始化组件
         interface_name = self.selected_interface['name'] if self.selected_interface else None
-        self.packet_capture = PacketCapture(interface_name)
-        self.packet_parser = PacketParser(self._on_callback)
-        self.enemy_manager = EnemyManager()
-        # 统计数据
-        self.stats = {
-            'total_packets': 0,
-            'sync_container_packets': 0,
-            'parsed_modules': 0,
-            'players_found': 0,
-            'start_time': None
-        }
+        self.packet_capture = PacketCapture(
+            interface_name,
+            use_scapy_dissect=use_scapy_dissect,
+            narrow_filter=narrow_filter,
+            queue_size=queue_size,
+            queue_policy=queue_policy,
+            decode_workers=decode_workers,
+            zstd_dict=zstd_dict,
+            slim_decoder=slim_decoder,
+            monster_language=language,
+            trace_interval=trace_interval,
+            record_file=record_file,
+            record_compress=record_compress,
+            multi_client=multi_client
+        )
+        self.packet_parser = PacketParser(self._on_callback, language)
+        self.enemy_manager = EnemyManager(watchlist_file, enemy_ttl, disappear_ttl, max_enemies)
+        # 抓包和解码指标与敌人表指标一起由 /metrics 导出
+        self.packet_capture.register_metrics(self.enemy_manager.metrics)
+        self.start_time = None
+        # 上次输出吞吐时的 (时间, 指标值)
+        self._last_metrics = None
         
         # 存储解析结果
         self.player_modules = {}  # 玩家UID -> 模组列表
@@ -69,7 +107,8 @@ class StarResonanceMonitor:
     def start_monitoring(self):
         """开始监控"""
         self.is_running = True
-        self.stats['start_time'] = time.time()
+        self.start_time = time.time()
+        self._last_metrics = (time.monotonic(), self.enemy_manager.metrics.collect())
         
         logger.info("=== 星痕共鸣监控器启动 ===")
         if self.selected_interface:
@@ -82,7 +121,8 @@ class StarResonanceMonitor:
         
         # 启动抓包
         self.packet_capture.start_capture(self._on_callback)
-        
+        # 抓包配置完成后再启动API服务, fastapi/uvicorn 在服务线程中加载
+        self.enemy_manager.start_server()
         
         logger.info("监控已启动")
         
@@ -90,32 +130,105 @@ class StarResonanceMonitor:
         """停止监控"""
         self.is_running = False
         self.packet_capture.stop_capture()
+        self.log_latency()
         
         logger.info("=== 监控已停止 ===")
 
+    def replay(self, pcap_file: str, speed: float = 0, start: float = None, end: float = None):
+        """
+        回放离线抓包文件或录制的会话文件并输出吞吐统计
+        
+        Args:
+            pcap_file: pcap/pcapng 或会话文件路径
+            speed: 回放倍速, 0表示不限速
+            start: 会话文件从录制开始后第几秒开始回放
+            end: 会话文件回放到录制开始后第几秒
+        """
+        logger.info("=== 星痕共鸣监控器回放模式 ===")
+        self.enemy_manager.start_server()
+        start_updates = self.enemy_manager.update_count
+        if is_session_file(pcap_file):
+            result = self.packet_capture.replay_session(pcap_file, self._on_callback, speed, start, end)
+        else:
+            if start is not None or end is not None:
+                logger.warning("只有会话文件支持按时间定位, 忽略 --replay-from/--replay-to")
+            result = self.packet_capture.replay(pcap_file, self._on_callback, speed)
+        
+        elapsed = result['elapsed'] or 1e-9
+        updates = self.enemy_manager.update_count - start_updates
+        logger.info(f"回放耗时: {elapsed:.3f} 秒 (抓包时长: {result['capture_duration']:.3f} 秒)")
+        logger.info(f"数据帧: {result['frames']} ({result['frames'] / elapsed:.1f} 帧/秒)")
+        logger.info(f"应用层消息: {result['messages']} ({result['messages'] / elapsed:.1f} 条/秒)")
+        logger.info(f"敌人更新: {updates} ({updates / elapsed:.1f} 次/秒)")
+        logger.info(f"抓包队列: 高水位 {result['queue_high_water']}, 丢弃 {result['queue_dropped']}")
+        zstd_stats = self.packet_capture.get_zstd_stats()
+        logger.info(
+            f"zstd解压: {zstd_stats['count']} 次, 失败 {zstd_stats['failures']} 次, "
+            f"{zstd_stats['compressed_bytes']} -> {zstd_stats['decompressed_bytes']} 字节, "
+            f"耗时 {zstd_stats['decompress_time'] * 1000:.1f} 毫秒"
+        )
+        self.log_enemy_stats()
+        self.log_latency()
+
+    def log_latency(self):
+        """输出从抓包到敌人表更新各阶段的延迟分布"""
+        if not self.packet_capture.trace_interval:
+            return
+        logger.info(f"延迟追踪 (每 {self.packet_capture.trace_interval} 个数据帧采样一个):")
+        for line in self.enemy_manager.latency.format_table():
+            logger.info(line)
+
+    def log_throughput(self):
+        """输出自上次调用以来的数据帧、消息和敌人更新速率, 以及解码错误计数"""
+        now = time.monotonic()
+        values = self.enemy_manager.metrics.collect()
+        if self._last_metrics is not None:
+            last_time, last = self._last_metrics
+            elapsed = max(now - last_time, 1e-9)
+
+            def rate(name):
+                return (values.get(name, 0) - last.get(name, 0)) / elapsed
+
+            logger.info(
+                f"吞吐: 数据帧 {rate('capture_frames_total'):.1f}/秒, "
+                f"消息 {rate('decode_messages_total'):.1f}/秒, "
+                f"敌人更新 {rate('enemy_updates_total'):.1f}/秒, "
+                f"重组 {rate('capture_reassembled_bytes_total') / 1024:.1f} KB/秒"
+            )
+        logger.info(
+            f"解码错误: 无效长度 {values.get('capture_invalid_length_total', 0)}, "
+            f"zstd解压失败 {values.get('decode_zstd_failures_total', 0)}, "
+            f"乱序缓存分段 {values.get('capture_tcp_cache_segments', 0)}"
+        )
+        self._last_metrics = (now, values)
+
+    def log_enemy_stats(self):
+        """输出敌人表大小和过期移除统计"""
+        enemy_stats = self.enemy_manager.get_stats()
+        evictions = enemy_stats['evictions']
+        logger.info(
+            f"敌人表: {enemy_stats['size']} 条, 关注 {enemy_stats['watched']} 条, "
+            f"移除 消失 {evictions['disappeared']} / 超时 {evictions['expired']} / 超出上限 {evictions['capacity']}"
+        )
+
     def _on_callback(self, data: Dict[str, Any]):
         try:
+            flow_id = data.get('flow_id', 0)
+            timestamp = data.get('time')
             if "SyncNearDeltaInfo" in data:
                 sync_data = data["SyncNearDeltaInfo"]
-                self.packet_parser.parse_SyncNearDeltaInfo(sync_data)
+                self.packet_parser.parse_SyncNearDeltaInfo(sync_data, flow_id, timestamp, data.get('trace'))
             if "SyncNearEntities" in data:
                 sync_data = data["SyncNearEntities"]
-                self.packet_parser.parse_SyncNearEntities(sync_data)
-            if "server_change" in data:
-                self.packet_capture.src_servers = {}
-                # self.packet_capture._clear_tcp_cache()
-                self.enemy_manager.clearAll()
-            enemy_uid = data.get('enemy_uid')
-            enemy_name = data.get('enemy_name')
-            enemy_hp = data.get('enemy_hp')
-            enemy_max_hp = data.get('enemy_max_hp')
-            if enemy_uid:
-                self.enemy_manager.sync_enemy(
-                    id=enemy_uid,
-                    name=enemy_name,
-                    hp=enemy_hp,
-                    max_hp=enemy_max_hp
-                )
+                self.packet_parser.parse_SyncNearEntities(sync_data, flow_id, timestamp, data.get('trace'))
+            if "server_change" in data or "flow_closed" in data:
+                # 只清理该游戏连接的敌人, 不影响其他客户端
+                self.enemy_manager.clear_flow(flow_id)
+            if "cleanup" in data:
+                self.enemy_manager.expire(timestamp)
+            enemy_deltas = data.get('enemy_deltas')
+            if enemy_deltas:
+                self.enemy_manager.sync_enemies(enemy_deltas, flow_id, timestamp, data.get('trace'))
         except Exception as e:
             logger.error(f"Exception: {e}")
 
@@ -125,13 +238,81 @@ def main():
     parser = argparse.ArgumentParser(description='星痕共鸣模组筛选器')
     parser.add_argument('--interface', '-i', type=int, help='网络接口索引')
     parser.add_argument('--debug', '-d', action='store_true', help='启用调试模式')
+    parser.add_argument('--log-rate', type=float, default=DEFAULT_DEBUG_RATE,
+                        help=f'调试模式下每个调用位置每秒最多输出的日志数, 0表示不限制 (默认: {DEFAULT_DEBUG_RATE:g})')
     parser.add_argument('--auto', '-a', action='store_true', help='自动检测默认网络接口')
     parser.add_argument('--list', '-l', action='store_true', help='列出所有网络接口')
+    parser.add_argument('--replay', '-r', metavar='FILE', help='回放离线抓包文件(pcap/pcapng)或 --record 录制的会话文件')
+    parser.add_argument('--speed', type=float, default=0, help='回放倍速, 0表示不限速 (默认: 0)')
+    parser.add_argument('--replay-from', type=float, metavar='SECONDS', help='会话文件从录制开始后第几秒开始回放')
+    parser.add_argument('--replay-to', type=float, metavar='SECONDS', help='会话文件回放到录制开始后第几秒')
+    parser.add_argument('--record', metavar='FILE', help='把重组后的完整数据包录制到会话文件, 可用 --replay 回放')
+    parser.add_argument('--record-raw', action='store_true', help='录制时不压缩')
+    parser.add_argument('--scapy-dissect', action='store_true', help='使用scapy完整解析数据包(较慢, 兼容模式, 不收窄内核过滤器)')
+    parser.add_argument('--multi-client', action='store_true', help='多开模式: 不收窄内核过滤器, 同时跟踪多个游戏连接')
+    parser.add_argument('--queue-size', type=int, default=65536, help='抓包队列长度 (默认: 65536)')
+    parser.add_argument('--queue-policy', choices=SegmentQueue.POLICIES, default=SegmentQueue.DROP_NEWEST,
+                        help='抓包队列满时的处理策略 (默认: drop_newest)')
+    parser.add_argument('--decode-workers', type=int, default=0,
+                        help='解压和protobuf解析的工作进程数, 0表示不启用多进程解码 (默认: 0)')
+    parser.add_argument('--zstd-dict', metavar='FILE', help='训练好的zstd字典文件')
+    parser.add_argument('--watchlist', metavar='FILE', default=DEFAULT_WATCHLIST_FILE,
+                        help=f'关注列表配置文件, 修改后自动重新加载 (默认: {DEFAULT_WATCHLIST_FILE})')
+    parser.add_argument('--decoder', choices=('proto', 'slim'), default='proto',
+                        help='AOI同步消息解码方式: proto 完整解析, slim 用只声明实体Uuid和属性的精简 aoi.proto 解析 (默认: proto)')
+    parser.add_argument('--enemy-ttl', type=float, default=DEFAULT_ENEMY_TTL,
+                        help=f'敌人超过该时间(秒)未更新时移除, 0表示不按时间移除 (默认: {DEFAULT_ENEMY_TTL:g})')
+    parser.add_argument('--disappear-ttl', type=float, default=DEFAULT_DISAPPEAR_TTL,
+                        help=f'离开视野的敌人保留的时间(秒) (默认: {DEFAULT_DISAPPEAR_TTL:g})')
+    parser.add_argument('--max-enemies', type=int, default=0,
+                        help='敌人表的最大条数, 超出时移除最久未更新的敌人, 0表示不限制 (默认: 0)')
+    parser.add_argument('--trace-sample', type=int, default=DEFAULT_TRACE_INTERVAL, metavar='N',
+                        help=f'延迟追踪的采样间隔, 每 N 个数据帧追踪一个, 0表示关闭 (默认: {DEFAULT_TRACE_INTERVAL})')
+    parser.add_argument('--language', metavar='LANG',
+                        help='怪物名称的语言, 使用 monster_names.<LANG>.json (默认: monster_names.json)')
 
     args = parser.parse_args()
     
     # 设置日志系统
-    setup_logging(debug_mode=args.debug)
+    setup_logging(debug_mode=args.debug, debug_rate=args.log_rate)
+    
+    zstd_dict = None
+    if args.zstd_dict:
+        with open(args.zstd_dict, 'rb') as f:
+            zstd_dict = f.read()
+    
+    if args.language and not os.path.exists(names_file(args.language)):
+        logger.error(f"未找到怪物名称表: {names_file(args.language)}, 可用语言: {', '.join(available_languages()) or '无'}")
+        return
+
+    # 回放离线抓包文件
+    if args.replay:
+        if not os.path.exists(args.replay):
+            logger.error(f"抓包文件不存在: {args.replay}")
+            return
+        monitor = StarResonanceMonitor(
+            use_scapy_dissect=args.scapy_dissect,
+            queue_size=args.queue_size,
+            queue_policy=args.queue_policy,
+            decode_workers=args.decode_workers,
+            zstd_dict=zstd_dict,
+            slim_decoder=args.decoder == 'slim',
+            watchlist_file=args.watchlist,
+            enemy_ttl=args.enemy_ttl,
+            disappear_ttl=args.disappear_ttl,
+            max_enemies=args.max_enemies,
+            language=args.language,
+            trace_interval=args.trace_sample,
+            record_file=args.record,
+            record_compress=not args.record_raw,
+            multi_client=args.multi_client
+        )
+        try:
+            monitor.replay(args.replay, args.speed, args.replay_from, args.replay_to)
+        except KeyboardInterrupt:
+            logger.info("收到停止信号")
+            monitor.packet_capture.stop_capture()
+        return
         
     # 获取网络接口列表
     interfaces = get_network_interfaces()
@@ -187,7 +368,23 @@ def main():
             
     # 创建监控器
     monitor = StarResonanceMonitor(
-        interface_index=interface_index
+        interface_index=interface_index,
+        use_scapy_dissect=args.scapy_dissect,
+        narrow_filter=not args.multi_client,
+        queue_size=args.queue_size,
+        queue_policy=args.queue_policy,
+        decode_workers=args.decode_workers,
+        zstd_dict=zstd_dict,
+        slim_decoder=args.decoder == 'slim',
+        watchlist_file=args.watchlist,
+        enemy_ttl=args.enemy_ttl,
+        disappear_ttl=args.disappear_ttl,
+        max_enemies=args.max_enemies,
+        language=args.language,
+        trace_interval=args.trace_sample,
+        record_file=args.record,
+        record_compress=not args.record_raw,
+        multi_client=args.multi_client
     )
     
     try:
@@ -201,10 +398,19 @@ def main():
         def periodic_task():
             while True:
                 time.sleep(30)
-                logger.info("定时输出：30 秒过去了喵~")
-                # for server, count in monitor.packet_capture.src_servers.items():
-                #     if count>10:
-                #         logger.info(f"服务器 {server} - 捕获数据包数: {count}")
+                monitor.log_throughput()
+                filter_stats = monitor.packet_capture.get_filter_stats()
+                logger.info(
+                    f"内核过滤器: {filter_stats['filter']}, 送达: {filter_stats['delivered']}, "
+                    f"内核过滤: {filter_stats['kernel_filtered']}"
+                )
+                logger.info(f"游戏连接数: {len(monitor.packet_capture.flows)}")
+                queue_stats = monitor.packet_capture.get_queue_stats()
+                logger.info(
+                    f"抓包队列: {queue_stats['size']}/{queue_stats['maxsize']}, "
+                    f"高水位: {queue_stats['high_water']}, 丢弃: {queue_stats['dropped']}"
+                )
+                monitor.log_enemy_stats()
         t = threading.Thread(target=periodic_task, daemon=True)
         t.start()
         
@@ -224,10 +430,4 @@ if __name__ == "__main__":
     sys.stdout.reconfigure(encoding='utf-8')
     # 包装 sys.stdout，指定 utf-8
     sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding="utf-8")
-    logging.basicConfig(
-        level=logging.INFO,
-        format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
-        handlers=[logging.StreamHandler(sys.stdout)]
-    )
-    logger = logging.getLogger(__name__)
     main() 
\ No newline at end of file
@@ -0,0 +1,128 @@
+"""
+运行指标模块
+以 Prometheus 文本格式导出抓包、解码和敌人表的运行指标
+
+计数由各模块自己维护, 即只由一个线程写入的普通整数属性, 热路径上的计数不加锁也不分配对象;
+注册表只保存读取函数, 在导出时才读取各模块的当前值。
+"""
+
+from typing import Any, Callable, Dict, List, Optional
+
+from logging_config import get_logger
+
+logger = get_logger(__name__)
+
+# Prometheus 文本格式的 Content-Type
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+DEFAULT_NAMESPACE = "star_resonance"
+
+
+class Metric:
+    """单个指标: 名称、类型、说明和读取函数"""
+
+    __slots__ = ('name', 'kind', 'help', 'label', 'func')
+
+    def __init__(self, name: str, kind: str, help: str, func: Callable[[], Any], label: Optional[str] = None):
+        self.name = name
+        self.kind = kind
+        self.help = help
+        self.label = label
+        self.func = func
+
+
+class MetricsRegistry:
+    """
+    指标注册表
+
+    读取函数返回数值; 带标签的指标返回 标签值 -> 数值 的字典。
+    读取函数在 API 线程中调用, 读取其他线程正在修改的字典时应先用 dict() 复制。
+    """
+
+    def __init__(self, namespace: str = DEFAULT_NAMESPACE):
+        """
+        初始化
+
+        Args:
+            namespace: 指标名称前缀
+        """
+        self.namespace = namespace
+        self._metrics: List[Metric] = []
+
+    def counter(self, name: str, help: str, func: Callable[[], Any], label: Optional[str] = None):
+        """
+        注册只增不减的计数
+
+        Args:
+            name: 指标名称, 按 Prometheus 惯例以 _total 结尾
+            help: 指标说明
+            func: 读取函数
+            label: 标签名, func 返回 标签值 -> 数值 的字典时使用
+        """
+        self._register(Metric(name, 'counter', help, func, label))
+
+    def gauge(self, name: str, help: str, func: Callable[[], Any], label: Optional[str] = None):
+        """注册当前值(队列长度、表大小等), 参数同 counter"""
+        self._register(Metric(name, 'gauge', help, func, label))
+
+    def _register(self, metric: Metric):
+        if any(existing.name == metric.name for existing in self._metrics):
+            raise ValueError(f"指标已注册: {metric.name}")
+        self._metrics.append(metric)
+
+    def collect(self) -> Dict[str, Any]:
+        """
+        读取全部指标
+
+        Returns:
+            指标名称(不含前缀) -> 数值或 标签值 -> 数值 的字典; 读取失败或暂无数据(None)的指标不包含在内
+        """
+        values = {}
+        for metric in self._metrics:
+            try:
+                value = metric.func()
+            except Exception as e:
+                logger.debug("读取指标 %s 失败: %s", metric.name, e)
+                continue
+            if value is not None:
+                values[metric.name] = value
+        return values
+
+    def render(self) -> str:
+        """按 Prometheus 文本格式输出全部指标"""
+        values = self.collect()
+        lines = []
+        for metric in self._metrics:
+            if metric.name not in values:
+                continue
+            name = f"{self.namespace}_{metric.name}" if self.namespace else metric.name
+            lines.append(f"# HELP {name} {_escape_help(metric.help)}")
+            lines.append(f"# TYPE {name} {metric.kind}")
+            value = values[metric.name]
+            if metric.label is None:
+                lines.append(f"{name} {_format_value(value)}")
+                continue
+            for label_value, sample in sorted(value.items(), key=lambda item: str(item[0])):
+                lines.append(f'{name}{{{metric.label}="{_escape_label(label_value)}"}} {_format_value(sample)}')
+        lines.append("")
+        return "\n".join(lines)
+
+
+def _escape_help(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("\n", "\\n")
+
+
+def _escape_label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value) -> str:
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, int):
+        return str(value)
+    value = float(value)
+    if value != value:
+        return "NaN"
+    if value in (float('inf'), float('-inf')):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(value)
@@ -0,0 +1,256 @@
+"""
+怪物名称表模块
+把 monster_names.json 编译为可内存映射的二进制表, 按整数类型Id查询名称
+
+JSON 仍是可编辑的源文件, 二进制表不存在或比 JSON 旧时自动重新编译。
+其他语言的名称表放在 monster_names.<语言>.json, 如 monster_names.en.json。
+
+二进制格式(小端):
+    头部    magic(4s) 格式版本(H) 保留(H) 条目数(I)
+    ids     条目数 x uint32, 升序
+    offsets (条目数 + 1) x uint32, 名称在 blob 中的起止位置
+    blob    UTF-8 编码的名称
+"""
+
+import bisect
+import glob
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from typing import Dict, List, Optional
+
+from logging_config import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_NAMES_FILE = "monster_names.json"
+MAGIC = b'SRMN'
+FORMAT_VERSION = 1
+_HEADER = struct.Struct('<4sHHI')
+_UNCACHED = object()
+
+
+def names_file(language: Optional[str] = None, directory: str = ".") -> str:
+    """语言对应的 JSON 源文件路径, None表示默认语言"""
+    if not language:
+        return os.path.join(directory, DEFAULT_NAMES_FILE)
+    base, ext = os.path.splitext(DEFAULT_NAMES_FILE)
+    return os.path.join(directory, f"{base}.{language}{ext}")
+
+
+def available_languages(directory: str = ".") -> List[str]:
+    """目录下可用的其他语言名称表"""
+    base, ext = os.path.splitext(DEFAULT_NAMES_FILE)
+    prefix = f"{base}."
+    languages = []
+    for path in glob.glob(os.path.join(directory, f"{base}.*{ext}")):
+        language = os.path.basename(path)[len(prefix):-len(ext)]
+        if language:
+            languages.append(language)
+    return sorted(languages)
+
+
+def compile_names(names: Dict[str, str]) -> bytes:
+    """
+    编译名称表
+
+    Args:
+        names: 类型Id字符串 -> 名称, 即 monster_names.json 的内容
+
+    Returns:
+        二进制表
+
+    Raises:
+        ValueError: 类型Id不是 0 ~ 2^32-1 的整数
+    """
+    entries = sorted((int(type_id), name) for type_id, name in names.items())
+    ids = array('I')
+    offsets = array('I', [0])
+    blob = bytearray()
+    for type_id, name in entries:
+        if not 0 <= type_id <= 0xFFFFFFFF:
+            raise ValueError(f"怪物类型Id超出范围: {type_id}")
+        ids.append(type_id)
+        blob += name.encode('utf-8')
+        offsets.append(len(blob))
+    if sys.byteorder != 'little':
+        ids.byteswap()
+        offsets.byteswap()
+    return _HEADER.pack(MAGIC, FORMAT_VERSION, 0, len(ids)) + ids.tobytes() + offsets.tobytes() + bytes(blob)
+
+
+def compile_file(json_path: str, bin_path: str) -> bytes:
+    """
+    编译 JSON 名称表并写入二进制文件
+
+    先写入临时文件再替换, 其他进程不会读到写了一半的表。
+
+    Returns:
+        二进制表
+
+    Raises:
+        OSError: 文件无法读取或写入
+        ValueError: JSON 格式错误
+    """
+    with open(json_path, "r", encoding="utf-8") as f:
+        data = compile_names(json.load(f))
+    tmp_path = f"{bin_path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, bin_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return data
+
+
+class MonsterNameTable:
+    """
+    只读的怪物名称表
+
+    类型Id和偏移量直接在映射的内存上二分查找, 解码后的名称按类型Id缓存,
+    重复查询只是一次整数键的字典查找。
+    """
+
+    def __init__(self, data):
+        """
+        初始化
+
+        Args:
+            data: 二进制表, bytes 或 mmap
+
+        Raises:
+            ValueError: 不是有效的名称表
+        """
+        if len(data) < _HEADER.size:
+            raise ValueError("怪物名称表文件不完整")
+        magic, version, _, count = _HEADER.unpack_from(data, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError("不是有效的怪物名称表")
+        ids_end = _HEADER.size + count * 4
+        offsets_end = ids_end + (count + 1) * 4
+        if len(data) < offsets_end:
+            raise ValueError("怪物名称表文件不完整")
+        self._data = data
+        view = memoryview(data)
+        if sys.byteorder == 'little':
+            self._ids = view[_HEADER.size:ids_end].cast('I')
+            self._offsets = view[ids_end:offsets_end].cast('I')
+        else:
+            self._ids = array('I', view[_HEADER.size:ids_end])
+            self._ids.byteswap()
+            self._offsets = array('I', view[ids_end:offsets_end])
+            self._offsets.byteswap()
+        self._blob = view[offsets_end:]
+        # 类型Id -> 名称, 表中没有的类型Id缓存为None
+        self._cache: Dict[int, Optional[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __contains__(self, type_id: int) -> bool:
+        return self.get(type_id) is not None
+
+    def get(self, type_id: int, default: Optional[str] = None) -> Optional[str]:
+        """按类型Id查询名称"""
+        name = self._cache.get(type_id, _UNCACHED)
+        if name is _UNCACHED:
+            name = self._lookup(type_id)
+            self._cache[type_id] = name
+        return default if name is None else name
+
+    def _lookup(self, type_id: int) -> Optional[str]:
+        ids = self._ids
+        index = bisect.bisect_left(ids, type_id)
+        if index == len(ids) or ids[index] != type_id:
+            return None
+        return str(self._blob[self._offsets[index]:self._offsets[index + 1]], 'utf-8')
+
+    def to_dict(self) -> Dict[int, str]:
+        """转换为 类型Id -> 名称 字典"""
+        return {type_id: self.get(type_id) for type_id in self._ids}
+
+    @classmethod
+    def open(cls, path: str) -> 'MonsterNameTable':
+        """内存映射二进制表文件"""
+        with open(path, "rb") as f:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls(data)
+
+
+class FallbackNameTable:
+    """先查语言名称表, 没有翻译的类型Id再查默认名称表"""
+
+    def __init__(self, table: MonsterNameTable, fallback: MonsterNameTable):
+        self.table = table
+        self.fallback = fallback
+
+    def __len__(self) -> int:
+        return len(self.fallback)
+
+    def __contains__(self, type_id: int) -> bool:
+        return self.get(type_id) is not None
+
+    def get(self, type_id: int, default: Optional[str] = None) -> Optional[str]:
+        name = self.table.get(type_id)
+        if name is None:
+            name = self.fallback.get(type_id, default)
+        return name
+
+
+def load_table(language: Optional[str] = None, directory: str = "."):
+    """
+    加载怪物名称表
+
+    二进制表不存在或比 JSON 旧时重新编译; 无法写入二进制文件(如目录只读,
+    或文件正被其他进程映射)时直接使用内存中的编译结果。
+
+    Args:
+        language: 语言, None表示默认语言; 非默认语言缺少的名称使用默认语言
+        directory: 名称表所在目录
+
+    Returns:
+        MonsterNameTable 或 FallbackNameTable
+
+    Raises:
+        FileNotFoundError: JSON 和二进制表都不存在
+    """
+    table = _load_single(names_file(language, directory))
+    if language:
+        return FallbackNameTable(table, _load_single(names_file(None, directory)))
+    return table
+
+
+def _load_single(json_path: str) -> MonsterNameTable:
+    bin_path = os.path.splitext(json_path)[0] + ".bin"
+    json_mtime = _mtime(json_path)
+    bin_mtime = _mtime(bin_path)
+    if json_mtime is None and bin_mtime is None:
+        raise FileNotFoundError(f"未找到怪物名称表: {json_path}")
+    if bin_mtime is None or (json_mtime is not None and json_mtime > bin_mtime):
+        try:
+            compile_file(json_path, bin_path)
+            logger.info(f"已编译怪物名称表 {json_path} -> {bin_path}")
+        except OSError as e:
+            logger.warning(f"无法写入怪物名称表 {bin_path}, 使用内存中的编译结果: {e}")
+            with open(json_path, "r", encoding="utf-8") as f:
+                return MonsterNameTable(compile_names(json.load(f)))
+    try:
+        return MonsterNameTable.open(bin_path)
+    except ValueError:
+        if json_mtime is None:
+            raise
+        # 格式版本不同或文件损坏, 重新编译
+        logger.warning(f"怪物名称表 {bin_path} 无效, 重新编译")
+        return MonsterNameTable(compile_file(json_path, bin_path))
+
+
+def _mtime(path: str) -> Optional[int]:
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
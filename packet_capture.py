@@ -9,15 +9,58 @@ import threading
 import time
 import logging
 from typing import Optional, Callable, Dict, Any
-from scapy.all import sniff, IP, TCP, UDP, Raw
-import zstandard as zstd
 import json
+import psutil
 # from BlueProtobuf_pb2 import SyncContainerData, SyncNearDeltaInfo, CharSerialize, ItemPackage, Package, Item, ModNewAttr
-from star_pb2 import SyncNearDeltaInfo, SyncNearEntities
-from logging_config import get_logger
+from latency import DECOMPRESS, DEFAULT_TRACE_INTERVAL, PARSE, REASSEMBLY, Trace
+from logging_config import LogSampler, get_logger
 from packet_parser import PacketParser
+from stream_buffer import StreamBuffer
+from segment_queue import SegmentQueue
+from session_file import SessionReader, SessionWriter
+from zstd_decoder import ZstdDecoder
+from frame_dissector import (SUPPORTED_LINKTYPES, TCP_FIN, TCP_RST, Flow, build_flow_filter, dissect_tcp_frame,
+                             format_flow)
 
 logger = get_logger(__name__)
+# 每条消息都会输出的调试日志, 先限流再创建日志记录
+_notify_log = LogSampler()
+_frame_down_log = LogSampler()
+
+# scapy 只在抓包或回放时按需加载(导入 scapy.all 约需1秒), 由 _load_scapy 填充
+IP = TCP = Raw = None
+
+
+def _load_scapy(dissect: bool = False):
+    """
+    按需加载 scapy
+
+    Args:
+        dissect: 是否加载 IP/TCP 层, scapy完整解析数据包时需要
+
+    Returns:
+        scapy 全局配置 conf
+    """
+    global IP, TCP, Raw
+    from scapy.config import conf
+    # 注册链路层类型, 创建 L2listen 和识别链路层需要
+    import scapy.layers.l2  # noqa: F401
+    if dissect:
+        from scapy.layers.inet import IP, TCP
+        from scapy.packet import Raw
+    return conf
+
+
+# protobuf 消息类只在第一次解码AOI同步消息时加载, 只列出网络接口时不需要, 由 _load_protobuf 填充
+SyncNearDeltaInfo = SyncNearEntities = None
+decode_SyncNearDeltaInfo = decode_SyncNearEntities = None
+
+
+def _load_protobuf():
+    """按需加载 star_pb2 和 aoi_decoder"""
+    global SyncNearDeltaInfo, SyncNearEntities, decode_SyncNearDeltaInfo, decode_SyncNearEntities
+    from star_pb2 import SyncNearDeltaInfo, SyncNearEntities
+    from aoi_decoder import decode_SyncNearDeltaInfo, decode_SyncNearEntities
 
 
 class BinaryReader:
@@ -66,29 +109,126 @@ class BinaryReader:
         return value
 
 
+class TcpFlow:
+    """单条游戏TCP流的重组状态"""
+    
+    __slots__ = ('key', 'flow_id', 'cache', 'next_seq', 'last_time', 'last_seen', 'data',
+                 'trace_times', 'pending_since', 'last_captured')
+    
+    def __init__(self, key: Flow, flow_id: int):
+        self.key = key
+        self.flow_id = flow_id
+        self.cache = {}
+        self.next_seq = -1
+        self.last_time = 0
+        self.last_seen = 0
+        self.data = StreamBuffer()
+        # 延迟追踪: 缓存中被采样分段的到达时间(seq -> time.perf_counter),
+        # 当前未完整的数据包开头所在分段的到达时间, 以及最近一个重组分段的到达时间; 未采样时为None
+        self.trace_times = {}
+        self.pending_since = None
+        self.last_captured = None
+        
+    def clear(self):
+        """清理重组缓存"""
+        self.data.clear()
+        self.next_seq = -1
+        self.last_time = 0
+        self.cache.clear()
+        self.trace_times.clear()
+        self.pending_since = None
+        self.last_captured = None
+
+
 class PacketCapture:
     """网络数据包抓取器"""
     
-    def __init__(self, interface: str = None):
+    # 定时清理间隔(秒)
+    CLEANUP_INTERVAL = 3
+    # TCP分片超时时间(秒)
+    FRAGMENT_TIMEOUT = 3
+    # 游戏TCP流空闲超时时间(秒), 超时后移除该流
+    FLOW_TIMEOUT = 60
+    # 未识别到游戏服务器时使用的粗粒度内核过滤器
+    COARSE_FILTER = 'tcp'
+    # 收窄过滤器后超过该时间(秒)没有收到数据包时放宽过滤器, 切换游戏服务器时新连接的数据包不会被内核丢弃
+    FILTER_IDLE_TIMEOUT = 1.5
+    
+    def __init__(self, interface: str = None, use_scapy_dissect: bool = False,
+                 narrow_filter: bool = True, queue_size: int = 65536,
+                 queue_policy: str = SegmentQueue.DROP_NEWEST, decode_workers: int = 0,
+                 zstd_dict: bytes = None, slim_decoder: bool = False,
+                 monster_language: str = None,
+                 trace_interval: int = DEFAULT_TRACE_INTERVAL, record_file: str = None,
+                 record_compress: bool = True, multi_client: bool = False):
         """
         初始化抓包器
         
         Args:
             interface: 网络接口名称, None表示自动选择
+            use_scapy_dissect: 是否使用scapy完整解析每个数据包(较慢, 用于兼容)
+            narrow_filter: 识别到游戏服务器后是否收窄内核过滤器; 多开时应关闭, 否则后启动的客户端无法被识别。
+                只对原始帧抓包循环有效, use_scapy_dissect 时 scapy sniff 始终使用粗粒度过滤器
+            queue_size: 抓包线程与解码线程之间的队列长度
+            queue_policy: 队列满时的处理策略, 见 SegmentQueue.POLICIES
+            decode_workers: 解压和protobuf解析的工作进程数, 0表示在解码线程内处理
+            zstd_dict: 训练好的zstd字典, None表示不使用字典
+            slim_decoder: 是否用 aoi_decoder(精简的 aoi.proto)解码AOI同步消息, 代替star_pb2完整解析
+            monster_language: 多进程解码时工作进程使用的怪物名称语言
+            trace_interval: 延迟追踪的采样间隔, 每多少个数据帧追踪一个, 0表示关闭
+            record_file: 把重组后的完整数据包录制到该会话文件, None表示不录制
+            record_compress: 录制时是否按块 zstd 压缩
+            multi_client: 多开模式, 同时跟踪多个游戏连接; 关闭时识别到新的游戏服务器(如切换频道)后立即关闭其他连接
         """
         self.interface = interface
+        self.use_scapy_dissect = use_scapy_dissect
+        self.narrow_filter = narrow_filter
+        self.multi_client = multi_client
+        self.queue_size = queue_size
+        self.queue_policy = queue_policy
+        self.decode_workers = decode_workers
+        self.zstd_dict = zstd_dict
+        self.zstd_decoder = ZstdDecoder(zstd_dict)
+        self.slim_decoder = slim_decoder
+        self.monster_language = monster_language
+        self.trace_interval = trace_interval
+        self._trace_countdown = trace_interval
+        self.record_file = record_file
+        self.record_compress = record_compress
         self.is_running = False
         self.callback = None
         self.packet_count = 0
         self.sync_container_count = 0
+        self.message_count = 0
+        # 运行指标, 只由解码线程写入, 见 register_metrics
+        self.reassembled_bytes = 0
+        self.invalid_length_count = 0
+        self.method_counts: Dict[int, int] = {}
+        
+        # 回放模式下由数据包时间戳驱动的时钟, None表示使用系统时间
+        self._clock_time = None
+        self._last_cleanup = None
         
-        self.current_server = ''
-        self.tcp_cache = {}
-        self.tcp_next_seq = -1
-        self.tcp_last_time = 0
+        # 抓包线程只把TCP分段放入队列, 由解码线程完成重组和解析
+        self._segments = SegmentQueue(queue_size, queue_policy)
+        # 多进程解码池, 仅在 decode_workers > 0 时创建
+        self._decode_pool = None
+        self._pool_zstd_stats = {}
+        self._pool_method_counts = {}
+        # 会话录制, 仅在 record_file 不为空时创建, 由解码线程在持有 tcp_lock 时写入
+        self._recorder = None
+        self._decode_thread = None
+        
+        # 内核BPF过滤器, 识别到游戏服务器后收窄为游戏TCP流
+        self.capture_filter = self.COARSE_FILTER
+        self.filter_changes = 0
+        self._pending_filter = None
+        self._nic_packets_start = None
+        
+        # 游戏TCP流表: 流标识 -> TcpFlow
+        self.flows: Dict[Flow, TcpFlow] = {}
+        self._next_flow_id = 1
         self.tcp_lock = threading.Lock()
-        self._data = b''
-        self.src_servers = {}
         
     def start_capture(self, callback: Callable[[Dict[str, Any]], None] = None):
         """
@@ -101,117 +241,663 @@ class PacketCapture:
         self.is_running = True
         
         logger.info(f"开始抓包，接口: {self.interface or '自动'}")
+        self._nic_packets_start = self._read_nic_packets()
+        self._segments = SegmentQueue(self.queue_size, self.queue_policy)
+        self._start_decode_pool()
+        self._start_recorder()
+        
+        # 解码线程
+        decode_thread = threading.Thread(target=self._decode_loop)
+        decode_thread.daemon = True
+        decode_thread.start()
+        self._decode_thread = decode_thread
         
         # 在新线程中运行抓包
         capture_thread = threading.Thread(target=self._capture_loop)
         capture_thread.daemon = True
         capture_thread.start()
 
-        # 解析包线程
-        # threading.Thread(target=self._process_complete_packets, daemon=True).start()
-
         # 启动定时清理线程
         cleanup_thread = threading.Thread(target=self._cleanup_loop)
         cleanup_thread.daemon = True
         cleanup_thread.start()
         
+    def replay(self, pcap_file: str, callback: Callable[[Dict[str, Any]], None] = None,
+               speed: float = 0) -> Dict[str, Any]:
+        """
+        回放离线抓包文件(pcap/pcapng), 在当前线程中阻塞执行
+        
+        不限速回放时队列使用阻塞策略(背压), 按倍速回放时使用配置的策略,
+        可用于观察解码线程能否跟上实际流量
+        
+        Args:
+            pcap_file: 抓包文件路径
+            callback: 数据包处理回调函数
+            speed: 回放倍速, 1表示按原始速度, 0表示不限速
+            
+        Returns:
+            回放统计数据
+        """
+        self.callback = callback
+        self.is_running = True
+        
+        logger.info(f"开始回放: {pcap_file}, 倍速: {speed or '不限速'}")
+        
+        policy = self.queue_policy if speed > 0 else SegmentQueue.BLOCK
+        self._segments = SegmentQueue(self.queue_size, policy)
+        self._start_decode_pool()
+        self._start_recorder()
+        decode_thread = threading.Thread(target=self._decode_loop)
+        decode_thread.daemon = True
+        decode_thread.start()
+        
+        start_packets = self.packet_count
+        start_messages = self.message_count
+        first_time = None
+        packet_time = None
+        start = time.perf_counter()
+        
+        try:
+            for packet_time, frame, linktype in self._read_pcap(pcap_file):
+                if not self.is_running:
+                    break
+                
+                if first_time is None:
+                    first_time = packet_time
+                
+                # 按倍速控制回放节奏
+                if speed > 0:
+                    delay = (packet_time - first_time) / speed - (time.perf_counter() - start)
+                    if delay > 0:
+                        time.sleep(delay)
+                
+                if linktype is None:
+                    self._process_packet(frame, packet_time)
+                else:
+                    self._process_raw_frame(frame, linktype, packet_time)
+        finally:
+            # 等待解码线程处理完队列中剩余的分段
+            self._segments.close()
+            decode_thread.join()
+            self._clock_time = None
+            self._last_cleanup = None
+            self.is_running = False
+        
+        elapsed = time.perf_counter() - start
+        logger.info("回放结束")
+        queue_stats = self._segments.stats()
+        return {
+            'frames': self.packet_count - start_packets,
+            'messages': self.message_count - start_messages,
+            'elapsed': elapsed,
+            'capture_duration': (packet_time - first_time) if first_time is not None else 0,
+            'queue_high_water': queue_stats['high_water'],
+            'queue_dropped': queue_stats['dropped'],
+        }
+        
+    def _read_pcap(self, pcap_file: str):
+        """
+        读取抓包文件
+        
+        Yields:
+            (时间戳, 原始帧或scapy数据包, 链路层类型), 链路层类型为None时为scapy数据包
+        """
+        from scapy.utils import PcapReader, RawPcapReader, RawPcapNgReader
+        
+        if self.use_scapy_dissect:
+            _load_scapy(dissect=True)
+            with PcapReader(pcap_file) as reader:
+                for packet in reader:
+                    yield float(packet.time), packet, None
+            return
+            
+        conf = None
+        with RawPcapReader(pcap_file) as reader:
+            is_pcapng = isinstance(reader, RawPcapNgReader)
+            for frame, meta in reader:
+                if is_pcapng:
+                    linktype = meta.linktype
+                    packet_time = ((meta.tshigh << 32) | meta.tslow) / meta.tsresol
+                else:
+                    linktype = reader.linktype
+                    packet_time = meta.sec + meta.usec / (1e9 if reader.nano else 1e6)
+                    
+                if linktype in SUPPORTED_LINKTYPES:
+                    yield packet_time, frame, linktype
+                else:
+                    if conf is None:
+                        conf = _load_scapy(dissect=True)
+                    yield packet_time, conf.l2types.num2layer[linktype](frame), None
+        
+    def replay_session(self, session_file: str, callback: Callable[[Dict[str, Any]], None] = None,
+                       speed: float = 0, start: float = None, end: float = None) -> Dict[str, Any]:
+        """
+        回放录制的会话文件, 在当前线程中阻塞执行
+        
+        会话文件中已是重组后的完整数据包, 直接交给 _analyze_payload(或解码池), 不经过抓包队列和TCP重组。
+        每个流编号第一次出现时发送 server_change, 与实时抓包识别到游戏服务器时一致;
+        非多开模式下同时对之前的流发送 flow_closed。
+        
+        Args:
+            session_file: 会话文件路径
+            callback: 数据包处理回调函数
+            speed: 回放倍速, 1表示按原始速度, 0表示不限速
+            start: 从录制开始后第几秒开始回放, None表示从头开始
+            end: 回放到录制开始后第几秒, None表示到文件末尾
+            
+        Returns:
+            回放统计数据, 与 replay() 相同
+        """
+        self.callback = callback
+        self.is_running = True
+        
+        reader = SessionReader.open(session_file)
+        logger.info(f"开始回放会话: {session_file}, {len(reader)} 个数据包, 倍速: {speed or '不限速'}")
+        
+        self._start_decode_pool()
+        self._start_recorder()
+        
+        start_packets = self.packet_count
+        start_messages = self.message_count
+        begin = reader.start_time or 0.0
+        flow_ids = set()
+        first_time = None
+        packet_time = None
+        started = time.perf_counter()
+        
+        try:
+            frames = reader.frames(begin + start if start is not None else None,
+                                   begin + end if end is not None else None)
+            for packet_time, flow_id, frame in frames:
+                if not self.is_running:
+                    break
+                    
+                if first_time is None:
+                    first_time = packet_time
+                    
+                # 按倍速控制回放节奏
+                if speed > 0:
+                    delay = (packet_time - first_time) / speed - (time.perf_counter() - started)
+                    if delay > 0:
+                        time.sleep(delay)
+                        
+                self.packet_count += 1
+                trace = None
+                captured = self._trace_time()
+                if captured is not None:
+                    trace = Trace(captured)
+                    
+                self._advance_clock(packet_time)
+                if flow_id not in flow_ids:
+                    if not self.multi_client:
+                        for old_id in flow_ids:
+                            self._emit({'flow_closed': None, 'flow_id': old_id})
+                        flow_ids.clear()
+                    flow_ids.add(flow_id)
+                    self._emit({'server_change': None, 'flow_id': flow_id})
+                if self._recorder is not None:
+                    self._recorder.write(packet_time, flow_id, frame)
+                    
+                if self._decode_pool is not None:
+                    self._decode_pool.submit(flow_id, frame, packet_time, trace)
+                else:
+                    self._analyze_payload(frame, "TCP", flow_id, trace)
+        finally:
+            self._close_decode_pool()
+            self._close_recorder()
+            reader.close()
+            self._clock_time = None
+            self._last_cleanup = None
+            self.is_running = False
+            
+        elapsed = time.perf_counter() - started
+        logger.info("回放结束")
+        return {
+            'frames': self.packet_count - start_packets,
+            'messages': self.message_count - start_messages,
+            'elapsed': elapsed,
+            'capture_duration': (packet_time - first_time) if first_time is not None else 0,
+            'queue_high_water': 0,
+            'queue_dropped': 0,
+        }
+        
     def stop_capture(self):
         """停止抓包"""
         self.is_running = False
+        self._segments.close()
+        # 录制时等待解码线程写完剩余数据
+        if self._recorder is not None and self._decode_thread is not None:
+            self._decode_thread.join(timeout=5)
         logger.info("停止抓包")
         
+    def _start_decode_pool(self):
+        """按配置创建多进程解码池"""
+        if self.decode_workers > 0:
+            from decode_pool import DecodePool
+            self._decode_pool = DecodePool(self.callback, self.decode_workers, capture_options={
+                'zstd_dict': self.zstd_dict,
+                'slim_decoder': self.slim_decoder,
+            }, parser_options={
+                'language': self.monster_language,
+            })
+            
+    def _close_decode_pool(self):
+        """等待解码池应用完全部结果后关闭, 合并其统计数据"""
+        pool = self._decode_pool
+        if pool is None:
+            return
+        pool.close()
+        for key, value in pool.zstd_stats.items():
+            self._pool_zstd_stats[key] = self._pool_zstd_stats.get(key, 0) + value
+        for method_id, count in pool.method_counts.items():
+            self._pool_method_counts[method_id] = self._pool_method_counts.get(method_id, 0) + count
+        self._decode_pool = None
+        self.message_count += pool.message_count
+        
+    def _start_recorder(self):
+        """按配置创建会话录制"""
+        if self.record_file:
+            self._recorder = SessionWriter(self.record_file, self.record_compress)
+            logger.info(f"录制会话到: {self.record_file}")
+            
+    def _close_recorder(self):
+        """写入剩余数据并关闭会话文件"""
+        with self.tcp_lock:
+            recorder = self._recorder
+            if recorder is None:
+                return
+            self._recorder = None
+            recorder.close()
+        logger.info(
+            f"会话录制结束: {recorder.frames} 个数据包, {recorder.raw_bytes} -> {recorder.written_bytes} 字节"
+        )
+            
+    def _emit(self, data: Dict[str, Any]):
+        """发送控制事件; 启用多进程解码时经过解码池的顺序通道, 保证与之前的解码结果保持顺序"""
+        if self._decode_pool is not None:
+            self._decode_pool.post(data)
+        elif self.callback:
+            self.callback(data)
+        
+    def get_zstd_stats(self) -> Dict[str, Any]:
+        """获取zstd解压统计, 包含多进程解码池中各工作进程的数据"""
+        stats = self.zstd_decoder.stats()
+        pool = self._decode_pool
+        for source in (self._pool_zstd_stats, pool.zstd_stats if pool else {}):
+            for key, value in source.items():
+                stats[key] += value
+        return stats
+        
+    def get_message_count(self) -> int:
+        """已解析的应用层消息数, 包含多进程解码池中各工作进程的数据"""
+        pool = self._decode_pool
+        return self.message_count + (pool.message_count if pool else 0)
+        
+    def get_method_counts(self) -> Dict[int, int]:
+        """按methodId统计的Notify消息数, 包含多进程解码池中各工作进程的数据"""
+        counts = dict(self.method_counts)
+        pool = self._decode_pool
+        for source in (self._pool_method_counts, pool.method_counts if pool else {}):
+            for method_id, count in dict(source).items():
+                counts[method_id] = counts.get(method_id, 0) + count
+        return counts
+        
+    def register_metrics(self, registry):
+        """
+        在指标注册表中登记抓包和解码指标
+        
+        Args:
+            registry: metrics.MetricsRegistry
+        """
+        registry.counter("capture_frames_total", "抓包线程收到的数据帧数", lambda: self.packet_count)
+        registry.counter("capture_frames_dropped_total", "抓包队列满时丢弃的TCP分段数",
+                         lambda: self._segments.dropped)
+        registry.gauge("capture_queue_size", "抓包队列当前长度", lambda: len(self._segments))
+        registry.gauge("capture_queue_high_water", "抓包队列最大长度", lambda: self._segments.high_water)
+        registry.gauge("capture_flows", "当前跟踪的游戏TCP流数", lambda: len(self.flows))
+        registry.gauge("capture_tcp_cache_segments", "等待重组的乱序TCP分段数",
+                       lambda: sum(len(flow.cache) for flow in list(self.flows.values())))
+        registry.counter("capture_reassembled_bytes_total", "按顺序重组的TCP负载字节数",
+                         lambda: self.reassembled_bytes)
+        registry.counter("capture_invalid_length_total", "因长度无效而丢弃重组缓冲区的次数",
+                         lambda: self.invalid_length_count)
+        registry.counter("capture_filter_changes_total", "内核过滤器切换次数", lambda: self.filter_changes)
+        registry.counter("capture_kernel_filtered_total", "被内核过滤器丢弃的数据包数(按网卡计数估算)",
+                         lambda: self.get_filter_stats()['kernel_filtered'])
+        registry.counter("decode_messages_total", "解析的应用层消息数", self.get_message_count)
+        registry.counter("decode_notify_messages_total", "按methodId统计的游戏服务Notify消息数",
+                         self.get_method_counts, label="method_id")
+        registry.counter("decode_zstd_total", "zstd解压次数", lambda: self.get_zstd_stats()['count'])
+        registry.counter("decode_zstd_failures_total", "zstd解压失败次数",
+                         lambda: self.get_zstd_stats()['failures'])
+        
+    def get_queue_stats(self) -> Dict[str, Any]:
+        """获取抓包队列统计: 当前长度、高水位、丢弃数等"""
+        return self._segments.stats()
+        
+    def get_filter_stats(self) -> Dict[str, Any]:
+        """
+        获取内核过滤统计
+        
+        Returns:
+            当前过滤器、送达Python的数据包数以及被内核过滤掉的数据包数(按网卡计数估算)
+        """
+        delivered = self.packet_count
+        stats = {
+            'filter': self.capture_filter,
+            'filter_changes': self.filter_changes,
+            'delivered': delivered,
+            'interface_packets': None,
+            'kernel_filtered': None,
+        }
+        nic_packets = self._read_nic_packets()
+        if nic_packets is not None and self._nic_packets_start is not None:
+            interface_packets = nic_packets - self._nic_packets_start
+            stats['interface_packets'] = interface_packets
+            stats['kernel_filtered'] = max(0, interface_packets - delivered)
+        return stats
+        
+    def _read_nic_packets(self) -> Optional[int]:
+        """读取网卡收发数据包总数"""
+        if not self.interface:
+            return None
+        try:
+            counters = psutil.net_io_counters(pernic=True).get(self.interface)
+        except Exception:
+            return None
+        if counters is None:
+            return None
+        return counters.packets_recv + counters.packets_sent
+        
+    def _request_filter(self, bpf_filter: str):
+        """请求切换内核过滤器, 由抓包线程在收包间隙应用"""
+        if bpf_filter != self.capture_filter:
+            self._pending_filter = bpf_filter
+        else:
+            self._pending_filter = None
+            
+    def _apply_filter(self, sock, bpf_filter: str):
+        """在已打开的抓包套接字上原子替换BPF过滤器"""
+        try:
+            pcap_fd = getattr(sock, 'pcap_fd', None)
+            if pcap_fd is not None:
+                # libpcap/Npcap
+                pcap_fd.setfilter(bpf_filter)
+            else:
+                from scapy.arch.linux import attach_filter
+                attach_filter(sock.ins, bpf_filter, self.interface)
+        except Exception as e:
+            logger.warning(f"设置内核过滤器失败: {bpf_filter}, {e}")
+            return
+        self.capture_filter = bpf_filter
+        self.filter_changes += 1
+        logger.info(f"内核过滤器已切换: {bpf_filter}")
+        
     def _capture_loop(self):
         """抓包主循环"""
         try:
-            # 使用scapy进行抓包
-            sniff(
-                iface=self.interface,
-                prn=self._process_packet,
-                store=0,
-                stop_filter=lambda _: not self.is_running
-            )
+            if self.use_scapy_dissect:
+                # 使用scapy进行抓包; sniff 无法在抓包过程中替换过滤器, 不收窄内核过滤器
+                if self.narrow_filter:
+                    logger.info("scapy完整解析模式下不收窄内核过滤器")
+                _load_scapy(dissect=True)
+                from scapy.sendrecv import sniff
+                sniff(
+                    iface=self.interface,
+                    filter=self.COARSE_FILTER,
+                    prn=self._process_packet,
+                    store=0,
+                    stop_filter=lambda _: not self.is_running
+                )
+            else:
+                self._raw_capture_loop()
         except Exception as e:
             logger.error(f"抓包过程中发生错误: {e}")
             
-    def _process_packet(self, packet):
+    def _raw_capture_loop(self):
+        """原始帧抓包循环, 跳过scapy的逐层解析"""
+        conf = _load_scapy()
+        try:
+            sock = conf.L2listen(iface=self.interface, filter=self.COARSE_FILTER)
+        except Exception as e:
+            logger.warning(f"无法设置内核过滤器, 将接收全部数据包: {e}")
+            sock = conf.L2listen(iface=self.interface)
+            self.capture_filter = None
+            
+        try:
+            linktype = conf.l2types.layer2num.get(sock.LL)
+            if linktype not in SUPPORTED_LINKTYPES:
+                logger.info(f"链路层类型 {linktype} 不支持快速解析, 使用scapy解析")
+                linktype = None
+                _load_scapy(dissect=True)
+                
+            last_packet = time.monotonic()
+            while self.is_running:
+                if self._pending_filter is not None and self.capture_filter is not None:
+                    bpf_filter = self._pending_filter
+                    self._pending_filter = None
+                    self._apply_filter(sock, bpf_filter)
+                if not sock.select([sock], 0.5):
+                    if self.capture_filter not in (None, self.COARSE_FILTER) and \
+                            time.monotonic() - last_packet > self.FILTER_IDLE_TIMEOUT:
+                        # 收窄后游戏流空闲, 可能已切换到新的游戏服务器; 游戏流恢复后由解码线程重新收窄
+                        logger.debug("游戏连接空闲, 放宽内核过滤器")
+                        self._apply_filter(sock, self.COARSE_FILTER)
+                    continue
+                last_packet = time.monotonic()
+                cls, frame, _ = sock.recv_raw()
+                if frame is None:
+                    continue
+                if linktype is None:
+                    self._process_packet(cls(frame))
+                else:
+                    self._process_raw_frame(frame, linktype)
+        finally:
+            sock.close()
+            
+    def _trace_time(self) -> Optional[float]:
+        """按采样间隔返回数据帧的到达时间, 不追踪该帧时返回None"""
+        if not self.trace_interval:
+            return None
+        self._trace_countdown -= 1
+        if self._trace_countdown > 0:
+            return None
+        self._trace_countdown = self.trace_interval
+        return time.perf_counter()
+            
+    def _process_raw_frame(self, frame: bytes, linktype: int, packet_time: float = None):
+        """处理单个原始帧, 只解析头部并将TCP分段放入解码队列"""
+        if not self.is_running:
+            return
+            
+        self.packet_count += 1
+        captured = self._trace_time()
+        
+        try:
+            result = dissect_tcp_frame(frame, linktype)
+            if result is None:
+                return
+            flow, seq, payload, flags = result
+            if payload:
+                self._segments.put((flow, seq, payload, packet_time, captured))
+            if flags & (TCP_FIN | TCP_RST):
+                # 游戏流由解码线程识别, 是否为游戏连接由 _close_flow 判断
+                self._segments.put((flow, seq, None, packet_time, None))
+        except Exception as e:
+            logger.debug("处理数据包时发生错误: %s", e)
+            
+    def _process_packet(self, packet, packet_time: float = None):
         """处理单个数据包"""
         if not self.is_running:
             return
             
         self.packet_count += 1
+        captured = self._trace_time()
         
         try:
             # 检查是否是TCP包
             if TCP in packet and IP in packet:
-                self._process_tcp_packet(packet)
+                self._process_tcp_packet(packet, packet_time, captured)
         except Exception as e:
-            logger.debug(f"处理数据包时发生错误: {e}")
+            logger.debug("处理数据包时发生错误: %s", e)
             
-    def _process_tcp_packet(self, packet):
+    def _now(self) -> float:
+        """当前时间, 回放模式下为最近一个数据包的时间戳"""
+        if self._clock_time is not None:
+            return self._clock_time
+        return time.time()
+            
+    def _process_tcp_packet(self, packet, packet_time: float = None, captured: float = None):
         """处理TCP数据包"""
         # 获取IP和TCP信息
         ip_layer = packet[IP]
         tcp_layer = packet[TCP]
         
-        src_addr = ip_layer.src
-        dst_addr = ip_layer.dst
-        src_port = tcp_layer.sport
-        dst_port = tcp_layer.dport
-        seq = tcp_layer.seq
-        ack = tcp_layer.ack
-        
         # 构建服务器标识
-        src_server = f"{src_addr}:{src_port} -> {dst_addr}:{dst_port}"
+        flow = (
+            socket.inet_aton(ip_layer.src), tcp_layer.sport,
+            socket.inet_aton(ip_layer.dst), tcp_layer.dport
+        )
+        seq = tcp_layer.seq
         
         # 获取TCP负载
         if Raw in packet:
             payload = bytes(packet[Raw])
-            self._process_tcp_stream(src_server, seq, payload)
+            self._segments.put((flow, seq, payload, packet_time, captured))
+        if int(tcp_layer.flags) & (TCP_FIN | TCP_RST):
+            self._segments.put((flow, seq, None, packet_time, None))
             
-    def _process_tcp_stream(self, src_server: str, seq: int, payload: bytes):
-        """处理TCP流数据"""
+    def _decode_loop(self):
+        """解码线程: 从队列批量取出TCP分段, 完成重组和解析"""
+        segments = self._segments
+        while True:
+            batch = segments.get_batch()
+            if not batch:
+                if segments.closed:
+                    break
+                continue
+            for key, seq, payload, packet_time, captured in batch:
+                if packet_time is not None:
+                    self._advance_clock(packet_time)
+                try:
+                    if payload is None:
+                        # FIN/RST, 不是游戏连接时忽略
+                        self._close_flow(key)
+                    else:
+                        self._process_tcp_stream(key, seq, payload, captured)
+                except Exception as e:
+                    logger.debug("处理TCP流时发生错误: %s", e)
+            if self._decode_pool is not None:
+                with self.tcp_lock:
+                    self._decode_pool.flush()
+                    
+        self._close_decode_pool()
+        self._close_recorder()
+                    
+    def _advance_clock(self, packet_time: float):
+        """回放模式下推进数据包时钟, 清理定时器由数据包时间驱动, 避免高倍速回放时误判超时"""
+        self._clock_time = packet_time
+        if self._last_cleanup is None:
+            self._last_cleanup = packet_time
+        elif packet_time - self._last_cleanup >= self.CLEANUP_INTERVAL:
+            self._last_cleanup = packet_time
+            self._cleanup_expired_cache()
+            
+    def _process_tcp_stream(self, key: Flow, seq: int, payload: bytes, captured: float = None):
+        """
+        处理TCP流数据
+        
+        Args:
+            key: 流标识
+            seq: TCP序列号
+            payload: TCP负载
+            captured: 被采样追踪时数据帧的到达时间
+        """
         with self.tcp_lock:
-            # 服务器识别逻辑
-            count = self.src_servers.get(src_server, 0)
-            count+=1
-            self.src_servers[src_server] = count
-            if self.current_server != src_server:
-                if self._identify_game_server(payload):
-                    self.current_server = src_server
-                    self._clear_tcp_cache()
-                    self.tcp_next_seq = seq + len(payload)
-                    self.callback({'server_change':None})
-                    logger.info(f'识别到游戏服务器: {src_server}')
-                else:
+            # 服务器识别逻辑, 每条流独立识别
+            flow = self.flows.get(key)
+            if flow is None:
+                if not self._identify_game_server(payload):
                     return  # 不是游戏服务器，跳过
-            
-            # 如果还没有识别到服务器，跳过
-            if not self.current_server:
-                return
+                flow = self._add_flow(key, seq + len(payload))
+                
+            flow.last_seen = self._now()
+            if self.capture_filter == self.COARSE_FILTER and self._pending_filter is None and self.narrow_filter:
+                # 空闲时放宽的过滤器在游戏流恢复后重新收窄
+                self._update_filter()
                 
             # TCP流重组逻辑
-            # logger.info(f"处理TCP流: {src_server}, seq={seq}, payload_length={len(payload)}")
-            if self.tcp_next_seq == -1:
-                logger.error('TCP流重组错误: tcp_next_seq 为 -1')
+            if flow.next_seq == -1:
+                logger.error(f'TCP流重组错误: #{flow.flow_id} next_seq 为 -1')
                 if len(payload) > 4 and struct.unpack('>I', payload[:4])[0] < 0x0fffff:
-                    self.tcp_next_seq = seq
+                    flow.next_seq = seq
+                    # 重新同步后恢复收窄的过滤器
+                    self._update_filter()
                 
             # 缓存数据包
-            if (self.tcp_next_seq - seq) <= 0 or self.tcp_next_seq == -1:
-                self.tcp_cache[seq] = payload
+            if (flow.next_seq - seq) <= 0 or flow.next_seq == -1:
+                flow.cache[seq] = payload
+                if captured is not None:
+                    flow.trace_times[seq] = captured
                 
             # 按顺序处理数据包
-            while self.tcp_next_seq in self.tcp_cache:
-                seq = self.tcp_next_seq
-                cached_data = self.tcp_cache[seq]
-                self._data = self._data + cached_data if self._data else cached_data
-                self.tcp_next_seq = (seq + len(cached_data)) & 0xffffffff
-                del self.tcp_cache[seq]
-                self.tcp_last_time = time.time()
+            cache = flow.cache
+            trace_times = flow.trace_times
+            while flow.next_seq in cache:
+                seq = flow.next_seq
+                cached_data = cache.pop(seq)
+                captured = trace_times.pop(seq, None) if trace_times else None
+                if not flow.data:
+                    flow.pending_since = captured
+                flow.last_captured = captured
+                flow.data.append(cached_data)
+                self.reassembled_bytes += len(cached_data)
+                flow.next_seq = (seq + len(cached_data)) & 0xffffffff
+                flow.last_time = flow.last_seen
                 
             # 处理完整的数据包
-            # logger.info(f"处理TCP数据包: seq={seq}, next_seq={self.tcp_next_seq}, 缓存大小={len(self.tcp_cache)}, 当前数据长度={len(self._data)}")
-            self._process_complete_packets()     
+            self._process_complete_packets(flow)
+            
+    def _add_flow(self, key: Flow, next_seq: int) -> TcpFlow:
+        """登记新识别到的游戏TCP流"""
+        if not self.multi_client:
+            # 单开时新的游戏服务器取代之前的连接, 不等待旧连接超时
+            for old in list(self.flows.values()):
+                del self.flows[old.key]
+                logger.info(f'游戏服务器已切换, 关闭连接: #{old.flow_id} {format_flow(old.key)}')
+                self._emit({'flow_closed': None, 'flow_id': old.flow_id})
+        flow = TcpFlow(key, self._next_flow_id)
+        flow.next_seq = next_seq
+        self._next_flow_id += 1
+        self.flows[key] = flow
+        logger.info(f'识别到游戏服务器: #{flow.flow_id} {format_flow(key)}')
+        self._emit({'server_change': None, 'flow_id': flow.flow_id})
+        self._update_filter()
+        return flow
+        
+    def _close_flow(self, key: Flow):
+        """游戏服务器关闭了连接(FIN/RST), 立即移除该流并放宽过滤器, 以便识别新的游戏服务器"""
+        with self.tcp_lock:
+            flow = self.flows.pop(key, None)
+            if flow is None:
+                return
+            logger.info(f'游戏连接已关闭: #{flow.flow_id} {format_flow(flow.key)}')
+            self._emit({'flow_closed': None, 'flow_id': flow.flow_id})
+            self._update_filter()
+            
+    def _update_filter(self):
+        """
+        按当前的游戏TCP流请求内核过滤器
+        
+        有流等待重新同步(next_seq 为 -1)或没有游戏流时使用粗粒度过滤器, 以便重新识别游戏服务器;
+        否则收窄为全部游戏流。游戏流关闭时由 _close_flow 调用, 游戏流空闲时由抓包循环直接放宽。
+        调用方应持有 tcp_lock。
+        """
+        flows = self.flows
+        if not flows or any(flow.next_seq == -1 for flow in flows.values()):
+            self._request_filter(self.COARSE_FILTER)
+        elif self.narrow_filter:
+            self._request_filter(build_flow_filter(flows))
             
     def _identify_game_server(self, payload: bytes) -> bool:
         """识别游戏服务器"""
@@ -249,67 +935,74 @@ class PacketCapture:
                     return True
                     
         except Exception as e:
-            logger.debug(f"服务器识别失败: {e}")
+            logger.debug("服务器识别失败: %s", e)
             
         return False
         
-    def _clear_tcp_cache(self):
-        """清理TCP缓存"""
-        self._data = b''
-        self.tcp_next_seq = -1
-        self.tcp_last_time = 0
-        self.tcp_cache.clear()
-        
-    def _process_complete_packets(self):
+    def _process_complete_packets(self, flow: TcpFlow):
         """处理完整的数据包"""
-        while len(self._data) > 4:
+        data = flow.data
+        while len(data) > 4:
             try:
-                packet_size = struct.unpack('>I', self._data[:4])[0]
+                packet_size = data.peek_uint32()
                 
-                if len(self._data) < packet_size:
+                if len(data) < packet_size:
                     break
                     
                 if packet_size == 0 or packet_size > 0x0fffff:
-                    self._clear_tcp_cache()
-                    # self._data = self._data[4:]  # 丢掉长度字段
+                    self.invalid_length_count += 1
+                    flow.clear()
                     logger.error(f"无效的数据包长度: {packet_size}")
                     break
                     
-                # 提取完整数据包
-                packet = self._data[:packet_size]
-                self._data = self._data[packet_size:]
+                # 提取完整数据包(memoryview, 不复制数据)
+                packet = data.read(packet_size)
+                if self._recorder is not None:
+                    self._recorder.write(self._now(), flow.flow_id, packet)
+                
+                # 数据包开头所在的分段被采样时追踪该数据包; 剩余数据来自最近重组的分段
+                trace = None
+                if flow.pending_since is not None:
+                    trace = Trace(flow.pending_since)
+                    trace.mark(REASSEMBLY)
+                flow.pending_since = flow.last_captured if len(data) else None
                 
                 # 分析数据包负载
-                self._analyze_payload(packet, "TCP")
+                if self._decode_pool is not None:
+                    self._decode_pool.submit(flow.flow_id, packet, self._now(), trace)
+                else:
+                    self._analyze_payload(packet, "TCP", flow.flow_id, trace)
                 
             except Exception as e:
                 logger.info(f"处理完整数据包失败: {e}")
                 break
             
-    def _analyze_payload(self, payload: bytes, protocol: str):
-        """分析数据包负载"""
+    def _analyze_payload(self, payload: memoryview, protocol: str, flow_id: int = 0, trace: Trace = None):
+        """分析数据包负载, trace 为该数据包的延迟追踪, 未采样时为None"""
         if len(payload) < 4:
             return
             
         try:
             # 尝试解析为SyncContainerData
-            parsed_data = self._parse_data(payload)
+            parsed_data = self._parse_data(payload, flow_id, trace)
             if parsed_data:
                 self.sync_container_count += 1
-                logger.debug(f"发现SyncContainerData数据包 #{self.sync_container_count}")
+                logger.debug("发现SyncContainerData数据包 #%s", self.sync_container_count)
                 
                 if self.callback:
                     self.callback(parsed_data)
                     
         except Exception as e:
-            logger.debug(f"解析数据包失败: {e}")
+            logger.debug("解析数据包失败: %s", e)
             
-    def _parse_data(self, payload: bytes) -> Optional[Dict[str, Any]]:
+    def _parse_data(self, payload: bytes, flow_id: int = 0, trace: Trace = None) -> Optional[Dict[str, Any]]:
         """
         解析SyncContainerData数据包
         
         Args:
             payload: 原始数据包负载
+            flow_id: 数据所属的游戏TCP流编号
+            trace: 延迟追踪
             
         Returns:
             解析后的数据, 如果不是SyncContainerData则返回None
@@ -337,15 +1030,19 @@ class PacketCapture:
                 is_zstd_compressed = (packet_type & 0x8000) != 0
                 msg_type_id = packet_type & 0x7fff
                 
+                # FrameDown 只是外层包装, 其中的消息在递归解析时计数
+                if msg_type_id != 6:
+                    self.message_count += 1
+                
                 # 根据消息类型处理
                 if msg_type_id == 2:  # Notify
                     # logger.info("发现Notify数据包")
-                    result = self._process_notify_msg(packet_reader, is_zstd_compressed)
+                    result = self._process_notify_msg(packet_reader, is_zstd_compressed, flow_id, trace)
                     if result:
                         return result
                 elif msg_type_id == 6:  # FrameDown
                     # logger.info("发现FrameDown数据包")
-                    result = self._process_frame_down_msg(packet_reader, is_zstd_compressed)
+                    result = self._process_frame_down_msg(packet_reader, is_zstd_compressed, flow_id, trace)
                     if result:
                         return result
                 else:
@@ -353,11 +1050,12 @@ class PacketCapture:
                     # logger.info(f"跳过未知消息类型: {msg_type_id}")
                         
         except Exception as e:
-            logger.debug(f"解析SyncContainerData失败: {e}")
+            logger.debug("解析SyncContainerData失败: %s", e)
             
         return None
         
-    def _process_notify_msg(self, reader: BinaryReader, is_zstd_compressed: bool) -> Optional[Dict[str, Any]]:
+    def _process_notify_msg(self, reader: BinaryReader, is_zstd_compressed: bool,
+                            flow_id: int = 0, trace: Trace = None) -> Optional[Dict[str, Any]]:
         """处理Notify消息, 使用流式读取"""
         try:
             # 读取serviceUuid, stubId, methodId
@@ -365,13 +1063,19 @@ class PacketCapture:
             stub_id = reader.readUInt32()
             method_id = reader.readUInt32()
             
+            verbose = logger.isEnabledFor(logging.DEBUG) and _notify_log.allow()
+            
             # 检查serviceUuid是否为游戏服务器标识
             GAME_SERVICE_UUID = 0x0000000063335342
             if service_uuid != GAME_SERVICE_UUID:
-                logger.debug(f"跳过serviceId为 {service_uuid} 的NotifyMsg")
+                if verbose:
+                    logger.debug("跳过serviceId为 %s 的NotifyMsg", service_uuid)
                 return None
                 
-            logger.debug(f"methodId={method_id} isZstdCompressed={is_zstd_compressed}")
+            method_counts = self.method_counts
+            method_counts[method_id] = method_counts.get(method_id, 0) + 1
+            if verbose:
+                logger.debug("methodId=%s isZstdCompressed=%s", method_id, is_zstd_compressed)
             
             # 读取剩余数据
             msg_payload = reader.readRemaining()
@@ -379,11 +1083,13 @@ class PacketCapture:
             # 解压缩
             if is_zstd_compressed:
                 try:
-                    dctx = zstd.ZstdDecompressor()
-                    msg_payload = dctx.decompress(msg_payload, max_output_size=1024*1024)
-                    logger.debug(f"Notify解压缩成功, 解压缩后数据长度: {len(msg_payload)}")
+                    msg_payload = self.zstd_decoder.decompress(msg_payload)
+                    if trace is not None:
+                        trace.mark(DECOMPRESS)
+                    if verbose:
+                        logger.debug("Notify解压缩成功, 解压缩后数据长度: %s", len(msg_payload))
                 except Exception as e:
-                    logger.debug(f"Notify zstd解压缩失败: {e}")
+                    logger.debug("Notify zstd解压缩失败: %s", e)
                     
             # 根据methodId处理
             SYNC_CONTAINER_DATA_METHOD = 0x00000015
@@ -394,22 +1100,32 @@ class PacketCapture:
             
             if method_id == SyncNearEntities_id:
                 # logger.info(f"发现SyncNearEntities数据包")
-                sync_data = SyncNearEntities()
-                sync_data.ParseFromString(msg_payload)
+                if SyncNearEntities is None:
+                    _load_protobuf()
+                if self.slim_decoder:
+                    sync_data = decode_SyncNearEntities(msg_payload)
+                else:
+                    sync_data = SyncNearEntities()
+                    sync_data.ParseFromString(msg_payload)
                 # 通过回调函数传递数据，而不是直接处理
                 if self.callback:
-                    self.callback({'SyncNearEntities': sync_data})
+                    self.callback(self._message('SyncNearEntities', sync_data, flow_id, trace))
             elif method_id == SyncNearDeltaInfo_id:
                 # logger.info(f"发现SyncNearDeltaInfo数据包")
-                sync_data = SyncNearDeltaInfo()
-                sync_data.ParseFromString(msg_payload)
+                if SyncNearEntities is None:
+                    _load_protobuf()
+                if self.slim_decoder:
+                    sync_data = decode_SyncNearDeltaInfo(msg_payload)
+                else:
+                    sync_data = SyncNearDeltaInfo()
+                    sync_data.ParseFromString(msg_payload)
                 # 通过回调函数传递数据，而不是直接处理
                 if self.callback:
-                    self.callback({'SyncNearDeltaInfo': sync_data})
+                    self.callback(self._message('SyncNearDeltaInfo', sync_data, flow_id, trace))
 
             return None
             if method_id == SYNC_CONTAINER_DATA_METHOD:
-                logger.debug(f"发现SYNC_CONTAINER_DATA_METHOD数据包 (serviceUuid: 0x{service_uuid:016x}, methodId: 0x{method_id:08x})")
+                logger.debug("发现SYNC_CONTAINER_DATA_METHOD数据包 (serviceUuid: 0x%016x, methodId: 0x%08x)", service_uuid, method_id)
                 
                 # 解析protobuf数据
                 sync_data = SyncContainerData()
@@ -429,14 +1145,23 @@ class PacketCapture:
             elif method_id == SyncToMeDeltaInfo:
                 logger.debug("发现SyncToMeDeltaInfo数据包")
             else:
-                logger.debug(f"跳过methodId为 {method_id} 的NotifyMsg")
+                logger.debug("跳过methodId为 %s 的NotifyMsg", method_id)
                 
         except Exception as e:
-            logger.debug(f"处理Notify消息失败: {e}")
+            logger.debug("处理Notify消息失败: %s", e)
             
         return None
         
-    def _process_frame_down_msg(self, reader: BinaryReader, is_zstd_compressed: bool) -> Optional[Dict[str, Any]]:
+    def _message(self, name: str, sync_data, flow_id: int, trace: Trace = None) -> Dict[str, Any]:
+        """构造交给回调的消息, 被追踪时结束解析阶段并附带 trace"""
+        data = {name: sync_data, 'flow_id': flow_id, 'time': self._now()}
+        if trace is not None:
+            trace.mark(PARSE)
+            data['trace'] = trace
+        return data
+        
+    def _process_frame_down_msg(self, reader: BinaryReader, is_zstd_compressed: bool,
+                                flow_id: int = 0, trace: Trace = None) -> Optional[Dict[str, Any]]:
         """处理FrameDown消息, 使用流式读取"""
         try:
             # 读取服务器序列号
@@ -447,24 +1172,28 @@ class PacketCapture:
                 
             # 读取嵌套数据包
             nested_packet = reader.readRemaining()
+            verbose = logger.isEnabledFor(logging.DEBUG) and _frame_down_log.allow()
             
             # 解压缩
             if is_zstd_compressed:
                 try:
-                    dctx = zstd.ZstdDecompressor()
-                    nested_packet = dctx.decompress(nested_packet, max_output_size=1024*1024)
-                    logger.debug(f"FrameDown解压缩成功, 解压缩后数据长度: {len(nested_packet)}")
+                    nested_packet = self.zstd_decoder.decompress(nested_packet)
+                    if trace is not None:
+                        trace.mark(DECOMPRESS)
+                    if verbose:
+                        logger.debug("FrameDown解压缩成功, 解压缩后数据长度: %s", len(nested_packet))
                 except Exception as e:
-                    logger.debug(f"FrameDown zstd解压缩失败: {e}")
+                    logger.debug("FrameDown zstd解压缩失败: %s", e)
                     # 继续处理原始数据
                     
-            logger.debug(f"处理FrameDown嵌套数据包, 服务器序列号: {server_sequence_id}")
+            if verbose:
+                logger.debug("处理FrameDown嵌套数据包, 服务器序列号: %s", server_sequence_id)
             
             # 递归处理嵌套数据包
-            return self._parse_data(nested_packet)
+            return self._parse_data(nested_packet, flow_id, trace)
             
         except Exception as e:
-            logger.debug(f"处理FrameDown消息失败: {e}")
+            logger.debug("处理FrameDown消息失败: %s", e)
             
         return None
 
@@ -473,32 +1202,45 @@ class PacketCapture:
         while self.is_running:
             try:
                 # break
-                time.sleep(3)  # 每10秒清理一次
+                time.sleep(self.CLEANUP_INTERVAL)
                 self._cleanup_expired_cache()
             except Exception as e:
-                logger.debug(f"清理缓存时发生错误: {e}")
+                logger.debug("清理缓存时发生错误: %s", e)
                 
     def _cleanup_expired_cache(self):
         """清理过期的缓存"""
-        FRAGMENT_TIMEOUT = 3  # 30秒超时
+        FRAGMENT_TIMEOUT = self.FRAGMENT_TIMEOUT
         
         with self.tcp_lock:
-            current_time = time.time()
+            current_time = self._now()
+            closed_flows = []
+            
+            # 流量停止时也按时写入录制的数据
+            if self._recorder is not None:
+                self._recorder.flush_if_due(current_time)
             
-            # 清理过期的TCP缓存
-            expired_seqs = []
-            for seq in self.tcp_cache:
-                if current_time - self.tcp_last_time > FRAGMENT_TIMEOUT:
-                    expired_seqs.append(seq)
+            for flow in self.flows.values():
+                # 移除长时间空闲的游戏TCP流
+                if current_time - flow.last_seen > self.FLOW_TIMEOUT:
+                    closed_flows.append(flow)
+                    continue
                     
-            for seq in expired_seqs:
-                del self.tcp_cache[seq]
-                
-            if expired_seqs:
-                logger.debug(f"清理了 {len(expired_seqs)} 个过期的TCP缓存项")
+                # 检查连接超时, 同时清理过期的TCP缓存
+                if flow.last_time and current_time - flow.last_time > FRAGMENT_TIMEOUT:
+                    if flow.cache:
+                        logger.debug("清理了 %s 个过期的TCP缓存项", len(flow.cache))
+                    logger.warning(f'无法捕获下一个数据包! 游戏是否已关闭或断开连接? #{flow.flow_id} seq: {flow.next_seq}')
+                    flow.clear()
+                    # 放宽内核过滤器, 以便重新识别游戏服务器
+                    self._update_filter()
+                    
+            for flow in closed_flows:
+                del self.flows[flow.key]
+                logger.info(f'游戏连接已超时移除: #{flow.flow_id} {format_flow(flow.key)}')
+                self._emit({'flow_closed': None, 'flow_id': flow.flow_id})
+            if closed_flows:
+                # 不再抓取已移除的流
+                self._update_filter()
                 
-            # 检查连接超时
-            if self.tcp_last_time and current_time - self.tcp_last_time > FRAGMENT_TIMEOUT:
-                logger.warning('无法捕获下一个数据包! 游戏是否已关闭或断开连接?seq: ' + str(self.tcp_next_seq))
-                # self.current_server = ''
-                self._clear_tcp_cache()
+            # 定时通知回调, 没有游戏流量时(切换地图、挂机)敌人表也能按时移除过期的敌人
+            self._emit({'cleanup': None, 'time': current_time})
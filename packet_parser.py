@@ -2,14 +2,16 @@
 模组解析器
 """
 
-import json
 import logging
 from typing import Dict, List, Optional, Any
-from logging_config import get_logger
-from star_pb2 import AttrIdValue
+from latency import ATTR_DECODE
+from logging_config import LogSampler, get_logger
+from monster_table import load_table
 
 # 获取日志器
 logger = get_logger(__name__)
+# 每个属性一条的调试日志
+_attr_log = LogSampler()
 AttrType = {
     "AttrName": 0x01,
     "AttrId": 0x0a,
@@ -60,35 +62,88 @@ def is_uuid_monster(uuid: int) -> bool:
 class PacketParser:
     """模组解析器"""
     
-    def __init__(self, callback):
+    def __init__(self, callback, language=None):
+        """
+        初始化
+
+        Args:
+            callback: 解析结果回调函数
+            language: 怪物名称的语言, None表示默认语言(monster_names.json)
+        """
         self.logger = logger
-        self.monster_names = {}
         self.callback = callback
-        with open("monster_names.json", "r", encoding="utf-8") as f:
-            self.monster_names = json.load(f)
+        self.language = language
+        self.monster_names = load_table(language)
 
-    def parse_SyncNearEntities(self, data):
+    def set_language(self, language=None):
+        """切换怪物名称的语言, 之后解析的敌人使用新语言的名称"""
+        self.monster_names = load_table(language)
+        self.language = language
+
+    def parse_SyncNearEntities(self, data, flow_id=0, timestamp=None, trace=None):
+        deltas = []
         for entity in data.Appear:
-            self.parse_AoiSyncDelta(entity)
+            delta = self.parse_AoiSyncDelta(entity, flow_id, emit=False)
+            if delta:
+                deltas.append(delta)
         for disappearEntity in data.Disappear:
             uuid = disappearEntity.Uuid
             if is_uuid_monster(uuid):
                 uuid = uuid>>16
-                self.callback({"enemy_uid": uuid, "enemy_hp": 0})
-                self.logger.debug(f"Entity disappeared: {uuid}")
-
-    def parse_SyncNearDeltaInfo(self, data):
-        for delta in data.DeltaInfos:
-            self.parse_AoiSyncDelta(delta)
+                deltas.append({"enemy_uid": uuid, "enemy_hp": 0, "enemy_disappeared": True})
+                self.logger.debug("Entity disappeared: %s", uuid)
+        self._emit_deltas(deltas, flow_id, timestamp, trace)
+
+    def parse_SyncNearDeltaInfo(self, data, flow_id=0, timestamp=None, trace=None):
+        deltas = []
+        for info in data.DeltaInfos:
+            delta = self.parse_AoiSyncDelta(info, flow_id, emit=False)
+            if delta:
+                deltas.append(delta)
+        self._emit_deltas(deltas, flow_id, timestamp, trace)
     
-    def parse_AoiSyncDelta(self, aoiSyncDelta):
+    def parse_AoiSyncDelta(self, aoiSyncDelta, flow_id=0, emit=True, timestamp=None):
+        """
+        解析单个实体的同步数据
+
+        Args:
+            aoiSyncDelta: AoiSyncDelta 或 Entity
+            flow_id: 游戏连接编号
+            emit: 是否直接通过回调发出, False时只返回合并后的变化
+            timestamp: 数据包时间
+
+        Returns:
+            该实体合并后的变化, 不是怪物或没有关注的属性时返回None
+        """
         uuid = aoiSyncDelta.Uuid
-        if is_uuid_monster(uuid):
-            uuid = uuid>>16
-            attrCollection = aoiSyncDelta.Attrs.Attrs
-            self._process_enemy_attrs(uuid, attrCollection)
+        if not is_uuid_monster(uuid):
+            return None
+        uuid = uuid>>16
+        attrCollection = aoiSyncDelta.Attrs.Attrs
+        delta = self._process_enemy_attrs(uuid, attrCollection, flow_id)
+        if delta and emit:
+            self._emit_deltas([delta], flow_id, timestamp)
+        return delta
+
+    def _emit_deltas(self, deltas, flow_id=0, timestamp=None, trace=None):
+        """一条消息内所有实体的变化合并为一次回调, 被追踪的消息附带 trace"""
+        if deltas:
+            data = {"enemy_deltas": deltas, "flow_id": flow_id, "time": timestamp}
+            if trace is not None:
+                trace.mark(ATTR_DECODE)
+                data["trace"] = trace
+            self.callback(data)
     
-    def _process_enemy_attrs(self, enemy_uid, attrs):
+    def _process_enemy_attrs(self, enemy_uid, attrs, flow_id=0):
+        """
+        解析敌人属性, 合并为一个变化
+
+        Returns:
+            {"enemy_uid", 以及可选的 "enemy_name"/"enemy_type_id"/"enemy_hp"/"enemy_max_hp"}, 没有关注的属性时返回None
+        """
+        delta = None
+        # 调试输出需要把属性转成十六进制, 关闭调试时跳过
+        debug = self.logger.isEnabledFor(logging.DEBUG)
         for attr in attrs:
             attr_id = getattr(attr, "Id", None)
             raw_data = getattr(attr, "RawData", None)
@@ -97,13 +152,14 @@ class PacketParser:
 
             # 这里 raw_data 是 bytes
             reader = memoryview(raw_data)
-            self.logger.debug(f"Found attrId {attr_id} for E{enemy_uid} {raw_data.hex()}")
+            if debug and _attr_log.allow():
+                self.logger.debug("Found attrId %s for E%s %s", attr_id, enemy_uid, raw_data.hex())
 
             if attr_id == AttrType["AttrName"]:
                 # 假设 RawData 是 UTF-8 string
                 enemy_name = raw_data.decode("utf-8", errors="ignore")
                 # self.userDataManager.enemyCache.name[enemy_uid] = enemy_name
-                self.logger.info(f"Found monster name {enemy_name} for id {enemy_uid}")
+                self.logger.debug("Found monster name %s for id %s", enemy_name, enemy_uid)
 
             elif attr_id == AttrType["AttrId"]:
                 # 简单示例：取前 4 字节当 int32
@@ -111,9 +167,12 @@ class PacketParser:
                 # attr_val = AttrIdValue()
                 # attr_val.ParseFromString(raw_data)
                 attr_val = read_varint(raw_data)
-                name = self.monster_names.get(str(attr_val))
+                name = self.monster_names.get(attr_val)
                 # self.logger.info(f"Found monster name {name} for monster id {attr_val}")
-                self.callback({"enemy_uid": enemy_uid, "enemy_name": name})
+                if delta is None:
+                    delta = {"enemy_uid": enemy_uid}
+                delta["enemy_name"] = name
+                delta["enemy_type_id"] = attr_val
                 # name = monsterNames.get(attr_val)
                 # if name:
                 #     self.logger.info(f"Found monster name {name} for id {enemy_uid}")
@@ -123,19 +182,24 @@ class PacketParser:
                 enemy_hp = int.from_bytes(raw_data[:4], "little", signed=True)
                 enemy_hp = read_varint(raw_data)
                 # self.logger.info(f"Found monster hp {enemy_hp} for id {enemy_uid}")
-                self.callback({"enemy_uid": enemy_uid, "enemy_hp": enemy_hp})
+                if delta is None:
+                    delta = {"enemy_uid": enemy_uid}
+                delta["enemy_hp"] = enemy_hp
                 # self.userDataManager.enemyCache.hp[enemy_uid] = enemy_hp
 
             elif attr_id == AttrType["AttrMaxHp"]:
                 enemy_max_hp = int.from_bytes(raw_data[:4], "little", signed=True)
                 enemy_max_hp = read_varint(raw_data)
                 # self.logger.info(f"Found monster max hp {enemy_max_hp} for id {enemy_uid}")
-                self.callback({"enemy_uid": enemy_uid, "enemy_max_hp": enemy_max_hp})
+                if delta is None:
+                    delta = {"enemy_uid": enemy_uid}
+                delta["enemy_max_hp"] = enemy_max_hp
                 # self.userDataManager.enemyCache.maxHp[enemy_uid] = enemy_max_hp
 
             else:
                 # self.logger.debug(f"Found unknown attrId {attr_id} for E{enemy_uid} {raw_data.hex()}")
                 pass
+        return delta
 
 
 
@@ -0,0 +1,124 @@
+"""
+抓包与解码之间的有界队列
+"""
+
+import threading
+from collections import deque
+from typing import Any, Dict, List
+
+
+class SegmentQueue:
+    """
+    有界TCP分段队列
+
+    抓包线程只负责入队, 解码线程批量取出处理。队列满时按策略处理:
+        drop_newest: 丢弃新到达的分段
+        drop_oldest: 丢弃最早的分段
+        block: 阻塞抓包线程直到有空位(背压, 适用于离线回放)
+    """
+
+    DROP_NEWEST = 'drop_newest'
+    DROP_OLDEST = 'drop_oldest'
+    BLOCK = 'block'
+    POLICIES = (DROP_NEWEST, DROP_OLDEST, BLOCK)
+
+    def __init__(self, maxsize: int = 65536, policy: str = DROP_NEWEST):
+        """
+        初始化队列
+
+        Args:
+            maxsize: 队列最大长度
+            policy: 队列满时的处理策略
+        """
+        if policy not in self.POLICIES:
+            raise ValueError(f"未知的队列策略: {policy}")
+        if maxsize <= 0:
+            raise ValueError(f"队列长度必须大于0: {maxsize}")
+        self.maxsize = maxsize
+        self.policy = policy
+        self.enqueued = 0
+        self.dropped = 0
+        self.high_water = 0
+        self.closed = False
+        self._items = deque()
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self._not_full = threading.Condition(self._lock)
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def put(self, item: Any) -> bool:
+        """
+        入队
+
+        Returns:
+            是否入队成功, 队列已关闭或按策略丢弃时返回False
+        """
+        with self._lock:
+            if self.closed:
+                return False
+            items = self._items
+            if len(items) >= self.maxsize:
+                if self.policy == self.DROP_NEWEST:
+                    self.dropped += 1
+                    return False
+                if self.policy == self.DROP_OLDEST:
+                    items.popleft()
+                    self.dropped += 1
+                else:
+                    while len(items) >= self.maxsize and not self.closed:
+                        self._not_full.wait()
+                    if self.closed:
+                        return False
+            items.append(item)
+            self.enqueued += 1
+            size = len(items)
+            if size > self.high_water:
+                self.high_water = size
+            if size == 1:
+                self._not_empty.notify()
+            return True
+
+    def get_batch(self, max_items: int = 256, timeout: float = 0.5) -> List[Any]:
+        """
+        批量出队
+
+        Args:
+            max_items: 最多取出的数量
+            timeout: 队列为空时的最长等待时间(秒)
+
+        Returns:
+            取出的元素列表, 超时或队列已关闭且为空时返回空列表
+        """
+        with self._lock:
+            items = self._items
+            if not items:
+                if self.closed:
+                    return []
+                self._not_empty.wait(timeout)
+                if not items:
+                    return []
+            count = min(len(items), max_items)
+            batch = [items.popleft() for _ in range(count)]
+            if self.policy == self.BLOCK:
+                self._not_full.notify_all()
+            return batch
+
+    def close(self):
+        """关闭队列, 唤醒所有等待的线程; 已入队的元素仍可取出"""
+        with self._lock:
+            self.closed = True
+            self._not_empty.notify_all()
+            self._not_full.notify_all()
+
+    def stats(self) -> Dict[str, Any]:
+        """队列统计"""
+        return {
+            'size': len(self._items),
+            'maxsize': self.maxsize,
+            'policy': self.policy,
+            'enqueued': self.enqueued,
+            'dropped': self.dropped,
+            'high_water': self.high_water,
+        }
@@ -0,0 +1,298 @@
+"""
+会话录制模块
+把重组后的完整应用层数据包连同抓包时间和流编号追加写入会话文件, 回放时不再经过抓包和TCP重组
+
+会话文件比 pcap 小得多(不含以太网/IP/TCP头部和游戏以外的流量, 可按块 zstd 压缩),
+读取时内存映射整个文件, 未压缩的块直接返回映射内存上的切片。
+
+文件格式(小端):
+    头部    magic(4s) 格式版本(H) 保留(H) 创建时间(d)
+    块      存储长度(I) 原始长度(I) 记录数(I) 压缩方式(H) 保留(H) 首条时间(d) 末条时间(d) 数据
+    记录    时间(d) 流编号(I) 长度(I) 数据包
+
+块按写入顺序追加, 写到一半中断时只丢失最后一个不完整的块。
+"""
+
+import bisect
+import mmap
+import struct
+import time
+from typing import Iterator, List, Optional, Tuple
+
+from logging_config import get_logger
+
+logger = get_logger(__name__)
+
+MAGIC = b'SRSS'
+FORMAT_VERSION = 1
+CODEC_NONE = 0
+CODEC_ZSTD = 1
+# 块的原始数据达到该长度时写入文件
+DEFAULT_BLOCK_SIZE = 256 * 1024
+# 块中最早的数据包超过该时间(秒)未写入时写入文件, 限制程序异常退出时丢失的数据
+DEFAULT_FLUSH_INTERVAL = 5.0
+
+_HEADER = struct.Struct('<4sHHd')
+_BLOCK = struct.Struct('<IIIHHdd')
+_RECORD = struct.Struct('<dII')
+
+
+def is_session_file(path: str) -> bool:
+    """文件是否为会话文件"""
+    try:
+        with open(path, "rb") as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+
+class SessionWriter:
+    """
+    会话文件写入器
+
+    数据包先追加到内存中的块缓冲区, 块写满或超过 flush_interval 时整块写入文件。
+    不加锁, 调用方应只在一个线程中使用(PacketCapture 在持有 tcp_lock 时调用)。
+    """
+
+    def __init__(self, path: str, compress: bool = True, block_size: int = DEFAULT_BLOCK_SIZE,
+                 flush_interval: float = DEFAULT_FLUSH_INTERVAL, level: int = 3):
+        """
+        初始化写入器, 创建或覆盖会话文件
+
+        Args:
+            path: 会话文件路径
+            compress: 是否用 zstd 压缩每个块
+            block_size: 块的原始数据长度
+            flush_interval: 块中最早的数据包等待写入的最长时间(秒), 按数据包时间计算
+            level: zstd 压缩级别
+
+        Raises:
+            OSError: 文件无法创建
+        """
+        self.path = path
+        self.block_size = block_size
+        self.flush_interval = flush_interval
+        self._compressor = None
+        if compress:
+            import zstandard
+            self._compressor = zstandard.ZstdCompressor(level=level)
+        self._file = open(path, "wb")
+        self._file.write(_HEADER.pack(MAGIC, FORMAT_VERSION, 0, time.time()))
+        self._buffer = bytearray()
+        self._count = 0
+        self._first_time = None
+        self._last_time = 0.0
+
+        # 统计数据
+        self.frames = 0
+        self.blocks = 0
+        self.raw_bytes = 0
+        self.written_bytes = _HEADER.size
+
+    def write(self, packet_time: float, flow_id: int, frame):
+        """
+        追加一个完整数据包
+
+        Args:
+            packet_time: 抓包时间
+            flow_id: 游戏TCP流编号
+            frame: 数据包, bytes 或 memoryview
+        """
+        buffer = self._buffer
+        buffer += _RECORD.pack(packet_time, flow_id, len(frame))
+        buffer += frame
+        if self._first_time is None:
+            self._first_time = packet_time
+        self._last_time = packet_time
+        self._count += 1
+        self.frames += 1
+        if len(buffer) >= self.block_size or packet_time - self._first_time >= self.flush_interval:
+            self.flush()
+
+    def flush_if_due(self, now: float):
+        """块中最早的数据包已超过 flush_interval 时写入文件, 用于流量停止后的定时检查"""
+        if self._first_time is not None and now - self._first_time >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        """把当前块写入文件"""
+        if not self._count:
+            return
+        raw = bytes(self._buffer)
+        data = raw
+        codec = CODEC_NONE
+        if self._compressor is not None:
+            compressed = self._compressor.compress(raw)
+            # 压缩后没有变小时按原样保存
+            if len(compressed) < len(raw):
+                data = compressed
+                codec = CODEC_ZSTD
+        self._file.write(_BLOCK.pack(len(data), len(raw), self._count, codec, 0,
+                                     self._first_time, self._last_time))
+        self._file.write(data)
+        self._file.flush()
+        self.blocks += 1
+        self.raw_bytes += len(raw)
+        self.written_bytes += _BLOCK.size + len(data)
+        self._buffer.clear()
+        self._count = 0
+        self._first_time = None
+
+    def close(self):
+        """写入剩余数据并关闭文件"""
+        if self._file.closed:
+            return
+        try:
+            self.flush()
+        finally:
+            self._file.close()
+
+    def __enter__(self) -> 'SessionWriter':
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class _Block:
+    """块索引项"""
+
+    __slots__ = ('offset', 'stored', 'raw', 'count', 'codec', 'first_time', 'last_time')
+
+    def __init__(self, offset: int, stored: int, raw: int, count: int, codec: int,
+                 first_time: float, last_time: float):
+        self.offset = offset
+        self.stored = stored
+        self.raw = raw
+        self.count = count
+        self.codec = codec
+        self.first_time = first_time
+        self.last_time = last_time
+
+
+class SessionReader:
+    """
+    只读的会话文件
+
+    打开时只读取各块的头部建立索引, 按时间定位时先二分查找块, 只解压需要的块。
+    """
+
+    def __init__(self, data):
+        """
+        初始化
+
+        Args:
+            data: 会话文件内容, bytes 或 mmap
+
+        Raises:
+            ValueError: 不是有效的会话文件
+        """
+        if len(data) < _HEADER.size:
+            raise ValueError("会话文件不完整")
+        magic, version, _, created = _HEADER.unpack_from(data, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError("不是有效的会话文件")
+        self.created = created
+        self._data = data
+        self._view = memoryview(data)
+        # 遇到第一个压缩块时创建
+        self._decompressor = None
+        self.blocks: List[_Block] = []
+        # 块中最后一条时间的前缀最大值, 用于二分查找; 抓包时间不严格递增时也能定位
+        self._max_times: List[float] = []
+        # 最后一个块不完整(写入时中断)
+        self.truncated = False
+
+        offset = _HEADER.size
+        max_time = float('-inf')
+        while offset < len(data):
+            if offset + _BLOCK.size > len(data):
+                self.truncated = True
+                break
+            stored, raw, count, codec, _, first_time, last_time = _BLOCK.unpack_from(data, offset)
+            if offset + _BLOCK.size + stored > len(data) or codec not in (CODEC_NONE, CODEC_ZSTD):
+                self.truncated = True
+                break
+            self.blocks.append(_Block(offset + _BLOCK.size, stored, raw, count, codec, first_time, last_time))
+            max_time = max(max_time, last_time)
+            self._max_times.append(max_time)
+            offset += _BLOCK.size + stored
+        if self.truncated:
+            logger.warning(f"会话文件末尾的块不完整, 已忽略 {len(data) - offset} 字节")
+
+    def __len__(self) -> int:
+        return sum(block.count for block in self.blocks)
+
+    @property
+    def start_time(self) -> Optional[float]:
+        """第一个数据包的抓包时间"""
+        return self.blocks[0].first_time if self.blocks else None
+
+    @property
+    def end_time(self) -> Optional[float]:
+        """最后一个数据包的抓包时间"""
+        return self._max_times[-1] if self.blocks else None
+
+    def frames(self, start: float = None, end: float = None) -> Iterator[Tuple[float, int, memoryview]]:
+        """
+        按写入顺序遍历数据包
+
+        Args:
+            start: 只返回抓包时间不早于该时间的数据包, None表示从头开始
+            end: 只返回抓包时间不晚于该时间的数据包, None表示到文件末尾
+
+        Yields:
+            (抓包时间, 流编号, 数据包); 数据包是映射内存或解压缓冲区上的 memoryview, 不复制数据
+        """
+        index = bisect.bisect_left(self._max_times, start) if start is not None else 0
+        record_size = _RECORD.size
+        unpack_record = _RECORD.unpack_from
+        for block in self.blocks[index:]:
+            if end is not None and block.first_time > end:
+                break
+            data = self._block_data(block)
+            offset = 0
+            for _ in range(block.count):
+                packet_time, flow_id, length = unpack_record(data, offset)
+                offset += record_size
+                if (start is None or packet_time >= start) and (end is None or packet_time <= end):
+                    yield packet_time, flow_id, data[offset:offset + length]
+                offset += length
+
+    def _block_data(self, block: _Block) -> memoryview:
+        """块的原始数据"""
+        stored = self._view[block.offset:block.offset + block.stored]
+        if block.codec == CODEC_NONE:
+            return stored
+        if self._decompressor is None:
+            import zstandard
+            self._decompressor = zstandard.ZstdDecompressor()
+        return memoryview(self._decompressor.decompress(stored, max_output_size=block.raw))
+
+    def close(self):
+        """关闭映射; 仍有数据包被引用时由垃圾回收关闭"""
+        try:
+            self._view.release()
+            if isinstance(self._data, mmap.mmap):
+                self._data.close()
+        except BufferError:
+            pass
+
+    def __enter__(self) -> 'SessionReader':
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @classmethod
+    def open(cls, path: str) -> 'SessionReader':
+        """
+        内存映射会话文件
+
+        Raises:
+            OSError: 文件无法读取
+            ValueError: 不是有效的会话文件
+        """
+        with open(path, "rb") as f:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls(data)
@@ -0,0 +1,105 @@
+"""
+TCP流重组缓冲区
+"""
+
+import struct
+from collections import deque
+from typing import Optional
+
+_UINT32 = struct.Struct('>I')
+
+
+class StreamBuffer:
+    """
+    TCP流重组缓冲区
+
+    以分块列表加读取偏移保存待处理数据, 追加和消费均为均摊O(1)。
+    完整落在单个分块内的帧以 memoryview 切片返回, 不复制数据;
+    跨分块的帧只在取出时拼接一次。
+    追加的数据必须是不可变对象(bytes 或 bytes 的 memoryview)。
+    """
+
+    __slots__ = ('_chunks', '_offset', '_size')
+
+    def __init__(self):
+        self._chunks = deque()
+        self._offset = 0
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def append(self, data):
+        """追加数据"""
+        view = data if isinstance(data, memoryview) else memoryview(data)
+        if not view:
+            return
+        self._chunks.append(view)
+        self._size += len(view)
+
+    def peek_uint32(self) -> Optional[int]:
+        """查看开头的32位无符号整数(大端序)，不推进偏移量"""
+        if self._size < 4:
+            return None
+        first = self._chunks[0]
+        if len(first) - self._offset >= 4:
+            return _UINT32.unpack_from(first, self._offset)[0]
+        return _UINT32.unpack(self._gather(4, consume=False))[0]
+
+    def read(self, length: int) -> memoryview:
+        """
+        读取并消费指定长度的数据
+
+        Args:
+            length: 读取长度, 不能超过缓冲区长度
+
+        Returns:
+            数据的 memoryview
+        """
+        if length == 0:
+            return memoryview(b'')
+        if length > self._size:
+            raise ValueError(f"缓冲区数据不足: {self._size} < {length}")
+        first = self._chunks[0]
+        offset = self._offset
+        end = offset + length
+        if end <= len(first):
+            # 帧完整落在第一个分块内, 直接切片
+            view = first[offset:end]
+            if end == len(first):
+                self._chunks.popleft()
+                self._offset = 0
+            else:
+                self._offset = end
+            self._size -= length
+            return view
+        return memoryview(self._gather(length, consume=True))
+
+    def clear(self):
+        """清空缓冲区"""
+        self._chunks.clear()
+        self._offset = 0
+        self._size = 0
+
+    def _gather(self, length: int, consume: bool) -> bytes:
+        """拼接跨分块的数据"""
+        parts = []
+        offset = self._offset
+        remaining = length
+        consumed = 0
+        for chunk in self._chunks:
+            take = min(len(chunk) - offset, remaining)
+            parts.append(chunk[offset:offset + take])
+            remaining -= take
+            offset += take
+            if offset == len(chunk):
+                consumed += 1
+                offset = 0
+            if not remaining:
+                break
+        if consume:
+            for _ in range(consumed):
+                self._chunks.popleft()
+            self._offset = offset
+            self._size -= length
+        return b''.join(parts)
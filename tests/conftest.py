@@ -0,0 +1,29 @@
+"""
+pytest 公共配置
+把项目根目录和 benchmarks/ 加入导入路径, 测试可直接复用基准测试中的流量生成器
+"""
+
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (ROOT, os.path.join(ROOT, 'benchmarks')):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+
+@pytest.fixture
+def watchlist_file(tmp_path):
+    """空的关注列表配置文件"""
+    path = tmp_path / "watchlist.json"
+    path.write_text('{"type_ids": [], "names": []}', encoding="utf-8")
+    return str(path)
+
+
+@pytest.fixture
+def in_root(monkeypatch):
+    """切换到项目根目录, PacketParser 按相对路径读取 monster_names.json"""
+    monkeypatch.chdir(ROOT)
+    return ROOT
@@ -0,0 +1,44 @@
+"""
+aoi_decoder 与 star_pb2 解码结果一致性测试
+两种解码方式交给 PacketParser 后的回调结果应完全相同
+"""
+
+import random
+
+import pytest
+
+pytest.importorskip("google.protobuf")
+
+from aoi_decoder import decode_SyncNearDeltaInfo, decode_SyncNearEntities
+from bench_aoi_decoder import build_delta_info, build_entities, proto_delta_info, proto_entities
+from packet_parser import PacketParser
+
+
+def collect(parse, decode, payloads):
+    """经 PacketParser 处理后收集回调结果"""
+    results = []
+    parser = PacketParser(results.append)
+    for data in payloads:
+        getattr(parser, parse)(decode(data))
+    return results
+
+
+@pytest.mark.parametrize('monster_ratio', [0.0, 0.3, 1.0])
+@pytest.mark.parametrize('parse, build, proto_decode, slim_decode', [
+    ('parse_SyncNearDeltaInfo', build_delta_info, proto_delta_info, decode_SyncNearDeltaInfo),
+    ('parse_SyncNearEntities', build_entities, proto_entities, decode_SyncNearEntities),
+], ids=['SyncNearDeltaInfo', 'SyncNearEntities'])
+def test_slim_decoder_matches_star_pb2(in_root, parse, build, proto_decode, slim_decode, monster_ratio):
+    rnd = random.Random(0)
+    payloads = [build(rnd, 50, monster_ratio) for _ in range(10)]
+    expected = collect(parse, proto_decode, payloads)
+    assert collect(parse, slim_decode, payloads) == expected
+    if monster_ratio:
+        assert expected
+
+
+def test_slim_decoder_rejects_truncated_data():
+    from google.protobuf.message import DecodeError
+    data = build_delta_info(random.Random(1), 5, 1.0)
+    with pytest.raises(DecodeError):
+        decode_SyncNearDeltaInfo(data[:len(data) // 2])
@@ -0,0 +1,172 @@
+"""
+内核过滤器收窄与放宽测试
+"""
+
+import struct
+
+import pytest
+
+pytest.importorskip("zstandard")
+pytest.importorskip("google.protobuf")
+
+import packet_capture
+from metrics import MetricsRegistry
+from packet_capture import PacketCapture
+from synthetic_traffic import SERVER, CLIENT, TrafficGenerator, build_frames, handshake, segment, write_pcap
+
+FLOW = (SERVER[0], SERVER[1], CLIENT[0], CLIENT[1])
+
+
+class Feeder:
+    """按顺序把应用层数据包作为TCP分段交给解码逻辑"""
+
+    def __init__(self, capture, seq=1000):
+        self.capture = capture
+        self.seq = seq
+
+    def feed(self, data):
+        self.capture._process_tcp_stream(FLOW, self.seq, data)
+        self.seq += len(data)
+
+
+def apply_pending(capture):
+    """模拟抓包线程应用待切换的过滤器"""
+    if capture._pending_filter is not None:
+        capture.capture_filter = capture._pending_filter
+        capture._pending_filter = None
+    return capture.capture_filter
+
+
+@pytest.fixture
+def capture():
+    capture = PacketCapture(trace_interval=0)
+    capture.is_running = True
+    capture.callback = lambda data: None
+    return capture
+
+
+def test_narrow_after_identify_and_widen_on_lull(capture):
+    generator = TrafficGenerator(0, 5, 10)
+    feeder = Feeder(capture)
+    capture._advance_clock(100.0)
+    feeder.feed(handshake())
+    for packet in generator.messages(3):
+        feeder.feed(packet)
+    assert apply_pending(capture).startswith('tcp and (')
+
+    # 超过 FRAGMENT_TIMEOUT 没有数据, 重组状态被清理, 放宽过滤器
+    capture._clock_time = 100.0 + capture.FRAGMENT_TIMEOUT + 1
+    capture._cleanup_expired_cache()
+    assert apply_pending(capture) == capture.COARSE_FILTER
+
+    # 游戏流恢复并重新同步后重新收窄
+    feeder.seq += 5000
+    for packet in generator.messages(3):
+        feeder.feed(packet)
+    assert capture.flows[FLOW].next_seq != -1
+    assert apply_pending(capture).startswith('tcp and (')
+
+    # 游戏流超时移除后放宽
+    capture._clock_time = 100.0 + capture.FLOW_TIMEOUT + 10
+    capture._cleanup_expired_cache()
+    assert not capture.flows
+    assert apply_pending(capture) == capture.COARSE_FILTER
+
+
+def test_renarrow_after_idle_widening(capture):
+    feeder = Feeder(capture)
+    feeder.feed(handshake())
+    narrow = apply_pending(capture)
+    # 抓包线程因空闲放宽了过滤器
+    capture.capture_filter = capture.COARSE_FILTER
+    feeder.feed(TrafficGenerator(0, 5, 10).next_message())
+    assert apply_pending(capture) == narrow
+
+
+def test_server_fin_closes_flow(tmp_path):
+    pytest.importorskip("scapy")
+    generator = TrafficGenerator(seed=2)
+    frames = build_frames(segment(generator.messages(20)))
+    # 复制最后一帧改为不带负载的 FIN+ACK
+    last = frames[-1]
+    fin = bytearray(last[:54])
+    struct.pack_into('!H', fin, 16, 40)
+    fin[47] = 0x11
+    frames.append(bytes(fin))
+    pcap = tmp_path / "fin.pcap"
+    write_pcap(str(pcap), frames)
+
+    capture = PacketCapture(trace_interval=0)
+    events = []
+    result = capture.replay(str(pcap), events.append, 0)
+
+    assert result['messages'] == 20
+    assert not capture.flows
+    closed = [event for event in events if 'flow_closed' in event]
+    assert len(closed) == 1
+    assert capture._pending_filter is None
+    assert capture.capture_filter == capture.COARSE_FILTER
+
+
+class FakeFilter:
+    def __init__(self):
+        self.applied = []
+
+    def setfilter(self, bpf_filter):
+        self.applied.append(bpf_filter)
+
+
+class FakeSocket:
+    """不收到任何数据包的抓包套接字"""
+
+    LL = 'fake'
+
+    def __init__(self, capture, polls):
+        self.capture = capture
+        self.polls = polls
+        self.pcap_fd = FakeFilter()
+
+    def select(self, sockets, timeout):
+        self.polls -= 1
+        if self.polls <= 0:
+            self.capture.is_running = False
+        return []
+
+    def close(self):
+        pass
+
+
+class FakeConf:
+    def __init__(self, sock):
+        self.sock = sock
+        self.l2types = type('L2Types', (), {'layer2num': {FakeSocket.LL: 1}})()
+
+    def L2listen(self, iface=None, filter=None):
+        return self.sock
+
+
+def test_raw_loop_widens_idle_narrow_filter(capture, monkeypatch):
+    sock = FakeSocket(capture, polls=3)
+    monkeypatch.setattr(packet_capture, '_load_scapy', lambda dissect=False: FakeConf(sock))
+    capture.FILTER_IDLE_TIMEOUT = 0
+    capture._pending_filter = 'tcp and (src host 10.0.0.1)'
+
+    capture._raw_capture_loop()
+
+    assert sock.pcap_fd.applied == ['tcp and (src host 10.0.0.1)', capture.COARSE_FILTER]
+    assert capture.capture_filter == capture.COARSE_FILTER
+
+
+def test_filter_metrics(capture, monkeypatch):
+    registry = MetricsRegistry()
+    capture.register_metrics(registry)
+    values = registry.collect()
+    assert values['capture_filter_changes_total'] == 0
+    # 没有网卡计数时不导出
+    assert 'capture_kernel_filtered_total' not in values
+    assert 'kernel_filtered' not in registry.render()
+
+    monkeypatch.setattr(capture, '_read_nic_packets', lambda: 150)
+    capture._nic_packets_start = 100
+    capture.packet_count = 20
+    assert registry.collect()['capture_kernel_filtered_total'] == 30
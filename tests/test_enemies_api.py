@@ -0,0 +1,78 @@
+"""
+/enemies?since= 增量查询接口测试
+"""
+
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("httpx")
+
+from fastapi.testclient import TestClient
+
+from enemy_manager import EnemyManager
+
+
+def delta(uid, hp=100, **extra):
+    return dict({'enemy_uid': uid, 'enemy_name': f"怪物{uid}", 'enemy_hp': hp, 'enemy_max_hp': 100}, **extra)
+
+
+@pytest.fixture
+def manager(watchlist_file):
+    return EnemyManager(watchlist_file=watchlist_file)
+
+
+@pytest.fixture
+def client(manager):
+    with TestClient(manager.create_app()) as client:
+        yield client
+
+
+def test_since_returns_changes_and_removals(manager, client):
+    manager.sync_enemies([delta(1)], flow_id=1)
+    manager.sync_enemies([delta(2)])
+    version = manager.snapshot.version
+    manager.sync_enemies([delta(2, hp=50), delta(3)])
+    manager.clear_flow(1)
+
+    response = client.get("/enemies", params={"since": version})
+    data = response.json()
+    assert int(response.headers["X-Snapshot-Version"]) == data["version"] == manager.snapshot.version
+    assert data["full"] is False
+    assert data["enemies"] == {"2": {'name': "怪物2", 'hp': 50, 'max_hp': 100},
+                               "3": {'name': "怪物3", 'hp': 100, 'max_hp': 100}}
+    assert data["removed"] == [1]
+
+    data = client.get("/enemies", params={"since": data["version"]}).json()
+    assert data == {"version": manager.snapshot.version, "full": False, "enemies": {}, "removed": []}
+
+
+def test_since_older_than_history_returns_full_snapshot(manager, client):
+    manager.sync_enemies([delta(1)])
+    manager.sync_enemies([delta(2)])
+    for hp in range(len(manager.enemies._history)):
+        manager.sync_enemies([delta(2, hp=hp)])
+
+    data = client.get("/enemies", params={"since": 1}).json()
+    assert data["full"] is True
+    assert set(data["enemies"]) == {"1", "2"}
+    assert data["removed"] == []
+    # 晚于当前版本(例如程序重启后)同样返回完整数据
+    data = client.get("/enemies", params={"since": manager.snapshot.version + 1}).json()
+    assert data["full"] is True
+
+
+def test_since_proto(manager, client):
+    from enemy_pb2 import EnemyList
+
+    manager.sync_enemies([delta(1)], flow_id=1)
+    manager.sync_enemies([delta(2)])
+    version = manager.snapshot.version
+    manager.sync_enemies([delta(2, hp=50)])
+    manager.clear_flow(1)
+
+    response = client.get("/enemies", params={"since": version, "format": "proto"})
+    message = EnemyList.FromString(response.content)
+    assert message.Version == manager.snapshot.version
+    assert not message.Full
+    assert [(enemy.Uid, enemy.Hp) for enemy in message.Enemies] == [(2, 50)]
+    assert list(message.Removed) == [1]
@@ -0,0 +1,44 @@
+"""
+enemy_codec 测试
+"""
+
+import json
+
+import pytest
+
+pytest.importorskip("google.protobuf")
+
+from enemy_codec import encode_changes, encode_proto
+
+
+ENEMIES = {
+    7: {'name': '哥布林', 'hp': 50, 'max_hp': 100},
+    -3: {'name': '', 'hp': 0, 'max_hp': 0},
+}
+
+
+def test_proto_round_trip():
+    from enemy_pb2 import EnemyList
+    message = EnemyList.FromString(encode_proto(12, ENEMIES, removed=[9], full=False))
+    assert message.Version == 12
+    assert not message.Full
+    assert list(message.Removed) == [9]
+    assert {enemy.Uid: (enemy.Name, enemy.Hp, enemy.MaxHp) for enemy in message.Enemies} == {
+        7: ('哥布林', 50, 100),
+        -3: ('', 0, 0),
+    }
+
+
+def test_json_changes():
+    data = json.loads(encode_changes(3, ENEMIES, [1, 2], True, 'json'))
+    assert data == {"version": 3, "full": True, "enemies": {"7": ENEMIES[7], "-3": ENEMIES[-3]}, "removed": [1, 2]}
+
+
+def test_descriptors_do_not_collide():
+    # 三个 .proto 的消息注册到同一个默认描述符池
+    import aoi_pb2
+    import enemy_pb2
+    import star_pb2
+    assert enemy_pb2.EnemyList.DESCRIPTOR.full_name == 'enemy.EnemyList'
+    assert aoi_pb2.SyncNearDeltaInfo.DESCRIPTOR.full_name == 'aoi.SyncNearDeltaInfo'
+    assert star_pb2.SyncNearDeltaInfo.DESCRIPTOR.full_name == 'SyncNearDeltaInfo'
@@ -0,0 +1,62 @@
+"""
+EnemyManager 测试
+"""
+
+import pytest
+
+from enemy_manager import EnemyManager
+
+
+def delta(uid, hp=100, **extra):
+    return dict({'enemy_uid': uid, 'enemy_name': f"怪物{uid}", 'enemy_hp': hp, 'enemy_max_hp': 100}, **extra)
+
+
+@pytest.fixture
+def manager(watchlist_file):
+    return EnemyManager(watchlist_file=watchlist_file, ttl=10, disappear_ttl=2)
+
+
+def test_expire_without_new_traffic(manager):
+    manager.sync_enemies([delta(1), delta(2)], timestamp=100)
+    manager.sync_enemies([delta(2, enemy_disappeared=True)], timestamp=101)
+
+    manager.expire(102)
+    assert set(manager.snapshot.enemies) == {1, 2}
+    # 消失的敌人超过 disappear_ttl 后移除
+    manager.expire(104)
+    assert set(manager.snapshot.enemies) == {1}
+    # 仍在视野内的敌人超过 ttl 后移除
+    manager.expire(111)
+    assert manager.snapshot.enemies == {}
+    assert manager.evictions['disappeared'] == 1
+    assert manager.evictions['expired'] == 1
+
+
+def test_expire_publishes_to_subscribers(manager):
+    manager.sync_enemies([delta(1)], timestamp=100)
+    version = manager.snapshot.version
+    manager.expire(100)
+    assert manager.snapshot.version == version
+    manager.expire(200)
+    assert manager.snapshot.version > version
+    assert 1 not in manager.snapshot.enemies
+
+
+def test_cleanup_event_expires_enemies(in_root, watchlist_file):
+    from main import StarResonanceMonitor
+    monitor = StarResonanceMonitor(watchlist_file=watchlist_file, enemy_ttl=10, trace_interval=0)
+    manager = monitor.enemy_manager
+    monitor._on_callback({'enemy_deltas': [delta(1)], 'flow_id': 1, 'time': 100})
+    assert 1 in manager.snapshot.enemies
+    monitor._on_callback({'cleanup': None, 'time': 111})
+    assert manager.snapshot.enemies == {}
+
+
+def test_capture_cleanup_emits_event():
+    from packet_capture import PacketCapture
+    capture = PacketCapture(trace_interval=0)
+    events = []
+    capture.callback = events.append
+    capture._clock_time = 123.0
+    capture._cleanup_expired_cache()
+    assert events == [{'cleanup': None, 'time': 123.0}]
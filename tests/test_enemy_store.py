@@ -0,0 +1,188 @@
+"""
+EnemyStore 快照发布测试
+"""
+
+import random
+import threading
+import time
+
+from enemy_store import EnemyStore, OverlayMapping
+
+
+def update(store, uid, hp, name=None, type_id=None, watched=None):
+    record = store.for_update(uid)
+    if name is not None:
+        store.set_name(record, name)
+    if type_id is not None:
+        store.set_type_id(record, type_id)
+    if watched is not None:
+        store.set_watched(record, watched)
+    record.hp = hp
+    record.max_hp = hp * 2 + 1
+
+
+def expected_index(store, key):
+    index = {}
+    for record in store:
+        value = getattr(record, key)
+        if value is not None:
+            index.setdefault(value, set()).add(record.uid)
+    return index
+
+
+def check_snapshot(snapshot):
+    """校验快照内部一致: 血量配对、长度、索引和关注表都指向同一版本的敌人"""
+    enemies = snapshot.enemies
+    items = dict(enemies.items())
+    assert len(enemies) == len(items)
+    for uid, enemy in items.items():
+        assert enemy['max_hp'] == enemy['hp'] * 2 + 1, (uid, enemy)
+    indexed = 0
+    for name, uids in snapshot.by_name.items():
+        for uid in uids:
+            assert enemies[uid]['name'] == name
+        indexed += len(uids)
+    assert indexed == len(items)
+    for uid, enemy in snapshot.watched.items():
+        assert enemies[uid] is enemy
+
+
+def test_publish_matches_store_and_keeps_old_snapshots():
+    rnd = random.Random(1)
+    store = EnemyStore()
+    published = []
+    for step in range(400):
+        for _ in range(rnd.randint(1, 8)):
+            uid = rnd.randint(1, 60)
+            if rnd.random() < 0.15:
+                store.remove(uid)
+            else:
+                update(store, uid, step, name=f"怪物{rnd.randint(0, 5)}", type_id=rnd.randint(0, 3),
+                       watched=rnd.random() < 0.3)
+        snapshot = store.publish()
+        # 只偶尔遍历, 让分层超过 MAX_DEPTH 后由写入方合并
+        if step % 50 == 0:
+            check_snapshot(snapshot)
+        published.append((snapshot, store.to_dict(), expected_index(store, 'name'), expected_index(store, 'type_id'),
+                          {record.uid for record in store if store.is_watched(record.uid)}))
+
+    # 后续发布不修改已发布的快照
+    for snapshot, enemies, by_name, by_type, watched in published:
+        assert dict(snapshot.enemies) == enemies
+        assert len(snapshot.enemies) == len(enemies)
+        assert {name: set(uids) for name, uids in snapshot.by_name.items()} == by_name
+        assert {type_id: set(uids) for type_id, uids in snapshot.by_type.items()} == by_type
+        assert set(snapshot.watched) == watched
+        for uid in range(0, 62):
+            assert (uid in snapshot.enemies) == (uid in enemies)
+            assert snapshot.enemies.get(uid) == enemies.get(uid)
+
+
+def test_publish_reuses_unchanged_mappings():
+    store = EnemyStore()
+    update(store, 1, 10, name="甲", type_id=1, watched=True)
+    update(store, 2, 10, name="乙", type_id=2)
+    first = store.publish()
+
+    update(store, 2, 20)
+    second = store.publish()
+    assert second.by_name is first.by_name
+    assert second.by_type is first.by_type
+    assert second.watched is first.watched
+    assert dict(second.changes) == {2: second.enemies[2]}
+    assert first.enemies[2]['hp'] == 10
+
+    update(store, 1, 30)
+    third = store.publish()
+    assert third.watched is not second.watched
+    assert third.watched[1] is third.enemies[1]
+
+
+def test_overlay_merges_after_max_depth():
+    mapping = OverlayMapping.overlay({}, {0: 'a'})
+    for i in range(1, OverlayMapping.MAX_DEPTH * 3):
+        mapping = OverlayMapping.overlay(mapping, {i: 'a', i - 1: None})
+        assert mapping._depth <= OverlayMapping.MAX_DEPTH
+    assert dict(mapping) == {OverlayMapping.MAX_DEPTH * 3 - 1: 'a'}
+    assert len(mapping) == 1
+
+
+def test_concurrent_readers_see_consistent_snapshots():
+    store = EnemyStore()
+    stop = threading.Event()
+    errors = []
+
+    def writer():
+        rnd = random.Random(0)
+        generation = 0
+        while not stop.is_set():
+            for _ in range(20):
+                generation += 1
+                uid = rnd.randint(1, 300)
+                if rnd.random() < 0.05:
+                    store.remove(uid)
+                else:
+                    update(store, uid, generation, name=f"怪物{uid % 7}", type_id=uid % 5,
+                           watched=uid % 3 == 0)
+            store.publish()
+
+    def reader():
+        last_version = 0
+        try:
+            while not stop.is_set():
+                snapshot = store.snapshot
+                assert snapshot.version >= last_version
+                last_version = snapshot.version
+                check_snapshot(snapshot)
+        except Exception as e:
+            errors.append(e)
+            stop.set()
+
+    threads = [threading.Thread(target=writer)] + [threading.Thread(target=reader) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    time.sleep(1.0)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    assert not errors, errors
+    assert store.snapshot.version > OverlayMapping.MAX_DEPTH
+    assert dict(store.snapshot.enemies) == store.to_dict()
+
+
+def test_changes_since_returns_final_state_and_removals():
+    store = EnemyStore()
+    update(store, 1, 10)
+    update(store, 2, 10)
+    base = store.publish().version
+    update(store, 2, 20)
+    store.publish()
+    update(store, 2, 30)
+    update(store, 3, 30)
+    store.remove(1)
+    latest = store.publish()
+
+    snapshot, enemies, removed = store.changes_since(base)
+    assert snapshot is latest
+    assert enemies == {2: latest.enemies[2], 3: latest.enemies[3]}
+    assert enemies[2]['hp'] == 30
+    assert removed == [1]
+
+    snapshot, enemies, removed = store.changes_since(latest.version)
+    assert (enemies, removed) == ({}, [])
+
+
+def test_changes_since_falls_back_to_full_snapshot():
+    store = EnemyStore(history=4)
+    for hp in range(6):
+        update(store, 1, hp)
+        store.publish()
+    current = store.snapshot.version
+
+    # 环形列表保存最近 history 个版本, 最多可查询 history - 1 个版本的变化
+    snapshot, enemies, removed = store.changes_since(current - 3)
+    assert enemies == {1: snapshot.enemies[1]}
+    for version in (current - 4, 0, current + 1):
+        snapshot, enemies, removed = store.changes_since(version)
+        assert snapshot.version == current
+        assert enemies is None and removed == []
@@ -0,0 +1,54 @@
+"""
+/ws/enemies 推送接口测试
+使用 Starlette 的进程内 TestClient, 不需要 uvicorn 和 websockets
+"""
+
+import json
+import time
+
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("httpx")
+
+from fastapi.testclient import TestClient
+
+from enemy_manager import EnemyManager
+
+
+@pytest.fixture
+def manager(watchlist_file):
+    return EnemyManager(watchlist_file=watchlist_file)
+
+
+def wait_for_clients(manager, count, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while len(manager.broadcaster) != count and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return len(manager.broadcaster)
+
+
+def test_websocket_pushes_snapshot_and_changes(manager):
+    manager.sync_enemies([{'enemy_uid': 1, 'enemy_name': "怪物A", 'enemy_hp': 100, 'enemy_max_hp': 100}])
+    with TestClient(manager.create_app()) as client:
+        with client.websocket_connect("/ws/enemies") as ws:
+            message = json.loads(ws.receive_text())
+            assert message["type"] == "snapshot"
+            assert list(message["enemies"]) == ["1"]
+
+            manager.sync_enemies([{'enemy_uid': 2, 'enemy_name': "怪物B", 'enemy_hp': 50, 'enemy_max_hp': 100}])
+            message = json.loads(ws.receive_text())
+            assert message["type"] == "changes"
+            assert list(message["enemies"]) == ["2"]
+
+
+def test_idle_client_disconnect_unsubscribes(manager):
+    with TestClient(manager.create_app()) as client:
+        with client.websocket_connect("/ws/enemies") as ws:
+            ws.receive_text()
+            # 客户端发来的消息被忽略
+            ws.send_text("ping")
+            assert wait_for_clients(manager, 1) == 1
+            ws.close()
+            # 关闭后没有新的推送, 服务端也应立即注销
+            assert wait_for_clients(manager, 0) == 0
@@ -0,0 +1,127 @@
+"""
+frame_dissector 与 scapy 解析结果一致性测试
+随机构造不同链路层、VLAN、IP/TCP选项、以太网填充和非TCP帧, 逐帧与scapy对比
+"""
+
+import random
+import socket
+import struct
+
+import pytest
+
+pytest.importorskip("scapy")
+
+from scapy.all import IP, TCP, UDP, Ether, Dot1Q, Dot1AD, CookedLinux, Raw, IPOption_NOP, IPOption_RR
+
+from frame_dissector import DLT_EN10MB, DLT_LINUX_SLL, DLT_LOOP, DLT_NULL, DLT_RAW, build_flow_filter, \
+    dissect_tcp_frame
+
+LINKTYPES = (DLT_EN10MB, DLT_LINUX_SLL, DLT_RAW, DLT_NULL, DLT_LOOP)
+TCP_OPTIONS = [('MSS', 1460), ('NOP', None), ('WScale', 7), ('SAckOK', b''), ('Timestamp', (1, 2)),
+               ('SAck', (100, 200))]
+
+
+def random_ip(rnd):
+    return socket.inet_ntoa(rnd.getrandbits(32).to_bytes(4, 'big'))
+
+
+def random_frame(rnd):
+    """构造一个随机帧, 返回 (链路层类型, 帧数据)"""
+    options = []
+    if rnd.random() < 0.3:
+        options = [IPOption_NOP()] * rnd.randint(1, 3) + ([IPOption_RR(routers=[random_ip(rnd)])]
+                                                          if rnd.random() < 0.5 else [])
+    ip = IP(src=random_ip(rnd), dst=random_ip(rnd), options=options)
+    roll = rnd.random()
+    if roll < 0.05:
+        # 分片
+        ip.flags = 'MF' if rnd.random() < 0.5 else 0
+        ip.frag = 0 if ip.flags else rnd.randint(1, 100)
+    payload = Raw(bytes(rnd.getrandbits(8) for _ in range(rnd.choice((0, 1, 5, 60, 300)))))
+    if roll > 0.95:
+        packet = ip / UDP(sport=rnd.randint(1, 65535), dport=rnd.randint(1, 65535)) / payload
+    else:
+        tcp = TCP(sport=rnd.randint(1, 65535), dport=rnd.randint(1, 65535), seq=rnd.getrandbits(32),
+                  flags=rnd.getrandbits(8),
+                  options=rnd.sample(TCP_OPTIONS, rnd.randint(0, 3)) if rnd.random() < 0.5 else [])
+        packet = ip / tcp / payload
+    data = bytes(packet)
+
+    linktype = rnd.choice(LINKTYPES)
+    if linktype == DLT_EN10MB:
+        frame = Ether(src="00:11:22:33:44:55", dst="66:77:88:99:aa:bb")
+        for _ in range(rnd.choice((0, 0, 1, 2))):
+            frame = frame / (Dot1AD if rnd.random() < 0.3 else Dot1Q)(vlan=rnd.randint(1, 4094))
+        # 叠加已解析的IP层, scapy 才会填写各层的类型字段
+        frame = bytes(frame / IP(data))
+        assert frame.endswith(data)
+        if rnd.random() < 0.1:
+            # 非IPv4
+            frame = frame[:12] + b'\x86\xdd' + frame[14:]
+        # 以太网最小帧长填充
+        frame = frame.ljust(60, b'\x00') + (b'\x00' * rnd.randint(1, 8) if rnd.random() < 0.2 else b'')
+    elif linktype == DLT_LINUX_SLL:
+        frame = bytes(CookedLinux() / IP(data))
+    elif linktype == DLT_RAW:
+        frame = data
+    else:
+        frame = struct.pack('=I', socket.AF_INET) + data
+    return linktype, frame
+
+
+def scapy_dissect(frame, linktype):
+    """用scapy逐层解析, 跳过IP分片"""
+    if linktype == DLT_EN10MB:
+        packet = Ether(frame)
+    elif linktype == DLT_LINUX_SLL:
+        packet = CookedLinux(frame)
+    elif linktype == DLT_RAW:
+        packet = IP(frame)
+    else:
+        packet = IP(frame[4:])
+    if IP not in packet or TCP not in packet:
+        return None
+    ip_layer = packet[IP]
+    if ip_layer.frag or ip_layer.flags.MF:
+        return None
+    tcp_layer = packet[TCP]
+    flow = (socket.inet_aton(ip_layer.src), tcp_layer.sport, socket.inet_aton(ip_layer.dst), tcp_layer.dport)
+    payload = tcp_layer[Raw].load if Raw in tcp_layer else b""
+    return flow, tcp_layer.seq, payload, int(tcp_layer.flags)
+
+
+def test_random_frames_match_scapy():
+    rnd = random.Random(5)
+    dissected = 0
+    for _ in range(1000):
+        linktype, frame = random_frame(rnd)
+        result = dissect_tcp_frame(frame, linktype)
+        if result is not None:
+            flow, seq, payload, flags = result
+            result = flow, seq, bytes(payload), flags
+            dissected += 1
+        assert result == scapy_dissect(frame, linktype), (linktype, frame.hex())
+    assert dissected > 500
+
+
+def test_ethernet_padding_is_not_payload():
+    packet = Ether() / IP(src="10.0.0.1", dst="192.168.1.5") / TCP(sport=5003, dport=50000, flags="A")
+    frame = bytes(packet).ljust(60, b'\x00')
+    flow, seq, payload, flags = dissect_tcp_frame(frame)
+    assert bytes(payload) == b""
+    assert flags == 0x10
+
+
+def test_truncated_and_unsupported_frames():
+    frame = bytes(Ether() / IP() / TCP() / Raw(b"data"))
+    for size in (0, 13, 14, 33, 53):
+        assert dissect_tcp_frame(frame[:size]) is None
+    assert dissect_tcp_frame(frame, 999) is None
+    assert dissect_tcp_frame(struct.pack('=I', socket.AF_INET6) + frame[14:], DLT_NULL) is None
+
+
+def test_build_flow_filter():
+    flow = (socket.inet_aton("10.0.0.1"), 5003, socket.inet_aton("192.168.1.5"), 50000)
+    assert build_flow_filter([]) == "tcp"
+    assert build_flow_filter([flow]) == ("tcp and ((src host 10.0.0.1 and src port 5003"
+                                         " and dst host 192.168.1.5 and dst port 50000))")
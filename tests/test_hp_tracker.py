@@ -0,0 +1,139 @@
+"""
+HpTracker 血量记录测试
+"""
+
+import json
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from enemy_manager import EnemyManager
+from hp_tracker import HpTracker
+
+
+def record(tracker, uid, hp, timestamp, max_hp=10000):
+    tracker.record(uid, f"怪物{uid}", 1, hp, max_hp, timestamp)
+
+
+def test_dps_and_ttk_over_window():
+    tracker = HpTracker(window=10.0)
+    # 前5秒没有伤害, 之后每秒100点
+    for t in range(6):
+        record(tracker, 1, 10000, 1000.0 + t)
+    for t in range(1, 16):
+        record(tracker, 1, 10000 - 100 * t, 1005.0 + t)
+    tracker.publish()
+
+    stats = tracker.stats[1]
+    # 窗口只包含最近10秒, 不被开头的空闲时间拉低
+    assert stats['dps'] == 100.0
+    assert stats['ttk'] == 85.0
+    assert stats['hp'] == 8500
+    assert stats['duration'] == 20.0
+
+
+def test_no_damage_or_heal_has_no_ttk():
+    tracker = HpTracker()
+    record(tracker, 1, 5000, 0.0)
+    record(tracker, 1, 5000, 1.0)
+    tracker.publish()
+    assert (tracker.stats[1]['dps'], tracker.stats[1]['ttk']) == (0.0, None)
+    record(tracker, 1, 6000, 2.0)
+    tracker.publish()
+    assert (tracker.stats[1]['dps'], tracker.stats[1]['ttk']) == (0.0, None)
+
+
+def test_dps_after_ring_buffer_wraps():
+    tracker = HpTracker(window=100.0, capacity=4)
+    for t in range(10):
+        record(tracker, 1, 10000 - 50 * t, float(t))
+    tracker.publish()
+    # 只保留最近4个采样, 窗口从第6秒开始
+    assert tracker.stats[1]['dps'] == 50.0
+    assert tracker.stats[1]['samples'] == 4
+
+
+def test_kill_ends_encounter_and_respawn_starts_new_one():
+    tracker = HpTracker()
+    record(tracker, 1, 1000, 10.0)
+    record(tracker, 1, 400, 12.0)
+    record(tracker, 1, 0, 14.0)
+    # 击杀后重复的血量为0的采样不开始新的战斗
+    record(tracker, 1, 0, 15.0)
+    tracker.publish()
+
+    assert len(tracker) == 0
+    assert 1 not in tracker.stats
+    (summary,) = tracker.encounters
+    assert summary['reason'] == 'killed'
+    assert summary['killed'] is True
+    assert (summary['start_time'], summary['end_time'], summary['duration']) == (10.0, 14.0, 4.0)
+    assert (summary['start_hp'], summary['end_hp'], summary['damage'], summary['avg_dps']) == (1000, 0, 1000, 250.0)
+    assert summary['curve'] == [(0.0, 1000), (2.0, 400), (4.0, 0)]
+
+    # 同一UID重新出现时开始新的战斗
+    record(tracker, 1, 1000, 20.0)
+    tracker.publish()
+    assert tracker.stats[1]['duration'] == 0.0
+    assert len(tracker.encounters) == 1
+
+
+def test_finish_reasons_and_limits():
+    tracker = HpTracker(max_enemies=2, max_encounters=2)
+    record(tracker, 1, 1000, 0.0)
+    record(tracker, 2, 1000, 0.0)
+    record(tracker, 3, 1000, 0.0)
+    assert tracker.skipped == 1
+    assert len(tracker) == 2
+
+    tracker.finish(1, 'disappeared')
+    tracker.finish(1, 'disappeared')
+    tracker.finish(2)
+    record(tracker, 3, 1000, 1.0)
+    tracker.finish(3, 'expired')
+    tracker.publish()
+    assert [(e['uid'], e['reason'], e['killed']) for e in tracker.encounters] == [(2, 'removed', False),
+                                                                                 (3, 'expired', False)]
+
+
+def test_publish_only_when_changed():
+    tracker = HpTracker()
+    record(tracker, 1, 1000, 0.0)
+    assert tracker.stats == {}
+    tracker.publish()
+    stats = tracker.stats
+    tracker.publish()
+    assert tracker.stats is stats
+
+
+def test_curve_size_is_bounded():
+    tracker = HpTracker(curve_size=8)
+    for t in range(100):
+        record(tracker, 1, 10000 - t, float(t))
+    tracker.finish(1)
+    tracker.publish()
+    curve = tracker.encounters[0]['curve']
+    assert len(curve) <= 9
+    assert curve[0] == (0.0, 10000)
+    assert curve[-1] == (99.0, 9901)
+    assert [t for t, _ in curve] == sorted(t for t, _ in curve)
+
+
+def test_manager_records_only_watched_enemies(tmp_path):
+    watchlist = tmp_path / "watchlist.json"
+    watchlist.write_text(json.dumps({"type_ids": [], "names": ["首领"]}), encoding="utf-8")
+    manager = EnemyManager(watchlist_file=str(watchlist))
+
+    def delta(uid, name, hp, **extra):
+        return dict({'enemy_uid': uid, 'enemy_name': name, 'enemy_hp': hp, 'enemy_max_hp': 1000}, **extra)
+
+    manager.sync_enemies([delta(1, "首领", 1000), delta(2, "小怪", 1000)], timestamp=0.0)
+    manager.sync_enemies([delta(1, "首领", 500), delta(2, "小怪", 500)], timestamp=5.0)
+    assert set(manager.hp_tracker.stats) == {1}
+    assert manager.hp_tracker.stats[1]['dps'] == 100.0
+
+    # 离开视野不算击杀
+    manager.sync_enemies([{'enemy_uid': 1, 'enemy_disappeared': True}], timestamp=6.0)
+    (summary,) = manager.hp_tracker.encounters
+    assert (summary['uid'], summary['reason'], summary['killed']) == (1, 'disappeared', False)
@@ -0,0 +1,126 @@
+"""
+怪物名称表编译与查询测试
+"""
+
+import json
+import mmap
+import os
+
+import pytest
+
+import monster_table
+from monster_table import (FallbackNameTable, MonsterNameTable, available_languages, compile_names, load_table,
+                           names_file)
+
+
+def write_names(path, names, mtime=None):
+    path.write_text(json.dumps(names, ensure_ascii=False), encoding="utf-8")
+    if mtime is not None:
+        os.utime(path, ns=(mtime, mtime))
+
+
+def test_compile_and_lookup():
+    names = {"20": "哥布林", "3": "Slime", "0": "", "4294967295": "最大", "100": "é"}
+    table = MonsterNameTable(compile_names(names))
+    assert len(table) == 5
+    assert table.to_dict() == {int(type_id): name for type_id, name in names.items()}
+    assert list(table.to_dict()) == [0, 3, 20, 100, 4294967295]
+    assert table.get(20) == "哥布林"
+    assert table.get(21) is None
+    assert table.get(21, "未知") == "未知"
+    assert table.get(5000000000) is None
+    assert 3 in table and 4 not in table
+    # 缓存后结果不变
+    assert table.get(20) == "哥布林" and table.get(21) is None
+
+
+def test_compile_rejects_invalid_ids():
+    with pytest.raises(ValueError):
+        compile_names({"-1": "a"})
+    with pytest.raises(ValueError):
+        compile_names({"4294967296": "a"})
+    with pytest.raises(ValueError):
+        compile_names({"abc": "a"})
+
+
+def test_invalid_data():
+    data = compile_names({"1": "a"})
+    with pytest.raises(ValueError):
+        MonsterNameTable(data[:4])
+    with pytest.raises(ValueError):
+        MonsterNameTable(b"XXXX" + data[4:])
+    with pytest.raises(ValueError):
+        MonsterNameTable(data[:monster_table._HEADER.size + 4])
+
+
+def test_bundled_names(in_root):
+    with open(names_file(), "r", encoding="utf-8") as f:
+        names = json.load(f)
+    table = MonsterNameTable(compile_names(names))
+    assert table.to_dict() == {int(type_id): name for type_id, name in names.items()}
+
+
+def test_load_table_compiles_and_maps(tmp_path):
+    json_path = tmp_path / "monster_names.json"
+    bin_path = tmp_path / "monster_names.bin"
+    write_names(json_path, {"1": "甲", "2": "乙"}, mtime=1_000_000_000_000_000_000)
+
+    table = load_table(directory=str(tmp_path))
+    assert isinstance(table._data, mmap.mmap)
+    assert table.to_dict() == {1: "甲", 2: "乙"}
+    compiled = bin_path.stat().st_mtime_ns
+
+    # 二进制表比 JSON 新时直接映射, 不重新编译
+    assert load_table(directory=str(tmp_path)).get(2) == "乙"
+    assert bin_path.stat().st_mtime_ns == compiled
+
+    # JSON 修改后重新编译
+    write_names(json_path, {"1": "甲", "3": "丙"}, mtime=compiled + 1)
+    assert load_table(directory=str(tmp_path)).to_dict() == {1: "甲", 3: "丙"}
+
+    # 只有二进制表时也能加载
+    json_path.unlink()
+    assert load_table(directory=str(tmp_path)).get(3) == "丙"
+    bin_path.unlink()
+    with pytest.raises(FileNotFoundError):
+        load_table(directory=str(tmp_path))
+
+
+def test_load_table_recompiles_invalid_binary(tmp_path):
+    json_path = tmp_path / "monster_names.json"
+    bin_path = tmp_path / "monster_names.bin"
+    write_names(json_path, {"7": "庚"}, mtime=1_000_000_000_000_000_000)
+    bin_path.write_bytes(b"SRMN\x63\x00")
+
+    assert load_table(directory=str(tmp_path)).get(7) == "庚"
+    assert MonsterNameTable(bin_path.read_bytes()).get(7) == "庚"
+
+
+def test_load_table_without_write_access(tmp_path, monkeypatch):
+    write_names(tmp_path / "monster_names.json", {"1": "甲"})
+
+    def compile_file(json_path, bin_path):
+        raise PermissionError(bin_path)
+
+    monkeypatch.setattr(monster_table, "compile_file", compile_file)
+    table = load_table(directory=str(tmp_path))
+    assert table.get(1) == "甲"
+    assert not (tmp_path / "monster_names.bin").exists()
+
+
+def test_language_fallback(tmp_path):
+    write_names(tmp_path / "monster_names.json", {"1": "哥布林", "2": "史莱姆"})
+    write_names(tmp_path / "monster_names.en.json", {"1": "Goblin"})
+    write_names(tmp_path / "monster_names.ja.json", {})
+
+    assert available_languages(str(tmp_path)) == ["en", "ja"]
+    assert names_file("en", str(tmp_path)) == str(tmp_path / "monster_names.en.json")
+
+    table = load_table("en", str(tmp_path))
+    assert isinstance(table, FallbackNameTable)
+    assert len(table) == 2
+    assert table.get(1) == "Goblin"
+    assert table.get(2) == "史莱姆"
+    assert table.get(3, "未知") == "未知"
+    assert 2 in table and 3 not in table
+    assert (tmp_path / "monster_names.en.bin").exists()
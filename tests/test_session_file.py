@@ -0,0 +1,161 @@
+"""
+会话文件录制与读取测试
+"""
+
+import os
+import random
+
+import pytest
+
+pytest.importorskip("zstandard")
+
+from session_file import CODEC_NONE, CODEC_ZSTD, SessionReader, SessionWriter, is_session_file
+
+
+def generate_frames(count, seed=0):
+    """(抓包时间, 流编号, 数据包), 时间递增, 偶尔有轻微乱序"""
+    rnd = random.Random(seed)
+    frames = []
+    packet_time = 1000.0
+    for i in range(count):
+        packet_time += rnd.random() * 0.1
+        jitter = -0.05 if rnd.random() < 0.05 else 0.0
+        frame = bytes([i % 256]) * rnd.randint(0, 300)
+        frames.append((packet_time + jitter, rnd.randint(1, 3), frame))
+    return frames
+
+
+def write_session(path, frames, **kwargs):
+    kwargs.setdefault('block_size', 4096)
+    with SessionWriter(str(path), **kwargs) as writer:
+        for packet_time, flow_id, frame in frames:
+            writer.write(packet_time, flow_id, frame)
+    return writer
+
+
+def read_all(reader, start=None, end=None):
+    return [(packet_time, flow_id, bytes(frame)) for packet_time, flow_id, frame in reader.frames(start, end)]
+
+
+@pytest.mark.parametrize('compress', [True, False], ids=['zstd', 'raw'])
+def test_round_trip(tmp_path, compress):
+    path = tmp_path / "session.srs"
+    frames = generate_frames(500)
+    writer = write_session(path, frames, compress=compress)
+    assert writer.frames == len(frames)
+    assert writer.written_bytes == os.path.getsize(path)
+    assert is_session_file(str(path))
+
+    with SessionReader.open(str(path)) as reader:
+        assert len(reader.blocks) == writer.blocks > 1
+        assert {block.codec for block in reader.blocks} == ({CODEC_ZSTD} if compress else {CODEC_NONE})
+        assert len(reader) == len(frames)
+        assert read_all(reader) == frames
+        assert reader.start_time == frames[0][0]
+        assert reader.end_time == max(packet_time for packet_time, _, _ in frames)
+        assert not reader.truncated
+
+
+def test_incompressible_block_is_stored_raw(tmp_path):
+    path = tmp_path / "session.srs"
+    frames = [(1000.0, 1, os.urandom(2000))]
+    write_session(path, frames, compress=True)
+    with SessionReader.open(str(path)) as reader:
+        assert {block.codec for block in reader.blocks} == {CODEC_NONE}
+        assert read_all(reader) == frames
+
+
+@pytest.mark.parametrize('cut', [1, 20, 40], ids=['data', 'block-header', 'header-only'])
+def test_truncated_last_block(tmp_path, cut):
+    path = tmp_path / "session.srs"
+    frames = generate_frames(300)
+    write_session(path, frames)
+    with SessionReader.open(str(path)) as reader:
+        blocks = len(reader.blocks)
+        last = reader.blocks[-1]
+        complete = len(reader) - last.count
+    data = path.read_bytes()
+    # 截掉最后一块的部分数据 / 只保留部分块头 / 只保留完整块头
+    size = {1: len(data) - 1, 20: last.offset - 20, 40: last.offset}[cut]
+    path.write_bytes(data[:size])
+
+    with SessionReader.open(str(path)) as reader:
+        assert reader.truncated
+        assert len(reader.blocks) == blocks - 1
+        assert read_all(reader) == frames[:complete]
+
+
+def test_time_range(tmp_path):
+    path = tmp_path / "session.srs"
+    frames = generate_frames(1000, seed=1)
+    write_session(path, frames, compress=True)
+    with SessionReader.open(str(path)) as reader:
+        first, last = reader.start_time, reader.end_time
+        for start, end in [(None, None), (first + 10.0, None), (None, first + 10.0),
+                           (first + 7.3, first + 12.9), (frames[400][0], frames[400][0]),
+                           (last + 1.0, None), (None, first - 1.0), (first + 20.0, first + 10.0)]:
+            expected = [frame for frame in frames
+                        if (start is None or frame[0] >= start) and (end is None or frame[0] <= end)]
+            assert read_all(reader, start, end) == expected, (start, end)
+
+
+def test_flush_interval(tmp_path):
+    path = tmp_path / "session.srs"
+    writer = SessionWriter(str(path), compress=False, flush_interval=5.0)
+    writer.write(100.0, 1, b"a")
+    writer.write(104.0, 1, b"b")
+    assert writer.blocks == 0
+    # 按数据包时间, 块中最早的数据包超过 flush_interval 时写入
+    writer.write(105.0, 1, b"c")
+    assert writer.blocks == 1
+    writer.write(106.0, 1, b"d")
+    writer.flush_if_due(110.0)
+    assert writer.blocks == 1
+    writer.flush_if_due(111.0)
+    assert writer.blocks == 2
+
+    # 未关闭的写入器已写入的块可以读取
+    with SessionReader.open(str(path)) as reader:
+        assert read_all(reader) == [(100.0, 1, b"a"), (104.0, 1, b"b"), (105.0, 1, b"c"), (106.0, 1, b"d")]
+    writer.close()
+
+
+def test_invalid_file(tmp_path):
+    path = tmp_path / "not_session.pcap"
+    path.write_bytes(b"\xd4\xc3\xb2\xa1" + b"\x00" * 20)
+    assert not is_session_file(str(path))
+    assert not is_session_file(str(tmp_path / "missing.srs"))
+    with pytest.raises(ValueError):
+        SessionReader.open(str(path))
+    with pytest.raises(ValueError):
+        SessionReader(b"SRSS")
+
+
+def test_capture_records_and_replays_session(tmp_path):
+    pytest.importorskip("scapy")
+    pytest.importorskip("google.protobuf")
+    from packet_capture import PacketCapture
+    from synthetic_traffic import TrafficGenerator, build_frames, segment, write_pcap
+
+    pcap = tmp_path / "synthetic.pcap"
+    session = tmp_path / "synthetic.srs"
+    generator = TrafficGenerator(seed=3)
+    write_pcap(str(pcap), build_frames(segment(generator.messages(200))))
+
+    def collect(messages):
+        def callback(data):
+            for name in ('SyncNearEntities', 'SyncNearDeltaInfo'):
+                if name in data:
+                    messages.append((name, data[name].SerializeToString(), data['flow_id'], data['time']))
+        return callback
+
+    live = []
+    capture = PacketCapture(trace_interval=0, record_file=str(session))
+    result = capture.replay(str(pcap), collect(live), 0)
+    assert is_session_file(str(session))
+
+    replayed = []
+    session_result = PacketCapture(trace_interval=0).replay_session(str(session), collect(replayed), 0)
+    assert session_result['messages'] == result['messages'] == 200
+    assert len(live) == 200
+    assert replayed == live
@@ -0,0 +1,42 @@
+"""
+启动时的按需加载测试
+在子进程中导入 main 或运行 main.py --list, 检查解码用的重依赖没有被加载
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 只在解码或回放时需要的模块
+DECODE_MODULES = ('star_pb2', 'aoi_pb2', 'google.protobuf', 'zstandard')
+
+IMPORT_MAIN = "import main"
+LIST_INTERFACES = f"""
+import runpy
+sys.argv = ['main.py', '--list']
+try:
+    runpy.run_path({os.path.join(ROOT, 'main.py')!r}, run_name='__main__')
+except SystemExit:
+    pass
+"""
+
+
+def loaded_modules(code, cwd):
+    script = f"import sys\nsys.path.insert(0, {ROOT!r})\n{code}\n" \
+             f"import json\nprint('LOADED', json.dumps([m for m in {DECODE_MODULES!r} if m in sys.modules]))"
+    result = subprocess.run([sys.executable, '-c', script], cwd=cwd, capture_output=True,
+                            text=True, encoding='utf-8', timeout=60)
+    assert result.returncode == 0, result.stderr
+    # 日志也会输出到标准输出, 只取带标记的一行
+    line = next(line for line in result.stdout.splitlines() if line.startswith('LOADED '))
+    return json.loads(line[len('LOADED '):])
+
+
+@pytest.mark.parametrize('code', [IMPORT_MAIN, LIST_INTERFACES], ids=['import', 'list'])
+def test_decode_modules_not_loaded(code, tmp_path):
+    assert loaded_modules(code, tmp_path) == []
@@ -0,0 +1,111 @@
+"""
+StreamBuffer 测试
+"""
+
+import struct
+
+import pytest
+
+from stream_buffer import StreamBuffer
+
+
+def test_empty_buffer():
+    buffer = StreamBuffer()
+    assert len(buffer) == 0
+    assert buffer.peek_uint32() is None
+    assert bytes(buffer.read(0)) == b''
+    with pytest.raises(ValueError):
+        buffer.read(1)
+
+
+def test_append_empty_is_ignored():
+    buffer = StreamBuffer()
+    buffer.append(b'')
+    buffer.append(memoryview(b''))
+    assert len(buffer) == 0
+    assert bytes(buffer.read(0)) == b''
+
+
+def test_read_zero_keeps_data():
+    buffer = StreamBuffer()
+    buffer.append(b'abc')
+    assert bytes(buffer.read(0)) == b''
+    assert len(buffer) == 3
+    assert bytes(buffer.read(3)) == b'abc'
+
+
+def test_read_within_chunk_does_not_copy():
+    data = b'0123456789'
+    buffer = StreamBuffer()
+    buffer.append(data)
+    view = buffer.read(4)
+    assert bytes(view) == b'0123'
+    assert view.obj is data
+    assert bytes(buffer.read(6)) == b'456789'
+    assert len(buffer) == 0
+
+
+def test_partial_reads_across_chunks():
+    buffer = StreamBuffer()
+    for chunk in (b'ab', b'cde', b'f', b'ghij'):
+        buffer.append(chunk)
+    assert len(buffer) == 10
+    assert bytes(buffer.read(1)) == b'a'
+    # 从第一个分块中间开始, 跨越三个分块
+    assert bytes(buffer.read(5)) == b'bcdef'
+    assert len(buffer) == 4
+    assert bytes(buffer.read(2)) == b'gh'
+    assert bytes(buffer.read(2)) == b'ij'
+    assert len(buffer) == 0
+    buffer.append(b'k')
+    assert bytes(buffer.read(1)) == b'k'
+
+
+def test_read_more_than_available():
+    buffer = StreamBuffer()
+    buffer.append(b'abc')
+    with pytest.raises(ValueError):
+        buffer.read(4)
+    assert bytes(buffer.read(3)) == b'abc'
+
+
+def test_peek_uint32_split_and_partial():
+    buffer = StreamBuffer()
+    packed = struct.pack('>I', 0x01020304)
+    buffer.append(packed[:1])
+    buffer.append(packed[1:3])
+    assert buffer.peek_uint32() is None
+    buffer.append(packed[3:] + b'x')
+    # 跨分块查看不消费数据
+    assert buffer.peek_uint32() == 0x01020304
+    assert buffer.peek_uint32() == 0x01020304
+    assert len(buffer) == 5
+    assert bytes(buffer.read(4)) == packed
+    assert buffer.peek_uint32() is None
+
+
+def test_length_prefixed_frames():
+    frames = [struct.pack('>I', 4 + len(body)) + body for body in (b'', b'a', b'hello', b'x' * 100)]
+    stream = b''.join(frames)
+    buffer = StreamBuffer()
+    result = []
+    # 按不规则长度切分, 模拟TCP分段
+    for start in range(0, len(stream), 7):
+        buffer.append(stream[start:start + 7])
+        while True:
+            length = buffer.peek_uint32()
+            if length is None or length > len(buffer):
+                break
+            result.append(bytes(buffer.read(length)))
+    assert result == frames
+    assert len(buffer) == 0
+
+
+def test_clear():
+    buffer = StreamBuffer()
+    buffer.append(b'abc')
+    buffer.read(1)
+    buffer.clear()
+    assert len(buffer) == 0
+    buffer.append(b'xyz')
+    assert bytes(buffer.read(3)) == b'xyz'
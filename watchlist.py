@@ -0,0 +1,124 @@
+"""
+关注敌人列表模块
+从配置文件加载按怪物类型Id、名称或实体UID关注的敌人, 编译为查找集合, 文件修改后自动重新加载
+"""
+
+import json
+import os
+import threading
+from typing import Callable, Iterable, Optional
+
+from logging_config import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_WATCHLIST_FILE = "watchlist.json"
+
+
+class Watchlist:
+    """
+    编译后的关注列表, 创建后不再修改
+
+    配置文件格式:
+        {
+            "type_ids": [10032],       # monster_names.json 中的怪物类型Id
+            "names": ["哥布林王"],      # 敌人名称
+            "uids": [1263272000]       # 实体UID
+        }
+    """
+
+    __slots__ = ('type_ids', 'names', 'uids')
+
+    def __init__(self, type_ids: Iterable[int] = (), names: Iterable[str] = (), uids: Iterable[int] = ()):
+        self.type_ids = frozenset(int(type_id) for type_id in type_ids)
+        self.names = frozenset(names)
+        self.uids = frozenset(int(uid) for uid in uids)
+
+    def __len__(self) -> int:
+        return len(self.type_ids) + len(self.names) + len(self.uids)
+
+    def matches(self, uid: int, name: Optional[str], type_id: Optional[int]) -> bool:
+        """判断敌人是否被关注"""
+        return uid in self.uids or type_id in self.type_ids or name in self.names
+
+    @classmethod
+    def load(cls, path: str) -> 'Watchlist':
+        """
+        从配置文件加载
+
+        Raises:
+            OSError: 文件无法读取
+            ValueError: 文件格式错误
+        """
+        with open(path, "r", encoding="utf-8") as f:
+            config = json.load(f)
+        if not isinstance(config, dict):
+            raise ValueError("关注列表必须是 JSON 对象")
+        return cls(config.get("type_ids", ()), config.get("names", ()), config.get("uids", ()))
+
+
+class WatchlistReloader:
+    """
+    监视关注列表文件, 修改后在后台线程重新加载并通过回调交给使用方
+
+    加载失败时保留当前列表并记录错误。
+    """
+
+    def __init__(self, path: str, on_reload: Callable[[Watchlist], None], interval: float = 2.0):
+        """
+        初始化
+
+        Args:
+            path: 配置文件路径
+            on_reload: 加载到新列表时的回调, 在后台线程中调用
+            interval: 检查文件修改的间隔(秒)
+        """
+        self.path = path
+        self.on_reload = on_reload
+        self.interval = interval
+        self._mtime = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def load(self) -> Watchlist:
+        """首次加载, 文件不存在时返回空列表"""
+        self._mtime = self._stat()
+        if self._mtime is None:
+            logger.info(f"未找到关注列表文件 {self.path}, 不关注任何敌人")
+            return Watchlist()
+        try:
+            watchlist = Watchlist.load(self.path)
+        except (OSError, ValueError) as e:
+            logger.error(f"加载关注列表失败: {e}")
+            return Watchlist()
+        logger.info(f"已加载关注列表 {self.path}: {len(watchlist)} 项")
+        return watchlist
+
+    def start(self):
+        """启动后台检查线程"""
+        self._thread = threading.Thread(target=self._watch_loop, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """停止后台检查线程"""
+        self._stop.set()
+
+    def _stat(self) -> Optional[int]:
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except OSError:
+            return None
+
+    def _watch_loop(self):
+        while not self._stop.wait(self.interval):
+            mtime = self._stat()
+            if mtime is None or mtime == self._mtime:
+                continue
+            self._mtime = mtime
+            try:
+                watchlist = Watchlist.load(self.path)
+            except (OSError, ValueError) as e:
+                logger.error(f"重新加载关注列表失败, 继续使用当前列表: {e}")
+                continue
+            logger.info(f"关注列表已重新加载: {len(watchlist)} 项")
+            self.on_reload(watchlist)
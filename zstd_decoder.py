@@ -0,0 +1,114 @@
+"""
+zstd解压模块
+"""
+
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Dict, Optional
+
+if TYPE_CHECKING:
+    import zstandard
+
+# zstandard 只在第一次解压时加载, 由 _load_zstd 填充
+zstd = None
+
+
+def _load_zstd():
+    """按需加载 zstandard"""
+    global zstd
+    import zstandard as zstd
+
+
+class ZstdDecoder:
+    """
+    zstd解压器
+
+    每个线程缓存一个解压上下文, 避免每条消息重新创建;
+    帧头包含原始长度时按该长度一次性分配输出缓冲区,
+    不包含时流式解压, 最多读取 max_output_size + 1 字节, 超出即视为失败。
+    每次解压返回新的 bytes, 不复用输出缓冲区: FrameDown 内层消息解压时外层结果仍在使用,
+    复用缓冲区会互相覆盖, 且 readinto 到复用缓冲区实测并不更快。
+    """
+
+    def __init__(self, dict_data: Optional[bytes] = None, max_output_size: int = 1024 * 1024):
+        """
+        初始化解压器
+
+        Args:
+            dict_data: 训练好的zstd字典, None表示不使用字典
+            max_output_size: 单条消息解压后的最大长度
+        """
+        self.max_output_size = max_output_size
+        self._dict_data = dict_data
+        self._dict = None
+        self._local = threading.local()
+
+        # 统计数据
+        self.count = 0
+        self.failures = 0
+        self.compressed_bytes = 0
+        self.decompressed_bytes = 0
+        self.decompress_time = 0.0
+
+    def _context(self) -> 'zstandard.ZstdDecompressor':
+        """获取当前线程的解压上下文, 第一次调用时加载 zstandard"""
+        dctx = getattr(self._local, 'dctx', None)
+        if dctx is None:
+            if zstd is None:
+                _load_zstd()
+            if self._dict_data and self._dict is None:
+                self._dict = zstd.ZstdCompressionDict(self._dict_data)
+            if self._dict is not None:
+                dctx = zstd.ZstdDecompressor(dict_data=self._dict)
+            else:
+                dctx = zstd.ZstdDecompressor()
+            self._local.dctx = dctx
+        return dctx
+
+    def decompress(self, data) -> bytes:
+        """
+        解压一个zstd帧
+
+        Args:
+            data: 压缩数据
+
+        Returns:
+            解压后的数据
+
+        Raises:
+            zstandard.ZstdError: 数据损坏或超过最大长度
+        """
+        start = time.perf_counter()
+        try:
+            dctx = self._context()
+            content_size = zstd.frame_content_size(data)
+            if content_size > self.max_output_size:
+                raise zstd.ZstdError(f"解压后长度超过限制: {content_size}")
+            if content_size > 0:
+                output = dctx.decompress(data)
+            else:
+                # 帧头没有原始长度时最多读取 max_output_size + 1 字节, 压缩炸弹不会无限制分配内存
+                with dctx.stream_reader(data) as reader:
+                    output = reader.read(self.max_output_size + 1)
+                if len(output) > self.max_output_size:
+                    raise zstd.ZstdError(f"解压后长度超过限制: 大于 {self.max_output_size}")
+        except Exception:
+            self.failures += 1
+            raise
+        finally:
+            self.decompress_time += time.perf_counter() - start
+
+        self.count += 1
+        self.compressed_bytes += len(data)
+        self.decompressed_bytes += len(output)
+        return output
+
+    def stats(self) -> Dict[str, Any]:
+        """解压统计"""
+        return {
+            'count': self.count,
+            'failures': self.failures,
+            'compressed_bytes': self.compressed_bytes,
+            'decompressed_bytes': self.decompressed_bytes,
+            'decompress_time': self.decompress_time,
+        }